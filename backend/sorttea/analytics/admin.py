@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import ActivityData, OverviewStats, EngagementBreakdown
+from .models import (
+    ActivityData, ActivityRollup, OverviewStats, EngagementBreakdown, EngagementRollup, ReportExport, RollupState
+)
 
 @admin.register(ActivityData)
 class ActivityDataAdmin(admin.ModelAdmin):
@@ -58,6 +60,32 @@ class EngagementBreakdownAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(ActivityRollup)
+class ActivityRollupAdmin(admin.ModelAdmin):
+    list_display = ('period_start', 'resolution', 'user', 'participants', 'engagement', 'completion_rate')
+    list_filter = ('resolution', 'user')
+    search_fields = ('user__email', 'user__username')
+    ordering = ('-period_start',)
+
+@admin.register(EngagementRollup)
+class EngagementRollupAdmin(admin.ModelAdmin):
+    list_display = ('period_start', 'resolution', 'user', 'likes', 'comments', 'shares', 'follows', 'tags')
+    list_filter = ('resolution', 'user')
+    search_fields = ('user__email', 'user__username')
+    ordering = ('-period_start',)
+
+@admin.register(RollupState)
+class RollupStateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'watermark', 'last_run_at')
+    readonly_fields = ('last_run_at',)
+
+@admin.register(ReportExport)
+class ReportExportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'format', 'start_date', 'end_date', 'status', 'created_at', 'completed_at')
+    list_filter = ('status', 'format')
+    search_fields = ('user__email', 'user__username')
+    readonly_fields = ('created_at', 'completed_at')
+
 # Register activity data in the admin site
 # These are just re-exports for clarity, since we're using the @admin.register decorator above
 # admin.site.register(ActivityData, ActivityDataAdmin)
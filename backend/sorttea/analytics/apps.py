@@ -8,4 +8,4 @@ class AnalyticsConfig(AppConfig):
 
     def ready(self):
         # Import any signals here
-        pass
+        from . import signals  # noqa: F401
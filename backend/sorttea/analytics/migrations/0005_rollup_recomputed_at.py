@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_period_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitydata',
+            name='recomputed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='activityrollup',
+            name='recomputed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='engagementbreakdown',
+            name='recomputed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='engagementrollup',
+            name='recomputed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
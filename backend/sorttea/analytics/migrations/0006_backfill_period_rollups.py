@@ -0,0 +1,74 @@
+# Generated by Django 5.1.15 on 2026-10-19 07:50
+
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+ENGAGEMENT_FIELDS = ('likes', 'comments', 'shares', 'follows', 'tags')
+
+RESOLUTIONS = {'week': TruncWeek, 'month': TruncMonth}
+
+
+def backfill_period_rollups(apps, schema_editor):
+    """Build the week and month rollups from daily rows written before the rollup tables existed."""
+    ActivityData = apps.get_model('analytics', 'ActivityData')
+    EngagementBreakdown = apps.get_model('analytics', 'EngagementBreakdown')
+    ActivityRollup = apps.get_model('analytics', 'ActivityRollup')
+    EngagementRollup = apps.get_model('analytics', 'EngagementRollup')
+    
+    for resolution, truncate in RESOLUTIONS.items():
+        activity = (
+            ActivityData.objects.annotate(period_start=truncate('date'))
+            .values('user_id', 'period_start')
+            .annotate(total_participants=Sum('participants'), total_engagement=Sum('engagement'))
+        )
+        ActivityRollup.objects.bulk_create(
+            [
+                ActivityRollup(
+                    user_id=row['user_id'],
+                    resolution=resolution,
+                    period_start=row['period_start'],
+                    participants=row['total_participants'],
+                    engagement=row['total_engagement'],
+                    completion_rate=round(row['total_engagement'] * 100 / row['total_participants'], 2)
+                    if row['total_participants'] else 0
+                )
+                for row in activity
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'resolution', 'period_start'],
+            update_fields=['participants', 'engagement', 'completion_rate'],
+            batch_size=1000
+        )
+        
+        engagement = (
+            EngagementBreakdown.objects.annotate(period_start=truncate('date'))
+            .values('user_id', 'period_start')
+            .annotate(**{f'total_{field}': Sum(field) for field in ENGAGEMENT_FIELDS})
+        )
+        EngagementRollup.objects.bulk_create(
+            [
+                EngagementRollup(
+                    user_id=row['user_id'],
+                    resolution=resolution,
+                    period_start=row['period_start'],
+                    **{field: row[f'total_{field}'] for field in ENGAGEMENT_FIELDS}
+                )
+                for row in engagement
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'resolution', 'period_start'],
+            update_fields=list(ENGAGEMENT_FIELDS),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_rollup_recomputed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_period_rollups, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.utils import timezone
 from sorttea.accounts.models import User
@@ -12,6 +13,8 @@ class ActivityData(models.Model):
     participants = models.IntegerField(default=0)
     engagement = models.IntegerField(default=0)
     completion_rate = models.FloatField(default=0)
+    # Set by the set-based rollup; buffered increments older than this are already counted
+    recomputed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ('date', 'user')
@@ -47,6 +50,8 @@ class EngagementBreakdown(models.Model):
     shares = models.IntegerField(default=0)
     follows = models.IntegerField(default=0)
     tags = models.IntegerField(default=0)
+    # Set by the set-based rollup; buffered increments older than this are already counted
+    recomputed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ('date', 'user', 'giveaway')
@@ -55,3 +60,94 @@ class EngagementBreakdown(models.Model):
     def __str__(self):
         giveaway_info = f" for {self.giveaway.title}" if self.giveaway else ""
         return f"Engagement on {self.date} for {self.user.email}{giveaway_info}"
+
+ROLLUP_RESOLUTION_CHOICES = (
+    ('week', 'Week'),
+    ('month', 'Month'),
+)
+
+class ActivityRollup(models.Model):
+    """
+    Stores activity data per week or month, summed from the daily ActivityData rows
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    resolution = models.CharField(max_length=10, choices=ROLLUP_RESOLUTION_CHOICES)
+    # Monday of the week or first day of the month
+    period_start = models.DateField()
+    participants = models.IntegerField(default=0)
+    engagement = models.IntegerField(default=0)
+    completion_rate = models.FloatField(default=0)
+    # Set by the set-based rollup; buffered increments older than this are already counted
+    recomputed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('user', 'resolution', 'period_start')
+        ordering = ['period_start']
+    
+    def __str__(self):
+        return f"Activity for the {self.resolution} of {self.period_start} for {self.user.email}"
+
+class EngagementRollup(models.Model):
+    """
+    Stores engagement per week or month across a user's giveaways, summed from the daily EngagementBreakdown rows
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='engagement_rollups')
+    resolution = models.CharField(max_length=10, choices=ROLLUP_RESOLUTION_CHOICES)
+    period_start = models.DateField()
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    shares = models.IntegerField(default=0)
+    follows = models.IntegerField(default=0)
+    tags = models.IntegerField(default=0)
+    # Set by the set-based rollup; buffered increments older than this are already counted
+    recomputed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('user', 'resolution', 'period_start')
+        ordering = ['period_start']
+    
+    def __str__(self):
+        return f"Engagement for the {self.resolution} of {self.period_start} for {self.user.email}"
+
+class RollupState(models.Model):
+    """
+    Progress of an incremental rollup job
+    """
+    name = models.CharField(max_length=50, unique=True)
+    # Entries updated up to this moment are reflected in the rollup tables
+    watermark = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Rollup {self.name} up to {self.watermark}"
+
+class ReportExport(models.Model):
+    """
+    An analytics report rendered to a file by a background job
+    """
+    FORMAT_CHOICES = (
+        ('pdf', 'PDF'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_exports')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='pdf')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='analytics/reports/%Y/%m/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_format_display()} report {self.start_date} to {self.end_date} for {self.user.email}"
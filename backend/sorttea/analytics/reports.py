@@ -0,0 +1,201 @@
+"""
+Analytics report exports built from the daily rollup tables.
+
+Report rows are read from ``ActivityData`` and per-day totals of
+``EngagementBreakdown`` with database cursors that fetch
+``ANALYTICS_EXPORT_CHUNK_SIZE`` rows at a time, and the two date-ordered
+streams are merged as they are read. CSV is streamed to the client as rows
+arrive; PDF pages are written out to a file as they fill up. Neither holds
+more than a chunk of rows or a page of text, whatever the date range or the
+number of giveaways.
+"""
+
+import csv
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Sum
+from .models import ActivityData, EngagementBreakdown
+
+ENGAGEMENT_FIELDS = ('likes', 'comments', 'shares', 'follows', 'tags')
+
+REPORT_COLUMNS = ('date', 'participants', 'engagement', 'completion_rate') + ENGAGEMENT_FIELDS
+
+
+def iter_report_rows(user_id, start_date, end_date, chunk_size=None):
+    """
+    Yield one report row per day with activity between the two dates, in date order.
+    
+    Rows are tuples in ``REPORT_COLUMNS`` order. Engagement counts are summed
+    over the creator's giveaways in the database.
+    """
+    chunk_size = chunk_size or settings.ANALYTICS_EXPORT_CHUNK_SIZE
+    activity = iter(
+        ActivityData.objects.filter(user_id=user_id, date__range=(start_date, end_date))
+        .order_by('date')
+        .values_list('date', 'participants', 'engagement', 'completion_rate')
+        .iterator(chunk_size=chunk_size)
+    )
+    engagement = iter(
+        EngagementBreakdown.objects.filter(user_id=user_id, date__range=(start_date, end_date))
+        .values('date')
+        .annotate(**{f'total_{field}': Sum(field) for field in ENGAGEMENT_FIELDS})
+        .order_by('date')
+        .values_list('date', *(f'total_{field}' for field in ENGAGEMENT_FIELDS))
+        .iterator(chunk_size=chunk_size)
+    )
+    
+    # Merge the two date-ordered streams, filling in days only one of them has
+    activity_row, engagement_row = next(activity, None), next(engagement, None)
+    while activity_row or engagement_row:
+        day = min(row[0] for row in (activity_row, engagement_row) if row)
+        
+        if activity_row and activity_row[0] == day:
+            participants, engagement_count, completion_rate = activity_row[1:]
+            activity_row = next(activity, None)
+        else:
+            participants, engagement_count, completion_rate = 0, 0, 0.0
+        
+        if engagement_row and engagement_row[0] == day:
+            counts = engagement_row[1:]
+            engagement_row = next(engagement, None)
+        else:
+            counts = (0,) * len(ENGAGEMENT_FIELDS)
+        
+        yield (day, participants, engagement_count, round(completion_rate, 2), *counts)
+
+
+class Echo:
+    """File-like object that returns what is written to it, so csv.writer output can be yielded."""
+    
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, batch_size=500):
+    """Yield a CSV rendering of report rows, ``batch_size`` lines per chunk."""
+    writer = csv.writer(Echo())
+    batch = [writer.writerow(REPORT_COLUMNS)]
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+class PDFWriter:
+    """
+    Minimal PDF writer for pages of monospaced text.
+    
+    Each page is written to ``out`` as soon as it fills, so only the current
+    page's lines and the byte offset of every object written so far are kept.
+    ``header`` lines are repeated at the top of every page.
+    """
+    # US Letter in landscape, wide enough for every report column
+    PAGE_WIDTH = 792
+    PAGE_HEIGHT = 612
+    MARGIN = 48
+    FONT_SIZE = 9
+    LEADING = 12
+    
+    # Objects 1 to 3 are the catalog, page tree and font; pages are numbered from 4
+    CATALOG, PAGES, FONT = 1, 2, 3
+    
+    def __init__(self, out, header=()):
+        self.out = out
+        self.header = list(header)
+        self.lines_per_page = (self.PAGE_HEIGHT - 2 * self.MARGIN) // self.LEADING - len(self.header)
+        self.lines = []
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 4
+        self.position = 0
+        
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>')
+    
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+    
+    def _write_object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        self._write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+    
+    @staticmethod
+    def _escape(text):
+        text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        return text.encode('cp1252', errors='replace')
+    
+    def add_line(self, text=''):
+        """Add a line of text, writing out the page when it is full."""
+        self.lines.append(text)
+        if len(self.lines) >= self.lines_per_page:
+            self._write_page()
+    
+    def _write_page(self):
+        top = self.PAGE_HEIGHT - self.MARGIN - self.FONT_SIZE
+        commands = [b'BT /F1 %d Tf %d TL %d %d Td' % (self.FONT_SIZE, self.LEADING, self.MARGIN, top)]
+        commands.extend(b'(' + self._escape(line) + b") '" for line in self.header + self.lines)
+        commands.append(b'ET')
+        stream = b'\n'.join(commands)
+        
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._write_object(content_id, b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        self._write_object(page_id, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R >> >> >>'
+        ) % (self.PAGES, self.PAGE_WIDTH, self.PAGE_HEIGHT, content_id, self.FONT))
+        self.page_ids.append(page_id)
+        self.lines = []
+    
+    def close(self):
+        """Write the last page, the page tree and the cross-reference table."""
+        if self.lines or not self.page_ids:
+            self._write_page()
+        
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        self._write_object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids)))
+        self._write_object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        
+        xref_position = self.position
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id)
+        for object_id in range(1, self.next_id):
+            self._write(b'%010d 00000 n \n' % self.offsets[object_id])
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            self.next_id, self.CATALOG, xref_position
+        ))
+
+
+def format_report_line(row):
+    """Format a report row as a fixed-width line of text."""
+    day, participants, engagement, completion_rate, *counts = row
+    return f"{day.isoformat():<12}" + ''.join(
+        f"{value:>13}" for value in (participants, engagement, f'{completion_rate:.2f}%', *counts)
+    )
+
+
+def write_pdf_report(export):
+    """Render a ReportExport to PDF and store it in the export's file field."""
+    header = [
+        f"SortTea analytics report for {export.user.email}",
+        f"{export.start_date.isoformat()} to {export.end_date.isoformat()}",
+        '',
+        f"{'Date':<12}" + ''.join(f"{column.replace('_rate', '').title():>13}" for column in REPORT_COLUMNS[1:]),
+    ]
+    
+    with tempfile.TemporaryFile() as buffer:
+        writer = PDFWriter(buffer, header=header)
+        for row in iter_report_rows(export.user_id, export.start_date, export.end_date):
+            writer.add_line(format_report_line(row))
+        writer.close()
+        
+        buffer.seek(0)
+        export.file.save(
+            f'analytics-report-{export.start_date.isoformat()}-{export.end_date.isoformat()}-{export.id}.pdf',
+            File(buffer),
+            save=False
+        )
@@ -0,0 +1,242 @@
+"""
+Incremental rollups of giveaway activity into the analytics rollup tables.
+
+Giveaway events add increments to a per-process buffer once their
+transaction commits. The buffer coalesces increments to the same daily row and
+flushes them, along with the week and month rows they fall in, as ``F()``
+upserts once ``ANALYTICS_ROLLUP_FLUSH_SECONDS`` have passed or
+``ANALYTICS_ROLLUP_BUFFER_SIZE`` rows are pending, checked as events arrive
+and after each request and Celery task, so a hot giveaway costs one write per
+row and flush instead of one per event.
+
+The nightly rollup recomputes rows from entries and stamps them with
+``recomputed_at``. Every buffered increment keeps the time it was added, and
+a flush skips the ones added before a row's stamp, which the recompute has
+already counted, while still applying those added since.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+from .models import ActivityData, ActivityRollup, EngagementBreakdown, EngagementRollup
+from .services import ROLLUP_RESOLUTIONS, get_bucket_start
+
+logger = logging.getLogger('sorttea.analytics')
+
+# Keys of the two kinds of rows the buffer holds
+ACTIVITY = 'activity'
+ENGAGEMENT = 'engagement'
+
+
+def get_cohort_date(entry):
+    """Get the day an entry's activity is rolled up under: the day it was created."""
+    return timezone.localdate(entry.created_at) if entry.created_at else timezone.localdate()
+
+
+def get_engagement_actions(giveaway):
+    """Get the EngagementBreakdown fields a verified entry of this giveaway counts towards."""
+    actions = []
+    if giveaway.verify_follow and giveaway.instagram_account_to_follow:
+        actions.append('follows')
+    if giveaway.verify_like and giveaway.instagram_post_to_like:
+        actions.append('likes')
+    if giveaway.verify_comment and giveaway.instagram_post_to_comment:
+        actions.append('comments')
+    if giveaway.verify_tags and giveaway.required_tag_count > 0 and giveaway.instagram_post_to_comment:
+        actions.append('tags')
+    return actions
+
+
+class RollupBuffer:
+    """Per-process buffer of increments to ActivityData and EngagementBreakdown rows."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Row key to the increments it has taken, each with the time it was added
+        self.pending = {}
+        self.last_flush = time.monotonic()
+    
+    def add_activity(self, user_id, date, **increments):
+        """Add increments (participants, engagement) to a creator's daily activity row."""
+        self.add((ACTIVITY, user_id, None, date), increments)
+    
+    def add_engagement(self, user_id, giveaway_id, date, **increments):
+        """Add increments (likes, comments, follows, tags) to a giveaway's daily engagement row."""
+        self.add((ENGAGEMENT, user_id, giveaway_id, date), increments)
+    
+    def add(self, key, increments):
+        """Buffer increments for a row, flushing when the buffer is due."""
+        with self.lock:
+            self.pending.setdefault(key, []).append((timezone.now(), Counter(increments)))
+        self.flush_if_due()
+    
+    def is_due(self):
+        """Check whether pending increments should be written; the caller holds the lock."""
+        return bool(self.pending) and (
+            len(self.pending) >= settings.ANALYTICS_ROLLUP_BUFFER_SIZE
+            or time.monotonic() - self.last_flush >= settings.ANALYTICS_ROLLUP_FLUSH_SECONDS
+        )
+    
+    def flush_if_due(self):
+        """Flush when the flush interval has passed or the buffer is full."""
+        with self.lock:
+            due = self.is_due()
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Write all buffered increments, returning the number of rows touched."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        
+        if not pending:
+            return 0
+        
+        try:
+            with transaction.atomic():
+                apply_increments(pending)
+        except Exception as e:
+            # The nightly rollup recomputes these rows, so dropped increments heal
+            logger.error(f"Failed to flush {len(pending)} analytics rollup rows: {str(e)}")
+            return 0
+        return len(pending)
+
+
+def get_activity_changes(counts):
+    """Get the update expressions that add activity increments to a row."""
+    participants = F('participants') + counts['participants']
+    engagement = F('engagement') + counts['engagement']
+    return {
+        'participants': participants,
+        'engagement': engagement,
+        # Recomputed from the incremented counts in the same statement
+        'completion_rate': Coalesce(
+            engagement * Value(100.0) / NullIf(participants, 0),
+            Value(0.0),
+            output_field=FloatField()
+        ),
+    }
+
+
+def get_engagement_changes(counts):
+    """Get the update expressions that add engagement increments to a row."""
+    return {field: F(field) + value for field, value in counts.items() if value}
+
+
+def sum_increments_since(increments, recomputed_at):
+    """Sum timestamped increments a row's recompute hasn't counted: those added from ``recomputed_at`` on."""
+    counts = Counter()
+    for added_at, increment in increments:
+        if recomputed_at is None or added_at >= recomputed_at:
+            counts.update(increment)
+    return counts
+
+
+def apply_increments(pending):
+    """
+    Upsert buffered increments into the rollup tables.
+    
+    Missing rows are created in one ``bulk_create`` that ignores conflicts,
+    then each row is incremented in place with ``F()`` expressions, so
+    concurrent flushes from several processes never lose an increment. The
+    week and month rows a day falls in take the same increments, coalesced
+    per period, with engagement summed across the creator's giveaways.
+    
+    ``pending`` maps row keys to lists of ``(added_at, increments)``. Rows
+    are locked and their ``recomputed_at`` read first, and each row only
+    takes the increments added since its last recompute.
+    """
+    activity = {key: increments for key, increments in pending.items() if key[0] == ACTIVITY}
+    engagement = {key: increments for key, increments in pending.items() if key[0] == ENGAGEMENT}
+    
+    activity_periods = {}
+    engagement_periods = {}
+    for rows, periods in ((activity, activity_periods), (engagement, engagement_periods)):
+        for (_, user_id, _, date), increments in rows.items():
+            for resolution in ROLLUP_RESOLUTIONS:
+                periods.setdefault((user_id, resolution, get_bucket_start(date, resolution)), []).extend(increments)
+    
+    user_ids = {key[1] for key in pending}
+    dates = {key[3] for key in pending}
+    period_starts = {period[2] for periods in (activity_periods, engagement_periods) for period in periods}
+    
+    if activity:
+        ActivityData.objects.bulk_create([
+            ActivityData(user_id=user_id, date=date) for _, user_id, _, date in activity
+        ], ignore_conflicts=True)
+        ActivityRollup.objects.bulk_create([
+            ActivityRollup(user_id=user_id, resolution=resolution, period_start=period_start)
+            for user_id, resolution, period_start in activity_periods
+        ], ignore_conflicts=True)
+        recomputed = {
+            (ACTIVITY, user_id, None, date): recomputed_at
+            for user_id, date, recomputed_at in ActivityData.objects.select_for_update().filter(
+                user_id__in=user_ids, date__in=dates
+            ).values_list('user_id', 'date', 'recomputed_at')
+        }
+        period_recomputed = {
+            (user_id, resolution, period_start): recomputed_at
+            for user_id, resolution, period_start, recomputed_at in ActivityRollup.objects.select_for_update().filter(
+                user_id__in=user_ids, period_start__in=period_starts
+            ).values_list('user_id', 'resolution', 'period_start', 'recomputed_at')
+        }
+        
+        for key, increments in activity.items():
+            counts = sum_increments_since(increments, recomputed.get(key))
+            if counts:
+                _, user_id, _, date = key
+                ActivityData.objects.filter(user_id=user_id, date=date).update(**get_activity_changes(counts))
+        for period, increments in activity_periods.items():
+            counts = sum_increments_since(increments, period_recomputed.get(period))
+            if counts:
+                user_id, resolution, period_start = period
+                ActivityRollup.objects.filter(
+                    user_id=user_id, resolution=resolution, period_start=period_start
+                ).update(**get_activity_changes(counts))
+    
+    if engagement:
+        EngagementBreakdown.objects.bulk_create([
+            EngagementBreakdown(user_id=user_id, giveaway_id=giveaway_id, date=date)
+            for _, user_id, giveaway_id, date in engagement
+        ], ignore_conflicts=True)
+        EngagementRollup.objects.bulk_create([
+            EngagementRollup(user_id=user_id, resolution=resolution, period_start=period_start)
+            for user_id, resolution, period_start in engagement_periods
+        ], ignore_conflicts=True)
+        recomputed = {
+            (ENGAGEMENT, user_id, giveaway_id, date): recomputed_at
+            for user_id, giveaway_id, date, recomputed_at in EngagementBreakdown.objects.select_for_update().filter(
+                user_id__in=user_ids, date__in=dates
+            ).values_list('user_id', 'giveaway_id', 'date', 'recomputed_at')
+        }
+        period_recomputed = {
+            (user_id, resolution, period_start): recomputed_at
+            for user_id, resolution, period_start, recomputed_at in EngagementRollup.objects.select_for_update().filter(
+                user_id__in=user_ids, period_start__in=period_starts
+            ).values_list('user_id', 'resolution', 'period_start', 'recomputed_at')
+        }
+        
+        for key, increments in engagement.items():
+            changes = get_engagement_changes(sum_increments_since(increments, recomputed.get(key)))
+            if changes:
+                _, user_id, giveaway_id, date = key
+                EngagementBreakdown.objects.filter(user_id=user_id, giveaway_id=giveaway_id, date=date).update(**changes)
+        for period, increments in engagement_periods.items():
+            changes = get_engagement_changes(sum_increments_since(increments, period_recomputed.get(period)))
+            if changes:
+                user_id, resolution, period_start = period
+                EngagementRollup.objects.filter(
+                    user_id=user_id, resolution=resolution, period_start=period_start
+                ).update(**changes)
+
+
+rollup_buffer = RollupBuffer()
+atexit.register(rollup_buffer.flush)
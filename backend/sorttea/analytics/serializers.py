@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import ActivityData, OverviewStats, EngagementBreakdown
+from django.urls import reverse
+from .models import ActivityData, OverviewStats, EngagementBreakdown, ReportExport
 
 class ActivityDataSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,7 +15,8 @@ class OverviewStatsSerializer(serializers.ModelSerializer):
             'active_giveaways',
             'total_participants',
             'total_engagement',
-            'completion_rate'
+            'completion_rate',
+            'last_updated'
         ]
 
 class EngagementBreakdownSerializer(serializers.ModelSerializer):
@@ -29,4 +31,39 @@ class TimeseriesDataSerializer(serializers.Serializer):
     date = serializers.DateField()
     participants = serializers.IntegerField()
     engagement = serializers.IntegerField()
-    completion_rate = serializers.FloatField() 
\ No newline at end of file
+    completion_rate = serializers.FloatField()
+
+class ReportExportSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background report exports, with links to poll and download them
+    """
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportExport
+        fields = [
+            'job_id',
+            'format',
+            'status',
+            'start_date',
+            'end_date',
+            'created_at',
+            'completed_at',
+            'error',
+            'status_url',
+            'download_url'
+        ]
+    
+    def _build_url(self, name, export):
+        url = reverse(name, args=[export.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_status_url(self, export):
+        return self._build_url('report-export-status', export)
+    
+    def get_download_url(self, export):
+        # Known up front, but only serves the file once the export has completed
+        return self._build_url('report-export-download', export)
@@ -0,0 +1,802 @@
+"""
+Service layer for analytics computations.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Avg, Case, Count, Exists, ExpressionWrapper, F, FloatField, Max, Min, OuterRef, Q, Sum, Value, When
+)
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from sorttea.giveaway.models import Giveaway, Entry
+from .models import (
+    ActivityData, ActivityRollup, EngagementBreakdown, EngagementRollup, OverviewStats, ReportExport, RollupState
+)
+from .reports import ENGAGEMENT_FIELDS, write_pdf_report
+
+logger = logging.getLogger('sorttea.analytics')
+
+DAILY_ROLLUP = 'daily'
+
+VERIFIED = Q(verification_status='verified')
+
+# Conditions under which a verified entry counts towards each EngagementBreakdown field,
+# matching get_engagement_actions in rollups.py
+ENGAGEMENT_ACTION_FILTERS = {
+    'follows': VERIFIED & Q(giveaway__verify_follow=True, giveaway__instagram_account_to_follow__gt=''),
+    'likes': VERIFIED & Q(giveaway__verify_like=True, giveaway__instagram_post_to_like__gt=''),
+    'comments': VERIFIED & Q(giveaway__verify_comment=True, giveaway__instagram_post_to_comment__gt=''),
+    'tags': VERIFIED & Q(
+        giveaway__verify_tags=True, giveaway__required_tag_count__gt=0, giveaway__instagram_post_to_comment__gt=''
+    ),
+}
+
+# Timeseries bucket sizes, with the longest range (in buckets) served for each
+TIMESERIES_TRUNCATIONS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+TIMESERIES_MAX_BUCKETS = {'day': 366, 'week': 260, 'month': 120}
+
+# Resolutions of the ActivityRollup and EngagementRollup tables, coarsest first
+ROLLUP_RESOLUTIONS = ('month', 'week')
+
+# Values summed from the activity and engagement rollups
+ACTIVITY_TOTALS = {
+    'participants': F('participants'),
+    'engagement': F('engagement'),
+    'weighted_completion': ExpressionWrapper(F('completion_rate') * F('participants'), output_field=FloatField()),
+}
+ENGAGEMENT_TOTALS = {field: F(field) for field in ENGAGEMENT_FIELDS}
+
+
+def delete_missing_rows(queryset, key_fields, rows):
+    """
+    Delete the rows of ``queryset`` whose ``key_fields`` match none of ``rows``.
+    
+    Used after recomputing a range, so rows whose entries are gone are
+    dropped instead of keeping their old counts. Returns the number deleted.
+    """
+    keep = {tuple(getattr(row, field) for field in key_fields) for row in rows}
+    stale_ids = [pk for pk, *key in queryset.values_list('pk', *key_fields) if tuple(key) not in keep]
+    for start in range(0, len(stale_ids), 1000):
+        queryset.model.objects.filter(pk__in=stale_ids[start:start + 1000]).delete()
+    return len(stale_ids)
+
+
+class TimeseriesRangeError(ValueError):
+    """Raised when a timeseries range or granularity can't be served."""
+
+
+def get_bucket_start(day, granularity):
+    """Get the first day of the bucket a date falls in; weeks start on Monday."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_next_bucket_start(day, granularity):
+    """Get the first day of the bucket after the one starting on ``day``."""
+    if granularity == 'week':
+        return day + timedelta(weeks=1)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def get_bucket_starts(start_date, end_date, granularity):
+    """List the first day of every bucket overlapping a date range."""
+    buckets = []
+    bucket = get_bucket_start(start_date, granularity)
+    while bucket <= end_date:
+        buckets.append(bucket)
+        bucket = get_next_bucket_start(bucket, granularity)
+    return buckets
+
+
+def split_into_periods(start_date, end_date, resolution):
+    """
+    Split a date range around the whole weeks or months it contains.
+    
+    Returns ``(whole, rest)``: the first and last start of the periods lying
+    entirely inside the range, or None if there are none, and the list of
+    ``(start, end)`` ranges left over before and after them.
+    """
+    first = get_bucket_start(start_date, resolution)
+    if first != start_date:
+        first = get_next_bucket_start(first, resolution)
+    end = get_bucket_start(end_date, resolution)
+    if get_next_bucket_start(end, resolution) - timedelta(days=1) == end_date:
+        end = get_next_bucket_start(end, resolution)
+    
+    if first >= end:
+        return None, [(start_date, end_date)]
+    
+    rest = []
+    if start_date < first:
+        rest.append((start_date, first - timedelta(days=1)))
+    if end <= end_date:
+        rest.append((end, end_date))
+    last = end - timedelta(days=1)
+    return (first, get_bucket_start(last, resolution)), rest
+
+
+def plan_rollup_reads(start_date, end_date):
+    """
+    Choose the coarsest rollup rows that add up to exactly a date range.
+    
+    Whole months are read from the month rows, whole weeks in what is left
+    from the week rows and the remaining days from the daily rows. Returns
+    a dict of ``(first, last)`` ranges per resolution: period starts for
+    ``month`` and ``week`` and dates for ``day``.
+    """
+    plan = {}
+    remaining = [(start_date, end_date)]
+    for resolution in ROLLUP_RESOLUTIONS:
+        plan[resolution] = []
+        leftover = []
+        for start, end in remaining:
+            whole, rest = split_into_periods(start, end, resolution)
+            if whole:
+                plan[resolution].append(whole)
+            leftover.extend(rest)
+        remaining = leftover
+    plan['day'] = remaining
+    return plan
+
+
+def get_rollup_filters(start_date, end_date):
+    """
+    Get the filters selecting the rows ``plan_rollup_reads`` picks for a date range.
+    
+    Returns ``(daily, periods)``: a filter on the daily tables and one on the
+    week and month tables, each None when that table isn't needed.
+    """
+    plan = plan_rollup_reads(start_date, end_date)
+    daily = periods = None
+    for first, last in plan['day']:
+        condition = Q(date__gte=first, date__lte=last)
+        daily = condition if daily is None else daily | condition
+    for resolution in ROLLUP_RESOLUTIONS:
+        for first, last in plan[resolution]:
+            condition = Q(resolution=resolution, period_start__gte=first, period_start__lte=last)
+            periods = condition if periods is None else periods | condition
+    return daily, periods
+
+
+def sum_rollups(user, daily_model, period_model, ranges, totals):
+    """
+    Sum a creator's rollup rows over named date ranges.
+    
+    Each range is read at the coarsest resolutions that cover it, with one
+    conditional aggregate over the daily table and one over the week and
+    month table for all ranges together. ``ranges`` maps names to
+    ``(start, end)`` and ``totals`` maps names to the expressions to sum,
+    like ``ACTIVITY_TOTALS``. Returns the sums keyed ``<total>_<range>``.
+    """
+    sums = {f'{total}_{name}': 0 for total in totals for name in ranges}
+    filters = {name: get_rollup_filters(start, end) for name, (start, end) in ranges.items()}
+    
+    for model, index in ((daily_model, 0), (period_model, 1)):
+        scope = None
+        expressions = {}
+        for name, conditions in filters.items():
+            condition = conditions[index]
+            if condition is None:
+                continue
+            scope = condition if scope is None else scope | condition
+            expressions.update({
+                f'{total}_{name}': Sum(expression, filter=condition) for total, expression in totals.items()
+            })
+        
+        if expressions:
+            for key, value in model.objects.filter(scope, user=user).aggregate(**expressions).items():
+                sums[key] += value or 0
+    return sums
+
+
+def get_change_percent(current, previous):
+    """Get the change from ``previous`` to ``current`` in percent, as 100 when growing from zero."""
+    if previous:
+        return round((current - previous) * 100 / previous, 1)
+    return 100.0 if current else 0.0
+
+
+class AnalyticsService:
+    """Service for computing analytics from giveaway data."""
+    
+    @staticmethod
+    def compute_overview_stats(user):
+        """
+        Compute a creator's overview metrics in one aggregate query.
+        
+        Giveaways are joined to their entries, so giveaway counts are distinct.
+        Participants are entries, engagement is verified entries and the
+        completion rate is the percentage of entries that passed verification.
+        """
+        totals = Giveaway.objects.filter(created_by=user).aggregate(
+            total_giveaways=Count('id', distinct=True),
+            active_giveaways=Count('id', filter=Q(status='active'), distinct=True),
+            total_participants=Count('entries'),
+            total_engagement=Count('entries', filter=Q(entries__verification_status='verified')),
+            completion_rate=Avg(Case(
+                When(entries__verification_status='verified', then=Value(100.0)),
+                When(entries__isnull=False, then=Value(0.0)),
+                output_field=FloatField()
+            ))
+        )
+        totals['completion_rate'] = round(totals['completion_rate'] or 0, 2)
+        return totals
+    
+    @staticmethod
+    def refresh_overview_stats(user, stats=None):
+        """Recompute and save a creator's overview stats."""
+        if stats is None:
+            stats, _ = OverviewStats.objects.get_or_create(user=user)
+        
+        for field, value in AnalyticsService.compute_overview_stats(user).items():
+            setattr(stats, field, value)
+        stats.last_updated = timezone.now()
+        stats.save()
+        return stats
+    
+    @staticmethod
+    def get_overview_stats(user):
+        """
+        Get a creator's overview stats without waiting on a recomputation.
+        
+        Stats are only computed inline the first time. After that, stats older
+        than ``ANALYTICS_OVERVIEW_MAX_AGE_SECONDS`` are served as they are while
+        a background refresh recomputes them. Returns ``(stats, refreshing)``.
+        """
+        stats, created = OverviewStats.objects.get_or_create(user=user)
+        if created:
+            return AnalyticsService.refresh_overview_stats(user, stats), False
+        
+        if (timezone.now() - stats.last_updated).total_seconds() < settings.ANALYTICS_OVERVIEW_MAX_AGE_SECONDS:
+            return stats, False
+        
+        AnalyticsService.schedule_overview_refresh(user.id)
+        return stats, True
+    
+    @staticmethod
+    def get_overview_refresh_lock_key(user_id):
+        """Get the cache key guarding a creator's queued overview refresh."""
+        return f'analytics:overview-refresh:{user_id}'
+    
+    @staticmethod
+    def schedule_overview_refresh(user_id):
+        """
+        Queue a background refresh of a creator's overview stats.
+        
+        A per-user lock in the cache stops concurrent requests for stale stats
+        from each queueing a refresh; the task releases it when done, and it
+        expires after ``ANALYTICS_OVERVIEW_REFRESH_LOCK_SECONDS`` in case the
+        task never runs. Returns False when a refresh was already queued.
+        """
+        from .tasks import refresh_overview_stats
+        
+        lock_key = AnalyticsService.get_overview_refresh_lock_key(user_id)
+        if not cache.add(lock_key, 1, timeout=settings.ANALYTICS_OVERVIEW_REFRESH_LOCK_SECONDS):
+            return False
+        
+        def enqueue():
+            try:
+                refresh_overview_stats.delay(user_id)
+            except Exception as e:
+                # Let the next request try again rather than waiting out the lock
+                cache.delete(lock_key)
+                logger.error(f"Could not queue overview stats refresh for user {user_id}: {str(e)}")
+        
+        transaction.on_commit(enqueue)
+        return True
+    
+    @staticmethod
+    def release_overview_refresh_lock(user_id):
+        """Allow another overview stats refresh to be queued for a creator."""
+        cache.delete(AnalyticsService.get_overview_refresh_lock_key(user_id))
+    
+    @staticmethod
+    def rollup_daily_activity(full=False, batch_size=None):
+        """
+        Bring the rollup tables up to date with entry changes since the last run.
+        
+        Entries are read in batches of ``ANALYTICS_ROLLUP_BATCH_SIZE`` changes in
+        ``updated_at`` order. For each batch, the creators and days (by entry
+        creation date) it touches are recomputed from scratch with one grouped
+        query per table over that day range, and upserted with
+        ``bulk_create(update_conflicts=True)``; the week and month rollups
+        containing those days are then recomputed from the daily rows. Each
+        batch commits together with the advanced watermark, so an interrupted
+        run resumes where it stopped. Every run re-reads
+        ``ANALYTICS_ROLLUP_OVERLAP_MINUTES`` before the watermark to catch
+        entries committed late; recomputing is idempotent. ``full`` ignores the
+        watermark, rebuilds from every entry and deletes rows with no entries
+        behind them.
+        Returns counts of batches and rows written or deleted and the new watermark.
+        """
+        batch_size = batch_size or settings.ANALYTICS_ROLLUP_BATCH_SIZE
+        state, _ = RollupState.objects.get_or_create(name=DAILY_ROLLUP)
+        cursor = None
+        if state.watermark and not full:
+            cursor = state.watermark - timedelta(minutes=settings.ANALYTICS_ROLLUP_OVERLAP_MINUTES)
+        
+        summary = {
+            'batches': 0, 'activity_rows': 0, 'engagement_rows': 0, 'period_rows': 0, 'deleted_rows': 0,
+            'watermark': state.watermark
+        }
+        
+        while True:
+            changed = Entry.objects.all()
+            if cursor is not None:
+                changed = changed.filter(updated_at__gt=cursor)
+            # The batch ends at the updated_at of its last change and includes ties with it
+            cutoff = changed.order_by('updated_at').values_list('updated_at', flat=True)[batch_size - 1:batch_size].first()
+            if cutoff is not None:
+                changed = changed.filter(updated_at__lte=cutoff)
+            
+            bounds = changed.aggregate(first_day=Min(TruncDate('created_at')), last_day=Max(TruncDate('created_at')))
+            if bounds['first_day'] is None:
+                break
+            
+            with transaction.atomic():
+                # Serializes concurrent runs; the loser waits and continues from the new watermark
+                state = RollupState.objects.select_for_update().get(pk=state.pk)
+                user_ids = set(changed.values_list('giveaway__created_by_id', flat=True).distinct())
+                activity_rows, engagement_rows = AnalyticsService.recompute_daily_rows(
+                    user_ids, bounds['first_day'], bounds['last_day']
+                )
+                period_rows = AnalyticsService.recompute_period_rows(user_ids, bounds['first_day'], bounds['last_day'])
+                batch_watermark = cutoff or changed.aggregate(last=Max('updated_at'))['last']
+                state.watermark = max(batch_watermark, state.watermark) if state.watermark else batch_watermark
+                state.last_run_at = timezone.now()
+                state.save(update_fields=['watermark', 'last_run_at'])
+            
+            summary['batches'] += 1
+            summary['activity_rows'] += activity_rows
+            summary['engagement_rows'] += engagement_rows
+            summary['period_rows'] += period_rows
+            summary['watermark'] = state.watermark
+            logger.info(
+                f"Rolled up {activity_rows} activity and {engagement_rows} engagement rows "
+                f"for {len(user_ids)} creators up to {batch_watermark}"
+            )
+            
+            if cutoff is None:
+                break
+            cursor = cutoff
+        
+        if full:
+            summary['deleted_rows'] = AnalyticsService.delete_orphan_rows()
+        if summary['batches'] == 0:
+            RollupState.objects.filter(pk=state.pk).update(last_run_at=timezone.now())
+        return summary
+    
+    @staticmethod
+    def delete_orphan_rows():
+        """
+        Delete daily rows with no entries behind them, then period rows with no daily rows.
+        
+        Batches only recompute the creators and days their entries touch, so
+        rows whose entries were all deleted, or that were written by hand such
+        as mock data, are only cleared here. Returns the number of rows deleted.
+        """
+        deleted, _ = ActivityData.objects.filter(~Exists(Entry.objects.filter(
+            giveaway__created_by_id=OuterRef('user_id'), created_at__date=OuterRef('date')
+        ))).delete()
+        count, _ = EngagementBreakdown.objects.filter(~Exists(Entry.objects.filter(
+            giveaway_id=OuterRef('giveaway_id'), created_at__date=OuterRef('date')
+        ))).delete()
+        deleted += count
+        
+        for resolution in ROLLUP_RESOLUTIONS:
+            truncate = TIMESERIES_TRUNCATIONS[resolution]
+            for daily_model, period_model in ((ActivityData, ActivityRollup), (EngagementBreakdown, EngagementRollup)):
+                daily_rows = daily_model.objects.annotate(period_start=truncate('date')).filter(
+                    user_id=OuterRef('user_id'), period_start=OuterRef('period_start')
+                )
+                count, _ = period_model.objects.filter(resolution=resolution).filter(~Exists(daily_rows)).delete()
+                deleted += count
+        
+        if deleted:
+            logger.info(f"Deleted {deleted} analytics rollup rows with no entries behind them")
+        return deleted
+    
+    @staticmethod
+    def recompute_daily_rows(user_ids, first_day, last_day):
+        """
+        Recompute the ActivityData and EngagementBreakdown rows of creators over a day range.
+        
+        Each table is computed with one grouped query over the creators'
+        entries and upserted in bulk, and rows in the range the query no longer
+        produces are deleted. Rows are stamped with ``recomputed_at``, taken
+        before the entries are read, so buffered increments added earlier are
+        not applied on top. Returns the number of rows written to each.
+        """
+        recomputed_at = timezone.now()
+        entries = Entry.objects.filter(
+            giveaway__created_by_id__in=user_ids,
+            created_at__date__gte=first_day,
+            created_at__date__lte=last_day
+        ).annotate(day=TruncDate('created_at'))
+        
+        activity = [
+            ActivityData(
+                user_id=row['user_id'],
+                date=row['day'],
+                participants=row['participants'],
+                engagement=row['engagement'],
+                completion_rate=round(row['engagement'] * 100 / row['participants'], 2) if row['participants'] else 0,
+                recomputed_at=recomputed_at
+            )
+            for row in entries.values('day', user_id=F('giveaway__created_by_id')).annotate(
+                participants=Count('id'),
+                engagement=Count('id', filter=VERIFIED)
+            )
+        ]
+        ActivityData.objects.bulk_create(
+            activity,
+            update_conflicts=True,
+            unique_fields=['date', 'user'],
+            update_fields=['participants', 'engagement', 'completion_rate', 'recomputed_at'],
+            batch_size=1000
+        )
+        delete_missing_rows(
+            ActivityData.objects.filter(user_id__in=user_ids, date__gte=first_day, date__lte=last_day),
+            ('user_id', 'date'),
+            activity
+        )
+        
+        engagement = [
+            EngagementBreakdown(
+                user_id=row.pop('user_id'),
+                giveaway_id=row.pop('giveaway_id'),
+                date=row.pop('day'),
+                recomputed_at=recomputed_at,
+                **row
+            )
+            for row in entries.values('day', 'giveaway_id', user_id=F('giveaway__created_by_id')).annotate(**{
+                field: Count('id', filter=condition) for field, condition in ENGAGEMENT_ACTION_FILTERS.items()
+            })
+        ]
+        EngagementBreakdown.objects.bulk_create(
+            engagement,
+            update_conflicts=True,
+            unique_fields=['date', 'user', 'giveaway'],
+            update_fields=[*ENGAGEMENT_ACTION_FILTERS, 'recomputed_at'],
+            batch_size=1000
+        )
+        delete_missing_rows(
+            EngagementBreakdown.objects.filter(user_id__in=user_ids, date__gte=first_day, date__lte=last_day),
+            ('user_id', 'giveaway_id', 'date'),
+            engagement
+        )
+        return len(activity), len(engagement)
+    
+    @staticmethod
+    def recompute_period_rows(user_ids, first_day, last_day):
+        """
+        Recompute the week and month rollups of creators covering a day range from their daily rows.
+        
+        Each resolution takes one grouped query per table over the whole
+        periods the range touches, upserted in bulk; periods left without daily
+        rows are deleted. Rows are stamped with ``recomputed_at`` like the
+        daily rows. Returns the number of rows written.
+        """
+        recomputed_at = timezone.now()
+        written = 0
+        for resolution in ROLLUP_RESOLUTIONS:
+            period_first = get_bucket_start(first_day, resolution)
+            period_last = get_next_bucket_start(get_bucket_start(last_day, resolution), resolution) - timedelta(days=1)
+            truncate = TIMESERIES_TRUNCATIONS[resolution]
+            
+            activity = [
+                ActivityRollup(
+                    user_id=row['user_id'],
+                    resolution=resolution,
+                    period_start=row['period_start'],
+                    participants=row['total_participants'],
+                    engagement=row['total_engagement'],
+                    completion_rate=round(row['total_engagement'] * 100 / row['total_participants'], 2)
+                    if row['total_participants'] else 0,
+                    recomputed_at=recomputed_at
+                )
+                for row in ActivityData.objects.filter(
+                    user_id__in=user_ids, date__gte=period_first, date__lte=period_last
+                ).annotate(period_start=truncate('date')).values('user_id', 'period_start').annotate(
+                    total_participants=Sum('participants'),
+                    total_engagement=Sum('engagement')
+                )
+            ]
+            ActivityRollup.objects.bulk_create(
+                activity,
+                update_conflicts=True,
+                unique_fields=['user', 'resolution', 'period_start'],
+                update_fields=['participants', 'engagement', 'completion_rate', 'recomputed_at'],
+                batch_size=1000
+            )
+            periods = {
+                'user_id__in': user_ids, 'resolution': resolution,
+                'period_start__gte': period_first, 'period_start__lte': period_last
+            }
+            delete_missing_rows(ActivityRollup.objects.filter(**periods), ('user_id', 'period_start'), activity)
+            
+            engagement = [
+                EngagementRollup(
+                    user_id=row['user_id'],
+                    resolution=resolution,
+                    period_start=row['period_start'],
+                    recomputed_at=recomputed_at,
+                    **{field: row[f'total_{field}'] for field in ENGAGEMENT_FIELDS}
+                )
+                for row in EngagementBreakdown.objects.filter(
+                    user_id__in=user_ids, date__gte=period_first, date__lte=period_last
+                ).annotate(period_start=truncate('date')).values('user_id', 'period_start').annotate(**{
+                    f'total_{field}': Sum(field) for field in ENGAGEMENT_FIELDS
+                })
+            ]
+            EngagementRollup.objects.bulk_create(
+                engagement,
+                update_conflicts=True,
+                unique_fields=['user', 'resolution', 'period_start'],
+                update_fields=[*ENGAGEMENT_FIELDS, 'recomputed_at'],
+                batch_size=1000
+            )
+            delete_missing_rows(EngagementRollup.objects.filter(**periods), ('user_id', 'period_start'), engagement)
+            written += len(activity) + len(engagement)
+        return written
+    
+    @staticmethod
+    def get_activity_timeseries(user, start_date, end_date, granularity='day'):
+        """
+        Get a creator's activity per day, week or month over a date range.
+        
+        Weeks and months lying entirely inside the range are read from their
+        rollup rows, and partial buckets at either end (or every day, at day
+        granularity) are summed from daily rows in the database. Buckets
+        without activity are filled with zeros. Completion rates are averaged weighted
+        by participants. Returns an empty list when the range has no activity
+        at all, and raises ``TimeseriesRangeError`` for an unknown granularity
+        or a range longer than ``TIMESERIES_MAX_BUCKETS`` allows.
+        """
+        if granularity not in TIMESERIES_TRUNCATIONS:
+            raise TimeseriesRangeError(f"granularity must be one of {', '.join(TIMESERIES_TRUNCATIONS)}")
+        if start_date > end_date:
+            raise TimeseriesRangeError("startDate must not be after endDate")
+        
+        buckets = get_bucket_starts(start_date, end_date, granularity)
+        if len(buckets) > TIMESERIES_MAX_BUCKETS[granularity]:
+            raise TimeseriesRangeError(
+                f"Ranges are limited to {TIMESERIES_MAX_BUCKETS[granularity]} {granularity}s at {granularity} granularity; "
+                f"use a coarser granularity for longer ranges"
+            )
+        
+        rows = {}
+        daily_ranges = [(start_date, end_date)]
+        if granularity != 'day':
+            # Whole weeks or months are read from their rollup rows; only the
+            # partial buckets at either end are summed from daily rows
+            whole, daily_ranges = split_into_periods(start_date, end_date, granularity)
+            if whole:
+                for row in ActivityRollup.objects.filter(
+                    user=user, resolution=granularity, period_start__gte=whole[0], period_start__lte=whole[1]
+                ).values('period_start', 'participants', 'engagement', 'completion_rate'):
+                    rows[row['period_start']] = {
+                        'total_participants': row['participants'],
+                        'total_engagement': row['engagement'],
+                        'weighted_completion': row['completion_rate'] * row['participants'],
+                        'average_completion': row['completion_rate'],
+                    }
+        
+        if daily_ranges:
+            in_range = Q()
+            for first, last in daily_ranges:
+                in_range |= Q(date__gte=first, date__lte=last)
+            rows.update({
+                row['bucket']: row
+                for row in ActivityData.objects.filter(in_range, user=user)
+                .annotate(bucket=TIMESERIES_TRUNCATIONS[granularity]('date'))
+                .values('bucket')
+                .annotate(
+                    total_participants=Sum('participants'),
+                    total_engagement=Sum('engagement'),
+                    weighted_completion=Sum(F('completion_rate') * F('participants'), output_field=FloatField()),
+                    average_completion=Avg('completion_rate')
+                )
+                .order_by('bucket')
+            })
+        if not rows:
+            return []
+        
+        series = []
+        for bucket in buckets:
+            row = rows.get(bucket)
+            if row is None:
+                series.append({'date': bucket, 'participants': 0, 'engagement': 0, 'completion_rate': 0})
+                continue
+            
+            participants = row['total_participants'] or 0
+            completion_rate = row['weighted_completion'] / participants if participants else row['average_completion']
+            series.append({
+                'date': bucket,
+                'participants': participants,
+                'engagement': row['total_engagement'] or 0,
+                'completion_rate': round(completion_rate or 0, 2),
+            })
+        return series
+    
+    @staticmethod
+    def get_period_comparison(user, start_date, end_date):
+        """
+        Compare a creator's activity and engagement over a date range with the period before it.
+        
+        The previous period is as long as the requested one and ends the day
+        before it starts. Both periods are summed by one conditional aggregate
+        per rollup table, reading whole months and weeks from the period
+        tables, so only the totals leave the database. Results are cached per
+        creator and range for ``ANALYTICS_COMPARISON_CACHE_SECONDS``.
+        """
+        cache_key = f'analytics:comparison:{user.id}:{start_date.isoformat()}:{end_date.isoformat()}'
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        previous_end = start_date - timedelta(days=1)
+        previous_start = previous_end - (end_date - start_date)
+        periods = {'current': (start_date, end_date), 'previous': (previous_start, previous_end)}
+        
+        totals = {
+            **sum_rollups(user, ActivityData, ActivityRollup, periods, ACTIVITY_TOTALS),
+            **sum_rollups(user, EngagementBreakdown, EngagementRollup, periods, ENGAGEMENT_TOTALS),
+        }
+        for period in periods:
+            # Weighted by participants, like the timeseries
+            participants = totals[f'participants_{period}']
+            completion_rate = totals[f'weighted_completion_{period}'] / participants if participants else 0
+            totals[f'completion_rate_{period}'] = round(completion_rate, 2)
+        
+        metrics = {}
+        for metric in ('participants', 'engagement', 'completion_rate') + ENGAGEMENT_FIELDS:
+            current, previous = totals[f'{metric}_current'], totals[f'{metric}_previous']
+            metrics[metric] = {
+                'current': current,
+                'previous': previous,
+                'change': round(current - previous, 2),
+                'changePercent': get_change_percent(current, previous),
+            }
+        
+        comparison = {
+            'current_period': {'start_date': start_date, 'end_date': end_date},
+            'previous_period': {'start_date': previous_start, 'end_date': previous_end},
+            'metrics': metrics,
+        }
+        cache.set(cache_key, comparison, timeout=settings.ANALYTICS_COMPARISON_CACHE_SECONDS)
+        return comparison
+    
+    @staticmethod
+    def get_engagement_breakdown(user, start_date, end_date):
+        """Get a creator's engagement by type over a date range, read from the coarsest rollups that cover it."""
+        totals = sum_rollups(user, EngagementBreakdown, EngagementRollup, {'range': (start_date, end_date)}, ENGAGEMENT_TOTALS)
+        return {field: totals[f'{field}_range'] for field in ENGAGEMENT_FIELDS}
+    
+    @staticmethod
+    def get_leaderboard_version_key(user_id):
+        """Get the cache key of a creator's leaderboard version."""
+        return f'analytics:top-giveaways-version:{user_id}'
+    
+    @staticmethod
+    def invalidate_top_giveaways(user_id, debounce=False):
+        """
+        Drop a creator's cached leaderboards by moving them to a new cache version.
+        
+        With ``debounce``, invalidations within ``ANALYTICS_LEADERBOARD_DEBOUNCE_SECONDS``
+        of the last debounced one are skipped, so a busy giveaway doesn't keep
+        its creator's leaderboard from ever being served from cache. Skipped
+        changes show once the cached leaderboard expires.
+        """
+        if debounce and not cache.add(
+            f'analytics:top-giveaways-debounce:{user_id}', 1, timeout=settings.ANALYTICS_LEADERBOARD_DEBOUNCE_SECONDS
+        ):
+            return
+        
+        key = AnalyticsService.get_leaderboard_version_key(user_id)
+        if cache.add(key, 2, timeout=None):
+            return
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, 2, timeout=None)
+    
+    @staticmethod
+    def get_top_giveaways(user, limit=5, days=30):
+        """
+        Rank a creator's giveaways by participants, then verified engagement.
+        
+        Participants, engagement and the new entries of the last ``days`` and
+        of the ``days`` before that come from one grouped query over entries,
+        using conditional counts; ``changePercent`` compares the two periods.
+        Results are cached per creator under a version that entry and giveaway
+        changes bump, and for at most ``ANALYTICS_LEADERBOARD_CACHE_SECONDS``.
+        """
+        version = cache.get(AnalyticsService.get_leaderboard_version_key(user.id), 1)
+        cache_key = f'analytics:top-giveaways:{user.id}:{version}:{limit}:{days}'
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        now = timezone.now()
+        period_start = now - timedelta(days=days)
+        previous_start = period_start - timedelta(days=days)
+        
+        ranked = (
+            Giveaway.objects.filter(created_by=user)
+            .annotate(
+                participants=Count('entries'),
+                engagement=Count('entries', filter=Q(entries__verification_status='verified')),
+                current_entries=Count('entries', filter=Q(entries__created_at__gte=period_start)),
+                previous_entries=Count('entries', filter=Q(
+                    entries__created_at__gte=previous_start, entries__created_at__lt=period_start
+                ))
+            )
+            .order_by('-participants', '-engagement', '-created_at')
+            .values('id', 'title', 'participants', 'engagement', 'current_entries', 'previous_entries')[:limit]
+        )
+        
+        leaderboard = []
+        for row in ranked:
+            leaderboard.append({
+                'id': str(row['id']),
+                'title': row['title'],
+                'participants': row['participants'],
+                'engagement': row['engagement'],
+                'changePercent': get_change_percent(row['current_entries'], row['previous_entries']),
+            })
+        
+        cache.set(cache_key, leaderboard, timeout=settings.ANALYTICS_LEADERBOARD_CACHE_SECONDS)
+        return leaderboard
+    
+    @staticmethod
+    def start_report_export(user, start_date, end_date, format='pdf'):
+        """
+        Record a report export and queue the job that renders it.
+        
+        The job is queued once the export is committed; if it can't be
+        queued, the export is marked as failed.
+        """
+        from .tasks import generate_report_export
+        
+        export = ReportExport.objects.create(user=user, format=format, start_date=start_date, end_date=end_date)
+        
+        def enqueue():
+            try:
+                generate_report_export.delay(str(export.id))
+            except Exception as e:
+                ReportExport.objects.filter(id=export.id).update(
+                    status='failed', error='The export could not be queued', completed_at=timezone.now()
+                )
+                logger.error(f"Could not queue report export {export.id}: {str(e)}")
+        
+        transaction.on_commit(enqueue)
+        return export
+    
+    @staticmethod
+    def run_report_export(export):
+        """Render a report export to its file, recording whether it succeeded."""
+        export.status = 'running'
+        export.save(update_fields=['status'])
+        
+        try:
+            write_pdf_report(export)
+            export.status = 'completed'
+        except Exception as e:
+            logger.error(f"Report export {export.id} failed: {str(e)}")
+            export.status = 'failed'
+            export.error = str(e)
+        
+        export.completed_at = timezone.now()
+        export.save(update_fields=['status', 'file', 'error', 'completed_at'])
+        return export
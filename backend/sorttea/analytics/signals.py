@@ -0,0 +1,92 @@
+"""
+Signal receivers for the Analytics app.
+"""
+
+import logging
+from celery.signals import task_postrun
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from sorttea.giveaway.models import Entry, Giveaway
+from sorttea.giveaway.signals import entry_status_changed
+from .rollups import get_cohort_date, get_engagement_actions, rollup_buffer
+from .services import AnalyticsService
+
+logger = logging.getLogger('sorttea.analytics')
+
+
+@receiver(post_save, sender=Entry)
+def count_new_entry(sender, instance, created, **kwargs):
+    """Count a new entry as a participant on the creator's daily activity."""
+    if not created:
+        return
+    
+    user_id = instance.giveaway.created_by_id
+    date = get_cohort_date(instance)
+    transaction.on_commit(lambda: rollup_buffer.add_activity(user_id, date, participants=1))
+
+
+@receiver(entry_status_changed)
+def count_verification_change(sender, entry, previous_status, **kwargs):
+    """
+    Count entries gaining or losing verified status as engagement.
+    
+    Engagement is attributed to the day the entry was created, matching the
+    participant it was counted as, so daily completion rates stay consistent.
+    """
+    if 'verified' not in (previous_status, entry.verification_status):
+        return
+    
+    delta = 1 if entry.verification_status == 'verified' else -1
+    giveaway = entry.giveaway
+    user_id = giveaway.created_by_id
+    date = get_cohort_date(entry)
+    actions = get_engagement_actions(giveaway)
+    
+    def add():
+        rollup_buffer.add_activity(user_id, date, engagement=delta)
+        if actions:
+            rollup_buffer.add_engagement(user_id, giveaway.id, date, **{action: delta for action in actions})
+    
+    transaction.on_commit(add)
+
+
+@receiver(post_save, sender=Entry)
+def invalidate_leaderboard_for_new_entry(sender, instance, created, **kwargs):
+    """
+    Invalidate the creator's cached leaderboard once a new entry commits, debounced.
+    
+    Other entry saves, such as retry bookkeeping and claims, don't change the
+    ranking. Entry deletes are left to the cache timeout; a receiver for them
+    would stop giveaway deletes from cascading to entries in bulk.
+    """
+    if not created:
+        return
+    
+    user_id = instance.giveaway.created_by_id
+    transaction.on_commit(lambda: AnalyticsService.invalidate_top_giveaways(user_id, debounce=True))
+
+
+@receiver(entry_status_changed)
+def invalidate_leaderboard_for_verification(sender, entry, previous_status, **kwargs):
+    """Invalidate the creator's cached leaderboard, debounced, once an entry gains or loses verified status."""
+    if 'verified' not in (previous_status, entry.verification_status):
+        return
+    
+    user_id = entry.giveaway.created_by_id
+    transaction.on_commit(lambda: AnalyticsService.invalidate_top_giveaways(user_id, debounce=True))
+
+
+@receiver(post_save, sender=Giveaway)
+@receiver(post_delete, sender=Giveaway)
+def invalidate_leaderboard_for_giveaway(sender, instance, **kwargs):
+    """Invalidate the creator's cached leaderboard once a giveaway change commits."""
+    transaction.on_commit(lambda: AnalyticsService.invalidate_top_giveaways(instance.created_by_id))
+
+
+@receiver(request_finished)
+@receiver(task_postrun)
+def flush_rollups(**kwargs):
+    """Write buffered rollup increments once they are due, even if no further events arrive."""
+    rollup_buffer.flush_if_due()
@@ -0,0 +1,42 @@
+"""
+Celery tasks for the Analytics app.
+"""
+
+import logging
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from .models import ReportExport
+from .services import AnalyticsService
+
+logger = logging.getLogger('sorttea.analytics')
+
+
+@shared_task(ignore_result=True)
+def refresh_overview_stats(user_id):
+    """Recompute a creator's overview stats in the background."""
+    try:
+        user = get_user_model().objects.get(id=user_id)
+        AnalyticsService.refresh_overview_stats(user)
+    except get_user_model().DoesNotExist:
+        logger.warning(f"Skipping overview stats refresh for missing user {user_id}")
+    finally:
+        AnalyticsService.release_overview_refresh_lock(user_id)
+
+
+@shared_task(ignore_result=True)
+def rollup_daily_analytics():
+    """Nightly catch-up of the daily analytics rollups from entry changes."""
+    summary = AnalyticsService.rollup_daily_activity()
+    logger.info(f"Daily analytics rollup finished: {summary}")
+
+
+@shared_task(ignore_result=True)
+def generate_report_export(export_id):
+    """Render a queued report export to a file in media storage."""
+    try:
+        export = ReportExport.objects.select_related('user').get(id=export_id, status='pending')
+    except ReportExport.DoesNotExist:
+        logger.warning(f"Skipping report export {export_id}: missing or already run")
+        return
+    
+    AnalyticsService.run_report_export(export)
@@ -1,3 +1,734 @@
-from django.test import TestCase
+"""
+Tests for the Analytics app.
+"""
 
-# Create your tests here.
+import csv
+import shutil
+import tempfile
+from datetime import date, timedelta
+from importlib import import_module
+from unittest.mock import patch
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from io import BytesIO, StringIO
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from sorttea.giveaway.models import Giveaway, Entry
+from .models import (
+    ActivityData, ActivityRollup, EngagementBreakdown, EngagementRollup, OverviewStats, ReportExport, RollupState
+)
+from .rollups import rollup_buffer
+from .services import AnalyticsService, TimeseriesRangeError, get_bucket_start, plan_rollup_reads
+from .reports import PDFWriter, iter_report_rows
+from .tasks import generate_report_export, refresh_overview_stats
+
+User = get_user_model()
+
+
+def make_giveaway(user, status='active', **kwargs):
+    """Create a giveaway for ``user``."""
+    return Giveaway.objects.create(
+        title=kwargs.pop('title', 'Test Giveaway'),
+        description='Test description',
+        created_by=user,
+        start_date=timezone.now() - timedelta(days=1),
+        end_date=timezone.now() + timedelta(days=1),
+        status=status,
+        prize_description='Test Prize',
+        **kwargs
+    )
+
+
+def make_entries(giveaway, statuses):
+    """Create one entry per verification status."""
+    Entry.objects.bulk_create([
+        Entry(giveaway=giveaway, instagram_username=f'entrant{i}', verification_status=status)
+        for i, status in enumerate(statuses)
+    ])
+
+
+class OverviewStatsTests(TestCase):
+    """Tests for the overview statistics."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        make_entries(make_giveaway(self.user, 'active'), ['verified', 'verified', 'failed', 'pending'])
+        make_entries(make_giveaway(self.user, 'ended'), ['verified', 'failed'])
+        make_giveaway(self.user, 'draft')
+        
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        make_entries(make_giveaway(other, 'active'), ['verified'])
+    
+    def test_overview_is_one_aggregate_query(self):
+        """Test that every overview metric comes from a single query."""
+        with self.assertNumQueries(1):
+            stats = AnalyticsService.compute_overview_stats(self.user)
+        
+        self.assertEqual(stats, {
+            'total_giveaways': 3,
+            'active_giveaways': 1,
+            'total_participants': 6,
+            'total_engagement': 3,
+            'completion_rate': 50.0,
+        })
+    
+    def test_creator_without_entries(self):
+        """Test that giveaways without entries give zero totals rather than nulls."""
+        user = User.objects.create_user(username='new', email='new@example.com', password='testpass123')
+        make_giveaway(user, 'draft')
+        
+        stats = AnalyticsService.compute_overview_stats(user)
+        
+        self.assertEqual(stats['total_giveaways'], 1)
+        self.assertEqual(stats['total_participants'], 0)
+        self.assertEqual(stats['completion_rate'], 0)
+    
+    def test_overview_endpoint(self):
+        """Test that the overview endpoint returns the computed stats."""
+        self.client.force_login(self.user)
+        
+        response = self.client.get(reverse('overview-stats'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_participants'], 6)
+        self.assertEqual(response.json()['total_engagement'], 3)
+        self.assertEqual(OverviewStats.objects.get(user=self.user).completion_rate, 50.0)
+        self.assertFalse(response.json()['refreshing'])
+    
+    @patch('sorttea.analytics.tasks.refresh_overview_stats.delay')
+    def test_stale_stats_are_served_while_refreshing(self, mock_delay):
+        """Test that stale stats are returned at once and concurrent requests queue one refresh."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        OverviewStats.objects.create(
+            user=self.user, total_participants=1, last_updated=timezone.now() - timedelta(hours=2)
+        )
+        self.client.force_login(self.user)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.get(reverse('overview-stats')).json()
+            second = self.client.get(reverse('overview-stats')).json()
+        
+        self.assertEqual(first['total_participants'], 1)
+        self.assertTrue(first['refreshing'])
+        self.assertGreaterEqual(first['age_seconds'], 7200)
+        self.assertTrue(second['refreshing'])
+        mock_delay.assert_called_once_with(self.user.id)
+        
+        refresh_overview_stats(self.user.id)
+        
+        response = self.client.get(reverse('overview-stats')).json()
+        self.assertEqual(response['total_participants'], 6)
+        self.assertFalse(response['refreshing'])
+        # The finished refresh released the lock, so the next stale read can queue another
+        self.assertTrue(AnalyticsService.schedule_overview_refresh(self.user.id))
+
+
+@override_settings(ANALYTICS_ROLLUP_FLUSH_SECONDS=0)
+class RollupTests(TestCase):
+    """Tests for event-driven analytics rollups."""
+    
+    def setUp(self):
+        """Set up test data."""
+        rollup_buffer.flush()
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        self.giveaway = make_giveaway(
+            self.user, instagram_account_to_follow='creator', instagram_post_to_like='media1'
+        )
+        self.today = timezone.localdate()
+    
+    def create_entry(self, username):
+        """Create an entry and run the rollups queued on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return Entry.objects.create(giveaway=self.giveaway, instagram_username=username)
+    
+    def test_entries_and_verification_changes_are_rolled_up(self):
+        """Test that new entries count as participants and verified entries as engagement."""
+        first = self.create_entry('entrant1')
+        second = self.create_entry('entrant2')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.mark_verified()
+            second.mark_verified()
+        with self.captureOnCommitCallbacks(execute=True):
+            second.mark_failed()
+        
+        activity = ActivityData.objects.get(user=self.user, date=self.today)
+        self.assertEqual((activity.participants, activity.engagement), (2, 1))
+        self.assertEqual(activity.completion_rate, 50.0)
+        
+        breakdown = EngagementBreakdown.objects.get(user=self.user, giveaway=self.giveaway, date=self.today)
+        self.assertEqual((breakdown.follows, breakdown.likes, breakdown.comments), (1, 1, 0))
+        
+        # The week and month the day falls in take the same increments
+        for resolution in ('week', 'month'):
+            period_start = get_bucket_start(self.today, resolution)
+            rollup = ActivityRollup.objects.get(user=self.user, resolution=resolution, period_start=period_start)
+            self.assertEqual((rollup.participants, rollup.engagement, rollup.completion_rate), (2, 1, 50.0))
+            engagement = EngagementRollup.objects.get(user=self.user, resolution=resolution, period_start=period_start)
+            self.assertEqual((engagement.follows, engagement.likes), (1, 1))
+    
+    @override_settings(ANALYTICS_ROLLUP_FLUSH_SECONDS=3600)
+    def test_increments_are_buffered_and_coalesced(self):
+        """Test that increments wait in the buffer and land as one write per row."""
+        for i in range(5):
+            self.create_entry(f'entrant{i}')
+        self.assertFalse(ActivityData.objects.exists())
+        
+        self.assertEqual(rollup_buffer.flush(), 1)
+        
+        self.assertEqual(ActivityData.objects.get(user=self.user, date=self.today).participants, 5)
+    
+    @override_settings(ANALYTICS_ROLLUP_FLUSH_SECONDS=3600)
+    def test_increments_counted_by_a_recompute_are_not_applied_again(self):
+        """Test that a flush after the nightly recompute only adds the increments buffered since."""
+        first = self.create_entry('entrant1')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.mark_verified()
+        AnalyticsService.recompute_daily_rows([self.user.id], self.today, self.today)
+        AnalyticsService.recompute_period_rows([self.user.id], self.today, self.today)
+        # Buffered for the same rows after the recompute, and flushed along with the earlier ones
+        self.create_entry('entrant2')
+        
+        self.assertEqual(rollup_buffer.flush(), 2)
+        
+        activity = ActivityData.objects.get(user=self.user, date=self.today)
+        self.assertEqual((activity.participants, activity.engagement), (2, 1))
+        breakdown = EngagementBreakdown.objects.get(user=self.user, giveaway=self.giveaway, date=self.today)
+        self.assertEqual(breakdown.follows, 1)
+        week = ActivityRollup.objects.get(
+            user=self.user, resolution='week', period_start=get_bucket_start(self.today, 'week')
+        )
+        self.assertEqual((week.participants, week.engagement), (2, 1))
+        self.assertEqual(
+            EngagementRollup.objects.get(user=self.user, resolution='week', period_start=week.period_start).follows, 1
+        )
+    
+    def test_rolled_back_entries_are_not_counted(self):
+        """Test that events from a rolled back transaction never reach the rollups."""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Entry.objects.create(giveaway=self.giveaway, instagram_username='entrant1')
+                    raise ValueError('rolled back')
+            except ValueError:
+                pass
+        
+        self.assertFalse(ActivityData.objects.exists())
+
+
+class DailyRollupJobTests(TestCase):
+    """Tests for the set-based daily rollup job."""
+    
+    def setUp(self):
+        """Set up entries over two days."""
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        self.giveaway = make_giveaway(self.user, instagram_account_to_follow='creator', instagram_post_to_like='media1')
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        
+        make_entries(self.giveaway, ['verified', 'verified', 'failed', 'pending'])
+        entries = list(Entry.objects.order_by('instagram_username'))
+        noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        changed_at = timezone.now() - timedelta(hours=1)
+        for i, entry in enumerate(entries):
+            # entrant0 and entrant1 entered yesterday; each entry changed at a distinct moment
+            Entry.objects.filter(id=entry.id).update(
+                created_at=noon - timedelta(days=1) if i < 2 else noon,
+                updated_at=changed_at + timedelta(seconds=i)
+            )
+    
+    def test_rollup_computes_daily_rows(self):
+        """Test that participants, engagement, completion and breakdowns are computed per day."""
+        summary = AnalyticsService.rollup_daily_activity()
+        
+        self.assertEqual(summary['batches'], 1)
+        yesterday = ActivityData.objects.get(user=self.user, date=self.yesterday)
+        today = ActivityData.objects.get(user=self.user, date=self.today)
+        self.assertEqual((yesterday.participants, yesterday.engagement, yesterday.completion_rate), (2, 2, 100.0))
+        self.assertEqual((today.participants, today.engagement, today.completion_rate), (2, 0, 0))
+        breakdown = EngagementBreakdown.objects.get(user=self.user, giveaway=self.giveaway, date=self.yesterday)
+        self.assertEqual((breakdown.follows, breakdown.likes, breakdown.comments), (2, 2, 0))
+    
+    @override_settings(ANALYTICS_ROLLUP_OVERLAP_MINUTES=0)
+    def test_incremental_run_only_recomputes_changed_days(self):
+        """Test that a run after the watermark only touches days with changed entries."""
+        AnalyticsService.rollup_daily_activity()
+        ActivityData.objects.filter(date=self.yesterday).update(participants=999)
+        Entry.objects.filter(instagram_username='entrant3').update(
+            verification_status='verified', updated_at=timezone.now()
+        )
+        
+        AnalyticsService.rollup_daily_activity()
+        
+        self.assertEqual(ActivityData.objects.get(date=self.yesterday).participants, 999)
+        today = ActivityData.objects.get(date=self.today)
+        self.assertEqual((today.engagement, today.completion_rate), (1, 50.0))
+    
+    def test_batches_advance_the_watermark(self):
+        """Test that small batches each commit their progress and cover every change."""
+        summary = AnalyticsService.rollup_daily_activity(batch_size=1)
+        
+        last_change = Entry.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        self.assertEqual(summary['batches'], 4)
+        self.assertEqual(RollupState.objects.get(name='daily').watermark, last_change)
+        self.assertEqual(ActivityData.objects.get(date=self.today).participants, 2)
+    
+    def test_recompute_deletes_rows_without_entries(self):
+        """Test that recomputing a range drops rows whose entries are gone."""
+        AnalyticsService.rollup_daily_activity()
+        Entry.objects.filter(instagram_username__in=['entrant2', 'entrant3']).delete()
+        
+        AnalyticsService.recompute_daily_rows([self.user.id], self.yesterday, self.today)
+        AnalyticsService.recompute_period_rows([self.user.id], self.yesterday, self.today)
+        
+        self.assertEqual(list(ActivityData.objects.values_list('date', flat=True)), [self.yesterday])
+        self.assertEqual(list(EngagementBreakdown.objects.values_list('date', flat=True)), [self.yesterday])
+        week = ActivityRollup.objects.get(resolution='week', period_start=get_bucket_start(self.yesterday, 'week'))
+        self.assertEqual(week.participants, 2)
+    
+    def test_full_rebuild_deletes_orphan_rows(self):
+        """Test that a full rebuild clears rows no entries back, such as mock data."""
+        mock_day = self.today - timedelta(days=60)
+        ActivityData.objects.create(user=self.user, date=mock_day, participants=12, engagement=20, completion_rate=60)
+        AnalyticsService.recompute_period_rows([self.user.id], mock_day, mock_day)
+        
+        summary = AnalyticsService.rollup_daily_activity(full=True)
+        
+        self.assertEqual(summary['deleted_rows'], 3)
+        self.assertFalse(ActivityData.objects.filter(date=mock_day).exists())
+        self.assertFalse(ActivityRollup.objects.filter(period_start__lte=mock_day).exists())
+        self.assertEqual(ActivityData.objects.count(), 2)
+    
+    def test_command(self):
+        """Test that the management command runs the rollup."""
+        out = StringIO()
+        call_command('generate_analytics', '--full', stdout=out)
+        
+        self.assertIn('Rolled up 2 activity and 2 engagement rows', out.getvalue())
+
+
+class TimeseriesTests(TestCase):
+    """Tests for bucketed activity timeseries."""
+    
+    def setUp(self):
+        """Set up daily activity with gaps."""
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        ActivityData.objects.bulk_create([
+            ActivityData(user=self.user, date=date(2025, 1, 6), participants=10, engagement=5, completion_rate=50.0),
+            ActivityData(user=self.user, date=date(2025, 1, 8), participants=30, engagement=30, completion_rate=100.0),
+            ActivityData(user=self.user, date=date(2025, 1, 20), participants=4, engagement=1, completion_rate=25.0),
+            ActivityData(user=self.user, date=date(2025, 2, 3), participants=2, engagement=2, completion_rate=100.0),
+        ])
+        AnalyticsService.recompute_period_rows([self.user.id], date(2025, 1, 6), date(2025, 2, 3))
+    
+    def test_weekly_buckets_are_summed_and_gap_filled(self):
+        """Test that weeks are aggregated in one query and empty weeks are zero-filled."""
+        with self.assertNumQueries(1):
+            series = AnalyticsService.get_activity_timeseries(self.user, date(2025, 1, 6), date(2025, 1, 26), 'week')
+        
+        self.assertEqual([point['date'] for point in series], [date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 20)])
+        self.assertEqual(series[0], {'date': date(2025, 1, 6), 'participants': 40, 'engagement': 35, 'completion_rate': 87.5})
+        self.assertEqual(series[1]['participants'], 0)
+        self.assertEqual(series[2]['completion_rate'], 25.0)
+    
+    def test_partial_weeks_are_summed_from_daily_rows(self):
+        """Test that partial weeks at either end of a range only count the days inside it."""
+        with self.assertNumQueries(2):
+            series = AnalyticsService.get_activity_timeseries(self.user, date(2025, 1, 8), date(2025, 1, 22), 'week')
+        
+        self.assertEqual([point['participants'] for point in series], [30, 0, 4])
+    
+    def test_daily_buckets_are_gap_filled(self):
+        """Test that days without activity are returned as zeros."""
+        series = AnalyticsService.get_activity_timeseries(self.user, date(2025, 1, 6), date(2025, 1, 8))
+        
+        self.assertEqual([point['participants'] for point in series], [10, 0, 30])
+    
+    def test_invalid_granularity_and_oversized_ranges_raise(self):
+        """Test that the service rejects unknown granularities and ranges over the bucket cap."""
+        with self.assertRaises(TimeseriesRangeError):
+            AnalyticsService.get_activity_timeseries(self.user, date(2025, 1, 6), date(2025, 1, 8), 'hour')
+        with self.assertRaises(TimeseriesRangeError):
+            AnalyticsService.get_activity_timeseries(self.user, date(2023, 1, 1), date(2025, 1, 1), 'day')
+    
+    def test_monthly_endpoint_and_range_caps(self):
+        """Test the granularity parameter and that range caps scale with it."""
+        self.client.force_login(self.user)
+        url = reverse('timeseries-data')
+        
+        response = self.client.get(url, {'startDate': '2025-01-01', 'endDate': '2025-03-31', 'granularity': 'month'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(point['date'], point['participants']) for point in response.json()],
+            [('2025-01-01', 44), ('2025-02-01', 2), ('2025-03-01', 0)]
+        )
+        
+        two_years = {'startDate': '2023-01-01', 'endDate': '2025-01-01'}
+        self.assertEqual(self.client.get(url, {**two_years, 'granularity': 'day'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {**two_years, 'granularity': 'week'}).status_code, 200)
+        self.assertEqual(self.client.get(url, {**two_years, 'granularity': 'hour'}).status_code, 400)
+    
+    def test_malformed_dates_are_rejected(self):
+        """Test that unparseable dates are a 400 rather than silently falling back to the default range."""
+        self.client.force_login(self.user)
+        url = reverse('timeseries-data')
+        
+        response = self.client.get(url, {'startDate': '2025-13-01', 'endDate': '2025-03-31'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('YYYY-MM-DD', response.json()['error'])
+        self.assertEqual(self.client.get(url, {'startDate': '2025-03-31', 'endDate': '2025-01-01'}).status_code, 400)
+
+
+class TopGiveawaysTests(TestCase):
+    """Tests for the top giveaways leaderboard."""
+    
+    def setUp(self):
+        """Set up giveaways with entries in the current and previous periods."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        self.first = make_giveaway(self.user, title='First')
+        self.second = make_giveaway(self.user, title='Second')
+        self.third = make_giveaway(self.user, title='Third')
+        make_entries(self.first, ['verified', 'verified', 'pending'])
+        make_entries(self.second, ['verified', 'failed', 'pending'])
+        make_entries(self.third, ['pending'])
+        # Two of the second giveaway's entries came in during the previous 30 days
+        previous = timezone.now() - timedelta(days=45)
+        Entry.objects.filter(giveaway=self.second, instagram_username__in=['entrant0', 'entrant1']).update(created_at=previous)
+    
+    def test_ranking_and_change(self):
+        """Test that giveaways are ranked by participants, then engagement, with period change."""
+        with self.assertNumQueries(1):
+            leaderboard = AnalyticsService.get_top_giveaways(self.user, limit=5)
+        
+        self.assertEqual([row['title'] for row in leaderboard], ['First', 'Second', 'Third'])
+        self.assertEqual((leaderboard[0]['participants'], leaderboard[0]['engagement']), (3, 2))
+        self.assertEqual(leaderboard[0]['changePercent'], 100.0)
+        self.assertEqual(leaderboard[1]['changePercent'], -50.0)
+    
+    def test_cached_until_entries_change(self):
+        """Test that the leaderboard is served from cache until an entry change commits."""
+        AnalyticsService.get_top_giveaways(self.user, limit=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(AnalyticsService.get_top_giveaways(self.user, limit=1)[0]['title'], 'First')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(2):
+                Entry.objects.create(giveaway=self.third, instagram_username=f'late{i}', verification_status='verified')
+        
+        self.assertEqual(AnalyticsService.get_top_giveaways(self.user, limit=1)[0]['title'], 'Third')
+        rollup_buffer.flush()
+    
+    def test_entry_bookkeeping_and_bursts_do_not_invalidate(self):
+        """Test that only new entries and verification changes invalidate, at most once per debounce window."""
+        entry = Entry.objects.get(giveaway=self.third)
+        invalidate_top_giveaways = AnalyticsService.invalidate_top_giveaways
+        with patch.object(AnalyticsService, 'invalidate_top_giveaways', wraps=invalidate_top_giveaways) as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                entry.mark_retrying(timezone.now())
+            invalidate.assert_not_called()
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                entry.mark_verified()
+            AnalyticsService.get_top_giveaways(self.user, limit=1)
+            with self.captureOnCommitCallbacks(execute=True):
+                Entry.objects.create(giveaway=self.third, instagram_username='late0')
+        
+        self.assertEqual(invalidate.call_count, 2)
+        with self.assertNumQueries(0):
+            AnalyticsService.get_top_giveaways(self.user, limit=1)
+        rollup_buffer.flush()
+    
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+        'worker': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    })
+    def test_invalidation_through_another_cache_client(self):
+        """Test that an invalidation made through a worker's cache client is seen by the web's client."""
+        web, worker = caches['default'], caches['worker']
+        self.assertIsNot(web, worker)
+        web.clear()
+        self.addCleanup(web.clear)
+        
+        AnalyticsService.get_top_giveaways(self.user, limit=1)
+        # Without running commit hooks nothing invalidates the cached leaderboard yet
+        for i in range(2):
+            Entry.objects.create(giveaway=self.third, instagram_username=f'late{i}', verification_status='verified')
+        self.assertEqual(AnalyticsService.get_top_giveaways(self.user, limit=1)[0]['title'], 'First')
+        
+        with patch('sorttea.analytics.services.cache', worker):
+            AnalyticsService.invalidate_top_giveaways(self.user.id)
+        
+        self.assertEqual(AnalyticsService.get_top_giveaways(self.user, limit=1)[0]['title'], 'Third')
+    
+    def test_endpoint(self):
+        """Test the endpoint's limit parameter and validation."""
+        self.client.force_login(self.user)
+        url = reverse('top-giveaways')
+        
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()], [str(self.first.id), str(self.second.id)])
+        self.assertEqual(self.client.get(url, {'limit': 'many'}).status_code, 400)
+
+
+class ReportExportTests(TestCase):
+    """Tests for CSV and PDF report exports."""
+    
+    def setUp(self):
+        """Set up rollup rows over a few days."""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        first = make_giveaway(self.user, title='First')
+        second = make_giveaway(self.user, title='Second')
+        
+        ActivityData.objects.create(user=self.user, date=date(2026, 3, 1), participants=10, engagement=4, completion_rate=40.0)
+        ActivityData.objects.create(user=self.user, date=date(2026, 3, 3), participants=5, engagement=5, completion_rate=100.0)
+        ActivityData.objects.create(user=other, date=date(2026, 3, 1), participants=99, engagement=99, completion_rate=100.0)
+        EngagementBreakdown.objects.create(user=self.user, giveaway=first, date=date(2026, 3, 1), likes=3, follows=4)
+        EngagementBreakdown.objects.create(user=self.user, giveaway=second, date=date(2026, 3, 1), likes=1, comments=2)
+        # Engagement without activity on that day still gets a row
+        EngagementBreakdown.objects.create(user=self.user, giveaway=first, date=date(2026, 3, 2), tags=6)
+        
+        self.client.force_login(self.user)
+    
+    def test_report_rows_merge_activity_and_engagement(self):
+        """Test that days from both tables are merged and engagement is summed across giveaways."""
+        rows = list(iter_report_rows(self.user.id, date(2026, 3, 1), date(2026, 3, 31), chunk_size=1))
+        
+        self.assertEqual(rows, [
+            (date(2026, 3, 1), 10, 4, 40.0, 4, 2, 0, 4, 0),
+            (date(2026, 3, 2), 0, 0, 0.0, 0, 0, 0, 0, 6),
+            (date(2026, 3, 3), 5, 5, 100.0, 0, 0, 0, 0, 0),
+        ])
+    
+    def test_csv_is_streamed(self):
+        """Test that CSV exports are streamed for the requested range."""
+        response = self.client.get(reverse('export-report'), {
+            'format': 'csv', 'startDate': '2026-03-02', 'endDate': '2026-03-03'
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('analytics-report-2026-03-02-2026-03-03.csv', response['Content-Disposition'])
+        lines = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(lines[0][:4], ['date', 'participants', 'engagement', 'completion_rate'])
+        self.assertEqual([line[0] for line in lines[1:]], ['2026-03-02', '2026-03-03'])
+    
+    def test_invalid_parameters(self):
+        """Test that unknown formats and bad ranges are rejected."""
+        url = reverse('export-report')
+        self.assertEqual(self.client.get(url, {'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'startDate': '03/01/2026'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'startDate': '2026-03-05', 'endDate': '2026-03-01'}).status_code, 400)
+    
+    def test_pdf_export_job(self):
+        """Test that PDF exports run as a job and are downloadable once completed."""
+        with patch('sorttea.analytics.tasks.generate_report_export.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(reverse('export-report'), {
+                    'format': 'pdf', 'startDate': '2026-03-01', 'endDate': '2026-03-31'
+                })
+        
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        delay.assert_called_once_with(job_id)
+        download_url = response.json()['download_url']
+        self.assertEqual(self.client.get(download_url).status_code, 409)
+        
+        generate_report_export(job_id)
+        
+        status_response = self.client.get(response.json()['status_url'])
+        self.assertEqual(status_response.json()['status'], 'completed')
+        download = self.client.get(download_url)
+        self.assertEqual(download.status_code, 200)
+        content = b''.join(download.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'2026-03-02', content)
+    
+    def test_exports_are_private(self):
+        """Test that another user can't see or download an export."""
+        export = ReportExport.objects.create(user=self.user, start_date=date(2026, 3, 1), end_date=date(2026, 3, 31))
+        self.client.force_login(User.objects.get(username='other'))
+        
+        self.assertEqual(self.client.get(reverse('report-export-status', args=[export.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('report-export-download', args=[export.id])).status_code, 404)
+    
+    def test_pdf_writer_pages_and_xref(self):
+        """Test that long reports are split into pages with a valid cross-reference table."""
+        buffer = BytesIO()
+        writer = PDFWriter(buffer, header=['Header (1)'])
+        for i in range(writer.lines_per_page * 2 + 1):
+            writer.add_line(f'line {i}')
+        writer.close()
+        content = buffer.getvalue()
+        
+        self.assertIn(b'/Count 3', content)
+        self.assertIn(b'(Header \\(1\\))', content)
+        # Every xref entry points at the start of its object
+        xref_position = int(content.rsplit(b'startxref\n', 1)[1].split()[0])
+        entries = content[xref_position:].split(b'\n')[3:]
+        for object_id, entry in enumerate(entries[:writer.next_id - 1], start=1):
+            offset = int(entry.split()[0])
+            self.assertTrue(content[offset:].startswith(b'%d 0 obj' % object_id))
+
+
+class PeriodComparisonTests(TestCase):
+    """Tests for period-over-period comparisons."""
+    
+    def setUp(self):
+        """Set up rollup rows in a period and the one before it."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        giveaway = make_giveaway(self.user)
+        
+        # Previous period: March 1-10, current period: March 11-20
+        ActivityData.objects.create(user=self.user, date=date(2026, 3, 2), participants=10, engagement=5, completion_rate=50.0)
+        ActivityData.objects.create(user=self.user, date=date(2026, 3, 12), participants=10, engagement=10, completion_rate=100.0)
+        ActivityData.objects.create(user=self.user, date=date(2026, 3, 15), participants=30, engagement=15, completion_rate=50.0)
+        # Outside both periods
+        ActivityData.objects.create(user=self.user, date=date(2026, 2, 20), participants=99, engagement=99, completion_rate=100.0)
+        EngagementBreakdown.objects.create(user=self.user, giveaway=giveaway, date=date(2026, 3, 5), likes=4)
+        EngagementBreakdown.objects.create(user=self.user, giveaway=giveaway, date=date(2026, 3, 18), likes=6, follows=3)
+        AnalyticsService.recompute_period_rows([self.user.id], date(2026, 2, 20), date(2026, 3, 18))
+    
+    def test_metrics_compare_both_periods(self):
+        """Test that each metric is summed for both periods in one query per table."""
+        # The week of March 2 is read from the weekly rollups, the other days from the daily tables
+        with self.assertNumQueries(4):
+            comparison = AnalyticsService.get_period_comparison(self.user, date(2026, 3, 11), date(2026, 3, 20))
+        
+        self.assertEqual(comparison['previous_period'], {'start_date': date(2026, 3, 1), 'end_date': date(2026, 3, 10)})
+        metrics = comparison['metrics']
+        self.assertEqual(metrics['participants'], {'current': 40, 'previous': 10, 'change': 30, 'changePercent': 300.0})
+        self.assertEqual(metrics['engagement']['changePercent'], 400.0)
+        # Weighted by participants: (10 * 100 + 30 * 50) / 40
+        self.assertEqual(metrics['completion_rate']['current'], 62.5)
+        self.assertEqual(metrics['completion_rate']['change'], 12.5)
+        self.assertEqual(metrics['likes']['changePercent'], 50.0)
+        self.assertEqual(metrics['follows'], {'current': 3, 'previous': 0, 'change': 3, 'changePercent': 100.0})
+        self.assertEqual(metrics['tags'], {'current': 0, 'previous': 0, 'change': 0, 'changePercent': 0.0})
+    
+    def test_cached_per_range(self):
+        """Test that comparisons are cached per user and range."""
+        AnalyticsService.get_period_comparison(self.user, date(2026, 3, 11), date(2026, 3, 20))
+        with self.assertNumQueries(0):
+            AnalyticsService.get_period_comparison(self.user, date(2026, 3, 11), date(2026, 3, 20))
+        with self.assertNumQueries(2):
+            AnalyticsService.get_period_comparison(self.user, date(2026, 3, 12), date(2026, 3, 20))
+    
+    def test_endpoint(self):
+        """Test the comparison endpoint and its date validation."""
+        self.client.force_login(self.user)
+        url = reverse('period-comparison')
+        
+        response = self.client.get(url, {'startDate': '2026-03-11', 'endDate': '2026-03-20'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['previous_period']['start_date'], '2026-03-01')
+        self.assertEqual(response.json()['metrics']['participants']['current'], 40)
+        self.assertEqual(self.client.get(url, {'startDate': '2026-03-20', 'endDate': '2026-03-11'}).status_code, 400)
+
+
+class PeriodRollupTests(TestCase):
+    """Tests for the weekly and monthly rollup tables."""
+    
+    def setUp(self):
+        """Set up a year of daily rollup rows."""
+        self.user = User.objects.create_user(username='creator', email='creator@example.com', password='testpass123')
+        giveaway = make_giveaway(self.user)
+        days = [date(2025, 1, 1) + timedelta(days=i) for i in range(365)]
+        ActivityData.objects.bulk_create([
+            ActivityData(user=self.user, date=day, participants=4, engagement=i % 5, completion_rate=(i % 5) * 25.0)
+            for i, day in enumerate(days)
+        ])
+        EngagementBreakdown.objects.bulk_create([
+            EngagementBreakdown(user=self.user, giveaway=giveaway, date=day, likes=1, tags=i % 3)
+            for i, day in enumerate(days)
+        ])
+        AnalyticsService.recompute_period_rows([self.user.id], days[0], days[-1])
+    
+    def test_plan_uses_coarsest_resolutions(self):
+        """Test that ranges are split into whole months, then whole weeks, then days."""
+        plan = plan_rollup_reads(date(2025, 1, 15), date(2025, 6, 10))
+        
+        self.assertEqual(plan['month'], [(date(2025, 2, 1), date(2025, 5, 1))])
+        self.assertEqual(plan['week'], [(date(2025, 1, 20), date(2025, 1, 20)), (date(2025, 6, 2), date(2025, 6, 2))])
+        self.assertEqual(plan['day'], [
+            (date(2025, 1, 15), date(2025, 1, 19)),
+            (date(2025, 1, 27), date(2025, 1, 31)),
+            (date(2025, 6, 1), date(2025, 6, 1)),
+            (date(2025, 6, 9), date(2025, 6, 10)),
+        ])
+    
+    def test_migration_backfills_period_rows(self):
+        """Test that the backfill migration rebuilds the period rows from the daily rows."""
+        expected = set(ActivityRollup.objects.values_list('resolution', 'period_start', 'participants', 'engagement'))
+        ActivityRollup.objects.all().delete()
+        EngagementRollup.objects.all().delete()
+        
+        migration = import_module('sorttea.analytics.migrations.0006_backfill_period_rollups')
+        migration.backfill_period_rollups(apps, None)
+        
+        self.assertEqual(
+            set(ActivityRollup.objects.values_list('resolution', 'period_start', 'participants', 'engagement')),
+            expected
+        )
+        march = EngagementRollup.objects.get(user=self.user, resolution='month', period_start=date(2025, 3, 1))
+        self.assertEqual(march.likes, 31)
+    
+    def test_period_rows_match_daily_rows(self):
+        """Test that the recomputed week and month rows sum the daily rows."""
+        march = ActivityRollup.objects.get(user=self.user, resolution='month', period_start=date(2025, 3, 1))
+        daily = ActivityData.objects.filter(user=self.user, date__month=3).aggregate(
+            participants=Sum('participants'), engagement=Sum('engagement')
+        )
+        self.assertEqual((march.participants, march.engagement), (daily['participants'], daily['engagement']))
+        self.assertEqual(march.completion_rate, round(daily['engagement'] * 100 / daily['participants'], 2))
+        self.assertEqual(EngagementRollup.objects.filter(user=self.user, resolution='month').count(), 12)
+        # Weeks overlapping the year's ends are partial, and complete once their other days are rolled up
+        self.assertEqual(EngagementRollup.objects.get(resolution='week', period_start=date(2024, 12, 30)).likes, 5)
+    
+    def test_long_ranges_match_daily_sums(self):
+        """Test that totals read from the coarsest rollups equal the daily sums."""
+        start, end = date(2025, 1, 15), date(2025, 11, 20)
+        daily = EngagementBreakdown.objects.filter(user=self.user, date__gte=start, date__lte=end).aggregate(
+            likes=Sum('likes'), tags=Sum('tags')
+        )
+        
+        with self.assertNumQueries(2):
+            breakdown = AnalyticsService.get_engagement_breakdown(self.user, start, end)
+        self.assertEqual((breakdown['likes'], breakdown['tags']), (daily['likes'], daily['tags']))
+        
+        comparison = AnalyticsService.get_period_comparison(self.user, date(2025, 7, 1), date(2025, 12, 31))
+        participants = ActivityData.objects.filter(user=self.user, date__gte=date(2025, 7, 1)).aggregate(total=Sum('participants'))
+        self.assertEqual(comparison['metrics']['participants']['current'], participants['total'])
+    
+    def test_nightly_rollup_recomputes_periods(self):
+        """Test that the rollup job rebuilds the periods containing the days it recomputes."""
+        ActivityRollup.objects.all().delete()
+        giveaway = Giveaway.objects.get(created_by=self.user)
+        make_entries(giveaway, ['verified', 'pending'])
+        
+        summary = AnalyticsService.rollup_daily_activity()
+        
+        today = timezone.localdate()
+        self.assertGreater(summary['period_rows'], 0)
+        for resolution in ('week', 'month'):
+            self.assertTrue(ActivityRollup.objects.filter(
+                user=self.user, resolution=resolution, period_start=get_bucket_start(today, resolution)
+            ).exists())
@@ -5,7 +5,10 @@ urlpatterns = [
     path('overview/', views.OverviewStatsView.as_view(), name='overview-stats'),
     path('timeseries/', views.TimeseriesDataView.as_view(), name='timeseries-data'),
     path('engagement-breakdown/', views.EngagementBreakdownView.as_view(), name='engagement-breakdown'),
+    path('comparison/', views.PeriodComparisonView.as_view(), name='period-comparison'),
     path('top-giveaways/', views.TopGiveawaysView.as_view(), name='top-giveaways'),
     path('participant-demographics/', views.ParticipantDemographicsView.as_view(), name='participant-demographics'),
-    path('export/', views.export_report, name='export-report'),
+    path('export/', views.ReportExportView.as_view(), name='export-report'),
+    path('export/<uuid:export_id>/', views.ReportExportStatusView.as_view(), name='report-export-status'),
+    path('export/<uuid:export_id>/download/', views.ReportExportDownloadView.as_view(), name='report-export-download'),
 ] 
\ No newline at end of file
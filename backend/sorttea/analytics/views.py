@@ -1,63 +1,56 @@
-from django.shortcuts import render
+import os
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.negotiation import DefaultContentNegotiation
 from django.utils import timezone
-from django.db.models import Sum, Avg
 from datetime import datetime, timedelta
 import random
 
-from .models import ActivityData, OverviewStats, EngagementBreakdown
+from .models import ActivityData, ReportExport
+from .reports import iter_csv, iter_report_rows
+from .services import AnalyticsService, TimeseriesRangeError
 from .serializers import (
-    ActivityDataSerializer, 
     OverviewStatsSerializer, 
-    EngagementBreakdownSerializer,
-    TimeseriesDataSerializer
+    TimeseriesDataSerializer,
+    ReportExportSerializer
 )
 
+def parse_date_range(query_params, default_days=30):
+    """
+    Parse the startDate and endDate query parameters, defaulting to the last ``default_days`` days
+    
+    Raises ValueError for malformed dates or a range that ends before it starts.
+    """
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=default_days)
+    try:
+        if query_params.get('startDate'):
+            start_date = datetime.strptime(query_params['startDate'], "%Y-%m-%d").date()
+        if query_params.get('endDate'):
+            end_date = datetime.strptime(query_params['endDate'], "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError('startDate and endDate must be YYYY-MM-DD dates')
+    
+    if start_date > end_date:
+        raise ValueError('startDate must not be after endDate')
+    return start_date, end_date
+
 class OverviewStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         """Get overview statistics for the authenticated user"""
-        user = request.user
-        
-        # Try to get existing stats or create them
-        stats, created = OverviewStats.objects.get_or_create(user=user)
-        
-        # If stats are older than 1 hour or just created, refresh them
-        if created or (timezone.now() - stats.last_updated) > timedelta(hours=1):
-            self._update_stats(user, stats)
-        
-        serializer = OverviewStatsSerializer(stats)
-        return Response(serializer.data)
-    
-    def _update_stats(self, user, stats):
-        """Update overview statistics with the latest data"""
-        from sorttea.giveaway.models import Giveaway
-        
-        # Count active and total giveaways
-        all_giveaways = Giveaway.objects.filter(created_by=user)
-        active_giveaways = all_giveaways.filter(status='active')
-        
-        # Calculate participant and engagement totals
-        participants = sum(g.participants for g in all_giveaways if hasattr(g, 'participants') and g.participants is not None)
-        engagements = sum(g.total_engagement for g in all_giveaways if hasattr(g, 'total_engagement') and g.total_engagement is not None)
-        
-        # Calculate completion rate (average across all giveaways)
-        rates = [g.completion_rate for g in all_giveaways if hasattr(g, 'completion_rate') and g.completion_rate is not None]
-        avg_rate = sum(rates) / len(rates) if rates else 0
+        # Stale stats are served immediately while a background task refreshes them
+        stats, refreshing = AnalyticsService.get_overview_stats(request.user)
         
-        # Update the stats object
-        stats.total_giveaways = all_giveaways.count()
-        stats.active_giveaways = active_giveaways.count()
-        stats.total_participants = participants
-        stats.total_engagement = engagements
-        stats.completion_rate = round(avg_rate, 2)
-        stats.last_updated = timezone.now()
-        stats.save()
+        data = OverviewStatsSerializer(stats).data
+        data['age_seconds'] = int((timezone.now() - stats.last_updated).total_seconds())
+        data['refreshing'] = refreshing
+        return Response(data)
 
 class TimeseriesDataView(APIView):
     permission_classes = [IsAuthenticated]
@@ -65,38 +58,23 @@ class TimeseriesDataView(APIView):
     def get(self, request):
         """Get timeseries data for charts"""
         user = request.user
-        
-        # Get query parameters for date range and mock data flag
-        start_date_str = request.query_params.get('startDate')
-        end_date_str = request.query_params.get('endDate')
         use_mock_data = request.query_params.get('mock', '').lower() == 'true'
         
-        # Default to last 30 days if no dates provided
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        # Parse provided dates if any
-        if start_date_str:
-            try:
-                start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            except ValueError:
-                pass
+        try:
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        if end_date_str:
-            try:
-                end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            except ValueError:
-                pass
+        granularity = request.query_params.get('granularity', 'day').lower()
         
-        # Get activity data from database
-        activity_data = ActivityData.objects.filter(
-            user=user,
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('date')
+        # Bucketed in the database, with empty buckets filled in
+        try:
+            series = AnalyticsService.get_activity_timeseries(user, start_date, end_date, granularity)
+        except TimeseriesRangeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # If no data exists
-        if not activity_data.exists():
+        if not series:
             # Only generate mock data if in DEBUG mode AND mock flag is True
             from django.conf import settings
             if settings.DEBUG and use_mock_data:
@@ -105,10 +83,9 @@ class TimeseriesDataView(APIView):
             else:
                 # Return empty array in production or when mock data not requested
                 return Response([])
-        else:
-            # Serialize the actual data
-            serializer = ActivityDataSerializer(activity_data, many=True)
-            return Response(serializer.data)
+        
+        serializer = TimeseriesDataSerializer(series, many=True)
+        return Response(serializer.data)
     
     def _generate_mock_data(self, start_date, end_date, user):
         """Generate mock data for development until real data is available"""
@@ -169,58 +146,39 @@ class EngagementBreakdownView(APIView):
     
     def get(self, request):
         """Get engagement breakdown by type"""
-        user = request.user
-        
-        # Get aggregated engagement data from the past 30 days
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
+        try:
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        engagement = EngagementBreakdown.objects.filter(
-            user=user,
-            date__gte=thirty_days_ago
-        ).aggregate(
-            likes=Sum('likes'),
-            comments=Sum('comments'),
-            shares=Sum('shares'),
-            follows=Sum('follows'),
-            tags=Sum('tags')
-        )
-        
-        # Replace None values with 0
-        for key in engagement:
-            if engagement[key] is None:
-                engagement[key] = 0
+        # Summed from the coarsest rollups that cover the range, so long ranges stay cheap
+        return Response(AnalyticsService.get_engagement_breakdown(request.user, start_date, end_date))
+
+class PeriodComparisonView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Compare activity and engagement over a date range with the period before it"""
+        try:
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(engagement)
+        return Response(AnalyticsService.get_period_comparison(request.user, start_date, end_date))
 
 class TopGiveawaysView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         """Get top performing giveaways"""
-        user = request.user
-        limit = int(request.query_params.get('limit', 5))
-        
-        from sorttea.giveaway.models import Giveaway
-        
-        # Get user's giveaways and order by participant count
-        giveaways = Giveaway.objects.filter(created_by=user)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 5)), 1), 50)
+            days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+        except ValueError:
+            return Response({'error': 'limit and days must be integers'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # This is a simplified version - in a real implementation,
-        # you'd calculate proper ranking metrics
-        top_giveaways = []
-        for giveaway in giveaways[:limit]:
-            # Calculate a simple change percent (mock data for now)
-            change_percent = random.randint(-10, 30)
-            
-            top_giveaways.append({
-                'id': str(giveaway.id),
-                'title': giveaway.title,
-                'participants': getattr(giveaway, 'participants', random.randint(10, 100)),
-                'engagement': getattr(giveaway, 'total_engagement', random.randint(20, 200)),
-                'changePercent': change_percent
-            })
-        
-        return Response(top_giveaways)
+        # Ranked in the database and cached per user until their entries or giveaways change
+        return Response(AnalyticsService.get_top_giveaways(request.user, limit=limit, days=days))
 
 class ParticipantDemographicsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -255,15 +213,64 @@ class ParticipantDemographicsView(APIView):
         
         return Response(demographics)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def export_report(request):
-    """Export analytics report as CSV or PDF"""
-    format_type = request.query_params.get('format', 'csv')
+class ReportFormatNegotiation(DefaultContentNegotiation):
+    """
+    Content negotiation that leaves the ``format`` query parameter to the view
+    
+    Report exports take ``format`` to mean the report format, which DRF would
+    otherwise read as a renderer override and answer with a 404.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(request, renderers, format_suffix or 'json')
+
+class ReportExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = ReportFormatNegotiation
+    
+    def get(self, request):
+        """Export an analytics report as CSV, or start a background PDF export"""
+        format_type = request.query_params.get('format', 'csv').lower()
+        if format_type not in ('csv', 'pdf'):
+            return Response({'error': 'format must be csv or pdf'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if format_type == 'csv':
+            # Rows are read and written out a chunk at a time as the client downloads
+            response = StreamingHttpResponse(
+                iter_csv(iter_report_rows(request.user.id, start_date, end_date)),
+                content_type='text/csv'
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="analytics-report-{start_date.isoformat()}-{end_date.isoformat()}.csv"'
+            )
+            return response
+        
+        export = AnalyticsService.start_report_export(request.user, start_date, end_date, format=format_type)
+        data = ReportExportSerializer(export, context={'request': request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+class ReportExportStatusView(APIView):
+    permission_classes = [IsAuthenticated]
     
-    # This would generate and return a file
-    # For now, return a mock response
-    return Response({
-        'status': 'success',
-        'message': f'Report would be exported as {format_type}. Implementation pending.'
-    })
+    def get(self, request, export_id):
+        """Get the status of a background report export"""
+        export = get_object_or_404(ReportExport, id=export_id, user=request.user)
+        return Response(ReportExportSerializer(export, context={'request': request}).data)
+
+class ReportExportDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, export_id):
+        """Download the file of a completed report export"""
+        export = get_object_or_404(ReportExport, id=export_id, user=request.user)
+        if export.status != 'completed' or not export.file:
+            return Response(
+                {'error': f'Report export is {export.status}', 'status': export.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return FileResponse(export.file.open('rb'), as_attachment=True, filename=os.path.basename(export.file.name))
@@ -8,4 +8,8 @@ from django.apps import AppConfig
 class GiveawayConfig(AppConfig):
     """Configuration for the Giveaway app."""
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'sorttea.giveaway' 
\ No newline at end of file
+    name = 'sorttea.giveaway'
+    
+    def ready(self):
+        """Connect signal receivers."""
+        from . import signals  # noqa: F401
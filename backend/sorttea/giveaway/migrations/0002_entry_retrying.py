@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('giveaway', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='retry_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='entry',
+            name='verification_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('verified', 'Verified'), ('failed', 'Failed'), ('retrying', 'Retrying')], default='pending', max_length=20),
+        ),
+    ]
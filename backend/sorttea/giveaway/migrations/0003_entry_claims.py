@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('giveaway', '0002_entry_retrying'),
+        ('instagram', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['verification_status', 'claim_expires_at'], name='giveaway_en_verific_43f3ef_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('giveaway', '0003_entry_claims'),
+        ('instagram', '0007_token_refresh'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['updated_at'], name='giveaway_en_updated_8e2aa7_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('giveaway', '0004_entry_updated_at_index'),
+        ('instagram', '0007_token_refresh'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['giveaway', 'created_at'], name='giveaway_en_giveawa_3c408d_idx'),
+        ),
+    ]
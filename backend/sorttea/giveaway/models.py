@@ -99,8 +99,15 @@ class Entry(models.Model):
         ('pending', 'Pending'),
         ('verified', 'Verified'),
         ('failed', 'Failed'),
+        ('retrying', 'Retrying'),
     )
     
+    # Fields written by the mark_* helpers; claim columns are left to the claiming worker
+    VERIFICATION_FIELDS = [
+        'verification_status', 'verification_details', 'verified_at',
+        'retry_count', 'next_retry_at', 'updated_at'
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     giveaway = models.ForeignKey(Giveaway, on_delete=models.CASCADE, related_name='entries')
     instagram_username = models.CharField(max_length=255)
@@ -112,6 +119,14 @@ class Entry(models.Model):
     verification_details = models.JSONField(default=dict)
     verified_at = models.DateTimeField(null=True, blank=True)
     
+    # Retry bookkeeping for transient Instagram API failures
+    retry_count = models.PositiveIntegerField(default=0)
+    next_retry_at = models.DateTimeField(null=True, blank=True)
+    
+    # Work claiming so concurrent revalidation workers process disjoint entries
+    claimed_by = models.CharField(max_length=255, null=True, blank=True)
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -121,26 +136,79 @@ class Entry(models.Model):
     
     def mark_verified(self, details=None):
         """Mark entry as verified with optional details."""
+        previous_status = self.verification_status
         self.verification_status = 'verified'
         self.verified_at = timezone.now()
+        self.retry_count = 0
+        self.next_retry_at = None
+        self.verification_details.pop('unverifiable', None)
         if details:
             self.verification_details.update(details)
-        self.save()
+        self.save(update_fields=self.VERIFICATION_FIELDS)
         logger.info(f"Entry {self.id} by {self.instagram_username} marked as verified")
+        self.send_status_changed(previous_status)
     
     def mark_failed(self, details=None):
         """Mark entry as failed with optional details."""
+        previous_status = self.verification_status
         self.verification_status = 'failed'
+        self.next_retry_at = None
+        self.verification_details.pop('unverifiable', None)
         if details:
             self.verification_details.update(details)
-        self.save()
+        self.save(update_fields=self.VERIFICATION_FIELDS)
         logger.info(f"Entry {self.id} by {self.instagram_username} marked as failed")
+        self.send_status_changed(previous_status)
+    
+    def mark_unverifiable(self, details=None):
+        """Leave entry pending, flagged as impossible to verify until the giveaway's rules change."""
+        previous_status = self.verification_status
+        self.verification_status = 'pending'
+        self.next_retry_at = None
+        self.verification_details['unverifiable'] = True
+        if details:
+            self.verification_details.update(details)
+        self.save(update_fields=self.VERIFICATION_FIELDS)
+        logger.warning(f"Entry {self.id} by {self.instagram_username} cannot be verified")
+        self.send_status_changed(previous_status)
+    
+    def mark_retrying(self, next_retry_at, details=None):
+        """Mark entry as waiting for another verification attempt."""
+        previous_status = self.verification_status
+        self.verification_status = 'retrying'
+        self.retry_count += 1
+        self.next_retry_at = next_retry_at
+        if details:
+            self.verification_details.update(details)
+        self.save(update_fields=self.VERIFICATION_FIELDS)
+        logger.info(f"Entry {self.id} by {self.instagram_username} scheduled for retry {self.retry_count} at {next_retry_at}")
+        self.send_status_changed(previous_status)
+    
+    def reset_retries(self):
+        """Give the entry a fresh retry budget before a newly requested verification."""
+        if not self.retry_count and not self.next_retry_at:
+            return
+        self.retry_count = 0
+        self.next_retry_at = None
+        self.save(update_fields=['retry_count', 'next_retry_at', 'updated_at'])
+    
+    def send_status_changed(self, previous_status):
+        """Notify receivers such as the analytics rollups of a verification status change."""
+        if previous_status == self.verification_status:
+            return
+        from .signals import entry_status_changed
+        entry_status_changed.send(sender=Entry, entry=self, previous_status=previous_status)
     
     class Meta:
         unique_together = ('giveaway', 'instagram_username')
         indexes = [
             models.Index(fields=['giveaway', 'verification_status']),
             models.Index(fields=['instagram_username']),
+            models.Index(fields=['verification_status', 'claim_expires_at']),
+            # Lets the analytics rollup find entries changed since its watermark
+            models.Index(fields=['updated_at']),
+            # Per-giveaway period counts for the analytics leaderboard
+            models.Index(fields=['giveaway', 'created_at']),
         ]
 
 
@@ -0,0 +1,205 @@
+"""
+Evaluators for custom verification rules.
+
+Each evaluator handles one ``VerificationRule.rule_type`` and works on batches
+of entrant Instagram accounts, so rules backed by database lookups share one
+query across many entries instead of running once per entry.
+"""
+
+import re
+from datetime import timedelta
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from sorttea.instagram.models import InstagramMediaCache, InstagramCommentMention, InstagramMentionTally
+
+RULE_EVALUATORS = {}
+
+
+def register_evaluator(evaluator_class):
+    """Register an evaluator class under its ``rule_type``."""
+    RULE_EVALUATORS[evaluator_class.rule_type] = evaluator_class()
+    return evaluator_class
+
+
+def get_evaluator(rule_type):
+    """Get the evaluator registered for a rule type, or None."""
+    return RULE_EVALUATORS.get(rule_type)
+
+
+class RuleEvaluator:
+    """
+    Base class for custom rule evaluators.
+    
+    Subclasses set ``rule_type`` and implement ``evaluate_batch``. ``api_calls``
+    is the number of Instagram API requests one evaluation costs, used when
+    estimating the cost of a revalidation run.
+    """
+    rule_type = None
+    api_calls = 0
+    
+    def validate_params(self, params):
+        """Return a list of problems with the rule parameters, empty when they are valid."""
+        return []
+    
+    def evaluate_batch(self, params, accounts):
+        """Evaluate the rule for many Instagram accounts, returning ``{account_id: bool}``."""
+        raise NotImplementedError
+    
+    def evaluate(self, params, account):
+        """Evaluate the rule for a single Instagram account."""
+        return self.evaluate_batch(params, [account]).get(account.id, False)
+
+
+def _get_keywords(params, key, single_key):
+    """Read a list of non-empty strings from ``params[key]`` or ``params[single_key]``."""
+    values = params.get(key)
+    if values is None and params.get(single_key):
+        values = [params[single_key]]
+    if not isinstance(values, list):
+        return []
+    return [str(value).strip() for value in values if str(value).strip()]
+
+
+@register_evaluator
+class CaptionKeywordEvaluator(RuleEvaluator):
+    """
+    Passes when one of the entrant's cached posts has a caption containing a keyword.
+    
+    Params: ``keywords`` (list) or ``keyword`` (str).
+    """
+    rule_type = 'caption_keyword'
+    
+    def validate_params(self, params):
+        if not _get_keywords(params, 'keywords', 'keyword'):
+            return ['Provide a "keyword" or a non-empty "keywords" list']
+        return []
+    
+    def evaluate_batch(self, params, accounts):
+        keywords = _get_keywords(params, 'keywords', 'keyword')
+        account_ids = [account.id for account in accounts]
+        if not keywords:
+            return {account_id: False for account_id in account_ids}
+        
+        caption_filter = Q()
+        for keyword in keywords:
+            caption_filter |= Q(caption__icontains=keyword)
+        
+        matched = set(
+            InstagramMediaCache.objects.filter(instagram_account_id__in=account_ids)
+            .filter(caption_filter)
+            .values_list('instagram_account_id', flat=True)
+            .distinct()
+        )
+        return {account_id: account_id in matched for account_id in account_ids}
+
+
+@register_evaluator
+class HashtagEvaluator(RuleEvaluator):
+    """
+    Passes when one of the entrant's cached posts uses a hashtag.
+    
+    Params: ``hashtags`` (list) or ``hashtag`` (str), with or without the leading ``#``.
+    """
+    rule_type = 'hashtag'
+    
+    def validate_params(self, params):
+        if not _get_keywords(params, 'hashtags', 'hashtag'):
+            return ['Provide a "hashtag" or a non-empty "hashtags" list']
+        return []
+    
+    def evaluate_batch(self, params, accounts):
+        hashtags = [tag.lstrip('#') for tag in _get_keywords(params, 'hashtags', 'hashtag')]
+        account_ids = [account.id for account in accounts]
+        if not hashtags:
+            return {account_id: False for account_id in account_ids}
+        
+        # Narrow candidates in the database, then match whole hashtags in Python
+        caption_filter = Q()
+        for tag in hashtags:
+            caption_filter |= Q(caption__icontains=f'#{tag}')
+        pattern = re.compile(r'#(' + '|'.join(re.escape(tag) for tag in hashtags) + r')(?!\w)', re.IGNORECASE)
+        
+        matched = set()
+        candidates = (
+            InstagramMediaCache.objects.filter(instagram_account_id__in=account_ids)
+            .filter(caption_filter)
+            .values_list('instagram_account_id', 'caption')
+        )
+        for account_id, caption in candidates:
+            if account_id not in matched and pattern.search(caption or ''):
+                matched.add(account_id)
+        return {account_id: account_id in matched for account_id in account_ids}
+
+
+@register_evaluator
+class MinimumAccountAgeEvaluator(RuleEvaluator):
+    """
+    Passes when the entrant's account is at least ``days`` old.
+    
+    The Instagram API doesn't expose account creation dates, so the age of the
+    oldest cached post is used as a lower bound.
+    """
+    rule_type = 'min_account_age'
+    
+    def validate_params(self, params):
+        days = params.get('days')
+        # bool is a subclass of int, so JSON true/false would otherwise pass
+        if not isinstance(days, int) or isinstance(days, bool) or days < 0:
+            return ['"days" must be a non-negative integer']
+        return []
+    
+    def evaluate_batch(self, params, accounts):
+        account_ids = [account.id for account in accounts]
+        cutoff = timezone.now() - timedelta(days=params.get('days', 0))
+        
+        oldest_posts = dict(
+            InstagramMediaCache.objects.filter(instagram_account_id__in=account_ids)
+            .values('instagram_account_id')
+            .annotate(oldest=Min('timestamp'))
+            .values_list('instagram_account_id', 'oldest')
+        )
+        return {
+            account_id: account_id in oldest_posts and oldest_posts[account_id] <= cutoff
+            for account_id in account_ids
+        }
+
+
+@register_evaluator
+class MentionCountEvaluator(RuleEvaluator):
+    """
+    Passes when the entrant has @mentioned at least ``min_count`` distinct accounts in comments.
+    
+    Params: ``min_count`` (int) and optionally ``media_id`` to only count mentions
+    on one post. Counts come from the mention index built as comments are
+    ingested: the per-post tallies for one post, distinct mentioned accounts
+    across every indexed post otherwise.
+    """
+    rule_type = 'mention_count'
+    
+    def validate_params(self, params):
+        min_count = params.get('min_count')
+        if not isinstance(min_count, int) or isinstance(min_count, bool) or min_count < 1:
+            return ['"min_count" must be a positive integer']
+        return []
+    
+    def evaluate_batch(self, params, accounts):
+        usernames = {account.id: (account.username or '').lower() for account in accounts}
+        
+        if params.get('media_id'):
+            counts = dict(
+                InstagramMentionTally.objects.filter(
+                    media_id=params['media_id'],
+                    commenter_username__in=usernames.values()
+                )
+                .values_list('commenter_username', 'mention_count')
+            )
+        else:
+            counts = dict(
+                InstagramCommentMention.objects.filter(commenter_username__in=usernames.values())
+                .values('commenter_username')
+                .annotate(mentions=Count('mentioned_username', distinct=True))
+                .values_list('commenter_username', 'mentions')
+            )
+        
+        min_count = params.get('min_count', 1)
+        return {account_id: counts.get(username, 0) >= min_count for account_id, username in usernames.items()}
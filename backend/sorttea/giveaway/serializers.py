@@ -5,6 +5,8 @@ Serializers for Giveaway app models.
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Giveaway, Entry, Winner, VerificationRule, AuditLog
+from .rules import RULE_EVALUATORS, get_evaluator
+from .services import GiveawayService
 from sorttea.instagram.models import InstagramAccount
 from sorttea.instagram.serializers import InstagramAccountSerializer
 
@@ -46,6 +48,37 @@ class GiveawaySerializer(serializers.ModelSerializer):
         """Get number of verified entries."""
         return obj.get_verified_entry_count()
     
+    def validate(self, attrs):
+        """
+        Check that a follow the creator asks to verify can actually be verified.
+        
+        Only runs when a request changes follow verification or the follow
+        target, or turns follow verification on explicitly for a new giveaway,
+        so other edits to giveaways following a sponsor's account still save.
+        Entries of those giveaways are flagged unverifiable when verified.
+        """
+        if self.instance:
+            follow_changed = any(
+                field in attrs and attrs[field] != getattr(self.instance, field)
+                for field in ('verify_follow', 'instagram_account_to_follow')
+            )
+        else:
+            follow_changed = 'verify_follow' in attrs
+        
+        verify_follow = attrs.get('verify_follow', getattr(self.instance, 'verify_follow', True))
+        target = attrs.get('instagram_account_to_follow', getattr(self.instance, 'instagram_account_to_follow', None))
+        if follow_changed and verify_follow and target:
+            creator = self.instance.created_by if self.instance else self.context['request'].user
+            if not GiveawayService.can_snapshot_followers(creator.id, target):
+                raise serializers.ValidationError({
+                    'instagram_account_to_follow': (
+                        'Follows can only be verified for your own connected Instagram account. '
+                        'Connect this account or turn off follow verification.'
+                    )
+                })
+        
+        return attrs
+    
     def create(self, validated_data):
         """Create a new giveaway and set the creator."""
         user = self.context['request'].user
@@ -103,11 +136,11 @@ class EntrySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'giveaway', 'instagram_username', 'instagram_account',
             'verification_status', 'verification_details', 'verified_at',
-            'created_at', 'updated_at'
+            'retry_count', 'next_retry_at', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'verification_status', 'verification_details', 'verified_at',
-            'created_at', 'updated_at'
+            'retry_count', 'next_retry_at', 'created_at', 'updated_at'
         ]
     
     def create(self, validated_data):
@@ -163,6 +196,26 @@ class VerificationRuleSerializer(serializers.ModelSerializer):
             'is_required', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+    
+    def validate(self, attrs):
+        """Check that the rule type has a registered evaluator and its params are valid."""
+        rule_type = attrs.get('rule_type', getattr(self.instance, 'rule_type', None))
+        rule_params = attrs.get('rule_params', getattr(self.instance, 'rule_params', None)) or {}
+        
+        evaluator = get_evaluator(rule_type)
+        if evaluator is None:
+            raise serializers.ValidationError({
+                'rule_type': f"Unknown rule type. Choose one of: {', '.join(sorted(RULE_EVALUATORS))}"
+            })
+        
+        if not isinstance(rule_params, dict):
+            raise serializers.ValidationError({'rule_params': 'Rule params must be an object'})
+        
+        errors = evaluator.validate_params(rule_params)
+        if errors:
+            raise serializers.ValidationError({'rule_params': errors})
+        
+        return attrs
 
 
 class AuditLogSerializer(serializers.ModelSerializer):
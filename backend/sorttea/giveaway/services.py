@@ -2,12 +2,26 @@
 Service layer for giveaway verification and management.
 """
 
+import json
 import logging
+import os
+import random
+import socket
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db import transaction
-from sorttea.instagram.models import InstagramAccount
-from sorttea.instagram.services import InstagramService, InstagramAPIError
+from django.db.models import Q
+from django.db.models.functions import Lower
+from sorttea.instagram.models import InstagramAccount, InstagramSyncState
+from sorttea.instagram.services import InstagramService, InstagramAPIError, InstagramIndexUnavailableError
 from .models import Giveaway, Entry, AuditLog
+from .rules import get_evaluator
 
 logger = logging.getLogger('sorttea.giveaway')
 
@@ -17,6 +31,101 @@ class GiveawayVerificationError(Exception):
     pass
 
 
+class GiveawayVerificationDeferred(GiveawayVerificationError):
+    """Exception raised when verification hit a transient error and was scheduled for retry."""
+    pass
+
+
+def make_unavailable_check(message):
+    """Build a rule check that reports its index can never be built."""
+    def check(*args):
+        raise InstagramIndexUnavailableError(message)
+    return check
+
+
+class VerificationBatch:
+    """
+    Shared state for verifying many entries in one run.
+    
+    Rule plans are compiled once per giveaway and Instagram checks are memoized
+    per ``(check_key, instagram_account)``, so an account that entered several
+    giveaways with the same requirement is only checked once. Errors are
+    memoized too, so a failing account isn't retried for every giveaway.
+    """
+    
+    def __init__(self, plans=None, results=None):
+        self.plans = plans if plans is not None else {}
+        self.results = results if results is not None else {}
+        self.index_synced_at = {}
+    
+    def get_rule_plan(self, giveaway):
+        """Get the compiled rule plan for a giveaway, compiling it on first use."""
+        if giveaway.id not in self.plans:
+            self.plans[giveaway.id] = GiveawayService.get_rule_plan(giveaway)
+        return self.plans[giveaway.id]
+    
+    def run_check(self, rule, instagram_account):
+        """Run a rule's check for an account, reusing an earlier result for the same check."""
+        cache_key = (rule['check_key'], instagram_account.id)
+        if cache_key not in self.results:
+            try:
+                self.results[cache_key] = bool(rule['check'](instagram_account))
+            except InstagramAPIError as e:
+                self.results[cache_key] = e
+        
+        result = self.results[cache_key]
+        if isinstance(result, InstagramAPIError):
+            raise result
+        return result
+    
+    def get_index_synced_at(self, index):
+        """Get when an ``(index_type, key)`` index was last synced, or None if it never was."""
+        if index not in self.index_synced_at:
+            index_type, key = index
+            self.index_synced_at[index] = (
+                InstagramSyncState.objects.filter(index_type=index_type, key=key)
+                .values_list('last_synced_at', flat=True)
+                .first()
+            )
+        return self.index_synced_at[index]
+    
+    def prefetch(self, entries):
+        """
+        Evaluate batch-capable rules for many entries up front.
+        
+        For every giveaway among ``entries``, each rule with a ``batch_check``
+        is evaluated once for all entrant accounts that don't have a result yet.
+        Rules whose batch evaluation fails fall back to per-entry checks.
+        """
+        giveaways = {}
+        accounts_by_giveaway = defaultdict(dict)
+        for entry in entries:
+            if entry.instagram_account_id:
+                giveaways[entry.giveaway_id] = entry.giveaway
+                accounts_by_giveaway[entry.giveaway_id][entry.instagram_account_id] = entry.instagram_account
+        
+        for giveaway_id, accounts in accounts_by_giveaway.items():
+            for rule in self.get_rule_plan(giveaways[giveaway_id]):
+                if not rule.get('batch_check'):
+                    continue
+                
+                missing = [
+                    account for account_id, account in accounts.items()
+                    if (rule['check_key'], account_id) not in self.results
+                ]
+                if not missing:
+                    continue
+                
+                try:
+                    results = rule['batch_check'](missing)
+                except InstagramAPIError as e:
+                    logger.warning(f"Batch evaluation of rule {rule['key']} failed, falling back to per-entry checks: {str(e)}")
+                    continue
+                
+                for account in missing:
+                    self.results[(rule['check_key'], account.id)] = bool(results.get(account.id, False))
+
+
 class GiveawayService:
     """Service for giveaway management and verification."""
     
@@ -67,9 +176,254 @@ class GiveawayService:
         return entry
     
     @staticmethod
-    def verify_entry(entry, force=False):
+    def get_rule_plan(giveaway):
+        """
+        Compile the verification rules enabled for a giveaway.
+        
+        Each rule is a dict with a stable ``key`` under which its outcome is
+        stored in ``Entry.verification_details['rules']``, the ``target`` it is
+        checked against, whether it is ``required`` and a ``check`` callable
+        that takes the entrant's Instagram account and returns a bool.
+        ``check_key`` identifies the underlying Instagram check independently of
+        the giveaway, so identical checks can be shared across giveaways, and
+        ``api_calls`` is the number of Graph API requests one check costs.
+        Rules that can be evaluated for many accounts at once also carry a
+        ``batch_check`` callable returning ``{account_id: bool}``.
+        Rules answered from a local index built from Instagram data carry its
+        ``(index_type, key)`` as ``index``, so outcomes can report the index age.
+        """
+        plan = []
+        
+        if giveaway.verify_follow and giveaway.instagram_account_to_follow:
+            target = giveaway.instagram_account_to_follow
+            if GiveawayService.can_snapshot_followers(giveaway.created_by_id, target):
+                plan.append({
+                    'key': 'follow',
+                    'target': target,
+                    'check_key': ('follow', target),
+                    'api_calls': 0,  # Answered from the follower snapshot
+                    'required': True,
+                    'index': ('followers', target.lstrip('@').lower()),
+                    'check': lambda account, target=target: InstagramService.verify_follow(account, target),
+                    'batch_check': lambda accounts, target=target: InstagramService.verify_follows_bulk(accounts, target),
+                })
+            else:
+                # No snapshot will ever be taken, so don't let entrants wait on one
+                unavailable_check = make_unavailable_check(
+                    f"Follows of {target} can't be verified: it isn't the giveaway creator's connected Instagram account"
+                )
+                plan.append({
+                    'key': 'follow',
+                    'target': target,
+                    'check_key': ('follow_unavailable', target),
+                    'api_calls': 0,
+                    'required': True,
+                    'check': unavailable_check,
+                    'batch_check': unavailable_check,
+                })
+        
+        if giveaway.verify_like and giveaway.instagram_post_to_like:
+            target = giveaway.instagram_post_to_like
+            plan.append({
+                'key': 'like',
+                'target': target,
+                'check_key': ('like', target),
+                'api_calls': 0,  # Answered from the liker snapshot
+                'required': True,
+                'index': ('likers', target),
+                'check': lambda account, target=target: InstagramService.verify_like(account, target),
+                'batch_check': lambda accounts, target=target: InstagramService.verify_likes_bulk(accounts, target),
+            })
+        
+        if giveaway.verify_comment and giveaway.instagram_post_to_comment:
+            target = giveaway.instagram_post_to_comment
+            plan.append({
+                'key': 'comment',
+                'target': target,
+                'check_key': ('comment', target),
+                'api_calls': 0,  # Answered from the comment index
+                'required': True,
+                'index': ('comments', target),
+                'check': lambda account, target=target: InstagramService.verify_comment(account, target),
+                'batch_check': lambda accounts, target=target: InstagramService.verify_comments_bulk(accounts, target),
+            })
+        
+        if giveaway.verify_tags and giveaway.required_tag_count > 0 and giveaway.instagram_post_to_comment:
+            target = giveaway.instagram_post_to_comment
+            required_count = giveaway.required_tag_count
+            plan.append({
+                'key': 'tags',
+                'target': f"{target}:{required_count}",
+                'check_key': ('tags', target, required_count),
+                'api_calls': 0,  # Answered from the mention tallies
+                'required': True,
+                'index': ('comments', target),
+                'check': lambda account, target=target, required_count=required_count: (
+                    InstagramService.verify_tag_count(account, target, required_count)
+                ),
+                'batch_check': lambda accounts, target=target, required_count=required_count: (
+                    InstagramService.verify_tag_counts_bulk(accounts, target, required_count)
+                ),
+            })
+        
+        for custom_rule in giveaway.custom_rules.all():
+            evaluator = get_evaluator(custom_rule.rule_type)
+            if evaluator is None:
+                logger.warning(f"No evaluator registered for rule type {custom_rule.rule_type} (rule {custom_rule.id})")
+                check = lambda account: False
+                batch_check = None
+            else:
+                params = custom_rule.rule_params or {}
+                check = lambda account, evaluator=evaluator, params=params: evaluator.evaluate(params, account)
+                batch_check = lambda accounts, evaluator=evaluator, params=params: evaluator.evaluate_batch(params, accounts)
+            
+            plan.append({
+                'key': f'custom_rule_{custom_rule.id}',
+                'target': custom_rule.rule_type,
+                'check_key': ('custom', custom_rule.rule_type, json.dumps(custom_rule.rule_params, sort_keys=True)),
+                'api_calls': evaluator.api_calls if evaluator else 0,
+                'required': custom_rule.is_required,
+                'check': check,
+                'batch_check': batch_check,
+            })
+        
+        return plan
+    
+    @staticmethod
+    def can_snapshot_followers(user_id, target):
+        """
+        Check whether the followers of ``target`` can be snapshotted for a creator's giveaways.
+        
+        The followers edge is only readable with the followed account's own token,
+        so the target must be the creator's connected Instagram account.
+        """
+        return InstagramAccount.objects.filter(
+            user_id=user_id,
+            username__iexact=(target or '').lstrip('@')
+        ).exists()
+    
+    @staticmethod
+    def is_rule_result_reusable(result, rule, now=None):
+        """
+        Check whether a stored rule outcome can be reused instead of rechecked.
+        
+        Only outcomes that passed, were checked against the rule's current
+        target and are younger than ``GIVEAWAY_RULE_RESULT_TTL`` are reused.
+        Failed, errored and stale outcomes are always rechecked.
+        """
+        if not isinstance(result, dict) or not result.get('passed') or result.get('error'):
+            return False
+        if result.get('target') != rule['target']:
+            return False
+        
+        checked_at = parse_datetime(result.get('checked_at') or '')
+        if checked_at is None:
+            return False
+        
+        now = now or timezone.now()
+        return now - checked_at < timedelta(seconds=settings.GIVEAWAY_RULE_RESULT_TTL)
+    
+    @staticmethod
+    def estimate_revalidation(giveaway, workers=1):
+        """
+        Estimate what revalidating a giveaway's pending entries would cost, without calling Instagram.
+        
+        Compiles the giveaway's rule plan, counts pending entries, entries whose
+        account has a valid token and stored rule outcomes that would be reused,
+        and turns the remaining checks, plus refreshing the follower, liker and
+        comment indexes they read, into estimated Graph API calls, wall time
+        and share of the hourly API budget. Checks that call Instagram are
+        counted once per distinct account and ``check_key``, as
+        ``VerificationBatch`` memoizes them.
+        """
+        now = timezone.now()
+        plan = GiveawayService.get_rule_plan(giveaway)
+        pending_entries = giveaway.entries.filter(verification_status='pending')
+        verifiable_entries = pending_entries.filter(
+            instagram_account__access_token__isnull=False,
+            instagram_account__expires_at__gt=now
+        ).exclude(instagram_account__access_token='')
+        
+        pending_count = pending_entries.count()
+        verifiable_count = verifiable_entries.count()
+        
+        # Count stored outcomes that verify_entry would reuse instead of rechecking,
+        # and the distinct accounts each rule would still check
+        cache_hits = {rule['key']: 0 for rule in plan}
+        accounts_needed = {rule['key']: set() for rule in plan}
+        details_iter = verifiable_entries.values_list('instagram_account_id', 'verification_details').iterator(
+            chunk_size=2000
+        )
+        for account_id, details in details_iter:
+            previous_results = (details or {}).get('rules', {})
+            for rule in plan:
+                if GiveawayService.is_rule_result_reusable(previous_results.get(rule['key']), rule, now):
+                    cache_hits[rule['key']] += 1
+                else:
+                    accounts_needed[rule['key']].add(account_id)
+        
+        rules = []
+        live_checks = {}
+        indexes_needed = []
+        for rule in plan:
+            checks_needed = verifiable_count - cache_hits[rule['key']]
+            if rule.get('index'):
+                if checks_needed and rule['index'] not in indexes_needed:
+                    indexes_needed.append(rule['index'])
+            elif rule['api_calls']:
+                # Rules sharing a check_key share their memoized results
+                _, accounts = live_checks.setdefault(rule['check_key'], (rule['api_calls'], set()))
+                accounts.update(accounts_needed[rule['key']])
+            rules.append({
+                'key': rule['key'],
+                'required': rule['required'],
+                'api_calls_per_check': rule['api_calls'],
+                'cache_hits': cache_hits[rule['key']],
+                'checks_needed': checks_needed,
+                'accounts_needed': len(accounts_needed[rule['key']])
+            })
+        api_calls = sum(calls_per_check * len(accounts) for calls_per_check, accounts in live_checks.values())
+        
+        # Snapshot-backed checks make no calls per entry; the calls are in refreshing
+        # the indexes they read, once per distinct index however many rules share it
+        index_refreshes = []
+        for index_type, key in indexes_needed:
+            index_calls = InstagramService.estimate_sync_calls(index_type, key)
+            api_calls += index_calls
+            index_refreshes.append({'index_type': index_type, 'key': key, 'api_calls': index_calls})
+        
+        # Wall time is bound by request latency spread over workers, or by the hourly budget
+        hourly_budget = settings.INSTAGRAM_API_HOURLY_BUDGET
+        latency_seconds = settings.INSTAGRAM_API_AVG_LATENCY_MS / 1000
+        wall_seconds = max(
+            api_calls * latency_seconds / max(workers, 1),
+            api_calls / hourly_budget * 3600 if hourly_budget else 0
+        )
+        
+        return {
+            'giveaway_id': str(giveaway.id),
+            'dry_run': True,
+            'rules': rules,
+            'index_refreshes': index_refreshes,
+            'pending_entries': pending_count,
+            'verifiable_entries': verifiable_count,
+            'skipped_entries': pending_count - verifiable_count,
+            'workers': workers,
+            'estimated_api_calls': api_calls,
+            'estimated_wall_seconds': round(wall_seconds, 1),
+            'hourly_quota_percent': round(api_calls / hourly_budget * 100, 2) if hourly_budget else None
+        }
+    
+    @staticmethod
+    def verify_entry(entry, force=False, recheck_all=False, batch=None):
         """
         Verify a giveaway entry against all required verification rules.
+        
+        Outcomes from earlier runs are read from ``verification_details['rules']``
+        and only rules that failed, errored or went stale are rechecked. Pass
+        ``recheck_all`` to ignore previous outcomes entirely. A shared
+        ``VerificationBatch`` lets bulk callers reuse compiled rule plans and
+        check results across entries.
         """
         if entry.verification_status == 'verified' and not force:
             logger.info(f"Entry {entry.id} already verified")
@@ -87,58 +441,47 @@ class GiveawayService:
             logger.error(f"Invalid Instagram token for account {instagram_account.username}")
             entry.mark_failed({'error': 'Instagram token is invalid or expired'})
             raise GiveawayVerificationError("Instagram authorization is invalid or expired")
-            
+        
+        batch = batch or VerificationBatch()
+        now = timezone.now()
+        previous_results = {} if recheck_all else entry.verification_details.get('rules', {})
+        rule_results = {}
         verification_results = {}
         verification_passed = True
+        rechecked_rules = []
+        current_rule = None
         
         try:
-            # Verify follow rule if enabled
-            if giveaway.verify_follow and giveaway.instagram_account_to_follow:
-                follow_result = InstagramService.verify_follow(
-                    instagram_account, 
-                    giveaway.instagram_account_to_follow
-                )
-                verification_results['follow'] = follow_result
-                verification_passed = verification_passed and follow_result
-            
-            # Verify like rule if enabled
-            if giveaway.verify_like and giveaway.instagram_post_to_like:
-                like_result = InstagramService.verify_like(
-                    instagram_account, 
-                    giveaway.instagram_post_to_like
-                )
-                verification_results['like'] = like_result
-                verification_passed = verification_passed and like_result
-            
-            # Verify comment rule if enabled
-            if giveaway.verify_comment and giveaway.instagram_post_to_comment:
-                comment_result = InstagramService.verify_comment(
-                    instagram_account, 
-                    giveaway.instagram_post_to_comment
-                )
-                verification_results['comment'] = comment_result
-                verification_passed = verification_passed and comment_result
-            
-            # Verify tag rule if enabled
-            # This would require looking at comments on the post and checking tags
-            # Currently a placeholder as detailed implementation depends on Instagram API limitations
-            if giveaway.verify_tags and giveaway.required_tag_count > 0 and giveaway.instagram_post_to_comment:
-                tags_verified = True  # Placeholder for actual verification
-                verification_results['tags'] = tags_verified
-                verification_passed = verification_passed and tags_verified
-            
-            # Verify custom rules if any
-            for custom_rule in giveaway.custom_rules.all():
-                # Implementation would depend on custom rule types
-                # Placeholder for actual verification
-                rule_passed = True
-                verification_results[f'custom_rule_{custom_rule.id}'] = rule_passed
-                if custom_rule.is_required:
-                    verification_passed = verification_passed and rule_passed
+            for rule in batch.get_rule_plan(giveaway):
+                current_rule = rule
+                result = previous_results.get(rule['key'])
+                
+                if not GiveawayService.is_rule_result_reusable(result, rule, now):
+                    result = {
+                        'passed': batch.run_check(rule, instagram_account),
+                        'target': rule['target'],
+                        'checked_at': now.isoformat(),
+                    }
+                    if rule.get('index'):
+                        synced_at = batch.get_index_synced_at(rule['index'])
+                        if synced_at:
+                            result['snapshot_at'] = synced_at.isoformat()
+                            result['snapshot_age_seconds'] = max(int((now - synced_at).total_seconds()), 0)
+                    rechecked_rules.append(rule['key'])
+                
+                rule_results[rule['key']] = result
+                verification_results[rule['key']] = result['passed']
+                if rule['required']:
+                    verification_passed = verification_passed and result['passed']
+            current_rule = None
+            
+            logger.info(
+                f"Entry {entry.id}: rechecked {len(rechecked_rules)} of {len(rule_results)} rules"
+            )
             
             # Update entry status based on verification results
             if verification_passed:
-                entry.mark_verified(verification_results)
+                entry.mark_verified({**verification_results, 'rules': rule_results})
                 
                 # Log successful verification
                 AuditLog.objects.create(
@@ -148,13 +491,18 @@ class GiveawayService:
                     action_details={
                         'giveaway_id': str(giveaway.id),
                         'instagram_username': entry.instagram_username,
-                        'verification_results': verification_results
+                        'verification_results': verification_results,
+                        'rechecked_rules': rechecked_rules
                     }
                 )
                 
                 return True
             else:
-                entry.mark_failed({'error': 'Failed verification checks', 'details': verification_results})
+                entry.mark_failed({
+                    'error': 'Failed verification checks',
+                    'details': verification_results,
+                    'rules': rule_results
+                })
                 
                 # Log failed verification
                 AuditLog.objects.create(
@@ -164,7 +512,8 @@ class GiveawayService:
                     action_details={
                         'giveaway_id': str(giveaway.id),
                         'instagram_username': entry.instagram_username,
-                        'verification_results': verification_results
+                        'verification_results': verification_results,
+                        'rechecked_rules': rechecked_rules
                     }
                 )
                 
@@ -172,9 +521,112 @@ class GiveawayService:
                 
         except InstagramAPIError as e:
             logger.error(f"Instagram API error during verification: {str(e)}")
-            entry.mark_failed({'error': str(e)})
+            
+            # Keep the outcomes gathered so far so the next run only rechecks what is missing
+            rules = dict(entry.verification_details.get('rules', {}))
+            rules.update(rule_results)
+            if current_rule is not None:
+                rules[current_rule['key']] = {
+                    'passed': False,
+                    'target': current_rule['target'],
+                    'checked_at': now.isoformat(),
+                    'error': str(e),
+                }
+            
+            if isinstance(e, InstagramIndexUnavailableError):
+                # Retrying won't build the index, so leave the entry pending until the creator fixes the giveaway
+                entry.mark_unverifiable({'error': str(e), 'rules': rules})
+                raise GiveawayVerificationError(f"Entry cannot be verified: {str(e)}")
+            
+            if e.transient:
+                if entry.retry_count < settings.GIVEAWAY_VERIFICATION_MAX_RETRIES:
+                    GiveawayService.schedule_verification_retry(entry, {'error': str(e), 'rules': rules})
+                    raise GiveawayVerificationDeferred(
+                        f"Instagram is temporarily unavailable, verification retry {entry.retry_count} scheduled"
+                    )
+                
+                # Retries exhausted: dead-letter the entry so it stops cycling
+                logger.error(f"Entry {entry.id} exhausted {entry.retry_count} verification retries")
+                entry.mark_failed({'error': str(e), 'rules': rules, 'dead_lettered': True})
+                AuditLog.objects.create(
+                    action_type='entry_failed',
+                    object_id=str(entry.id),
+                    object_type='Entry',
+                    action_details={
+                        'giveaway_id': str(giveaway.id),
+                        'instagram_username': entry.instagram_username,
+                        'error': str(e),
+                        'retry_count': entry.retry_count,
+                        'dead_lettered': True
+                    }
+                )
+                raise GiveawayVerificationError(f"Instagram API error after {entry.retry_count} retries: {str(e)}")
+            
+            entry.mark_failed({'error': str(e), 'rules': rules})
             raise GiveawayVerificationError(f"Instagram API error: {str(e)}")
     
+    @staticmethod
+    def get_retry_delay(retry_count):
+        """
+        Get the backoff delay in seconds before the given retry attempt.
+        
+        Delays double on every attempt up to ``GIVEAWAY_VERIFICATION_RETRY_MAX_DELAY``
+        with up to 10% jitter so retries from one outage don't fire in lockstep.
+        """
+        delay = min(
+            settings.GIVEAWAY_VERIFICATION_RETRY_BASE_DELAY * (2 ** retry_count),
+            settings.GIVEAWAY_VERIFICATION_RETRY_MAX_DELAY
+        )
+        return delay + random.uniform(0, delay * 0.1)
+    
+    @staticmethod
+    def schedule_verification_retry(entry, details=None):
+        """
+        Park an entry in the ``retrying`` state and queue its next verification attempt.
+        """
+        from .tasks import retry_entry_verification
+        
+        delay = GiveawayService.get_retry_delay(entry.retry_count)
+        entry.mark_retrying(timezone.now() + timedelta(seconds=delay), details)
+        
+        # Only enqueue once the retrying state is committed, so the worker sees it
+        transaction.on_commit(
+            lambda: retry_entry_verification.apply_async(args=[str(entry.id)], countdown=delay)
+        )
+        return delay
+    
+    @staticmethod
+    def requeue_stalled_retries():
+        """
+        Re-queue retrying entries whose scheduled attempt never ran.
+        
+        Retries are queued with a countdown, so a worker restart or a broker
+        flush can lose them and leave the entry parked in ``retrying``. Entries
+        still waiting ``GIVEAWAY_RETRY_RECOVERY_GRACE_SECONDS`` after their retry
+        was due are queued again, and their ``next_retry_at`` is moved to now so
+        the next recovery run doesn't queue them twice.
+        """
+        from .tasks import retry_entry_verification
+        
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=settings.GIVEAWAY_RETRY_RECOVERY_GRACE_SECONDS)
+        with transaction.atomic():
+            entry_ids = list(
+                Entry.objects.select_for_update(skip_locked=True)
+                .filter(verification_status='retrying', next_retry_at__lte=cutoff)
+                .values_list('id', flat=True)
+            )
+            if not entry_ids:
+                return 0
+            Entry.objects.filter(id__in=entry_ids).update(next_retry_at=now, updated_at=now)
+        
+        # Only enqueue once the new next_retry_at is committed
+        for entry_id in entry_ids:
+            transaction.on_commit(lambda entry_id=entry_id: retry_entry_verification.delay(str(entry_id)))
+        
+        logger.warning(f"Re-queued {len(entry_ids)} entries whose verification retry was lost")
+        return len(entry_ids)
+    
     @staticmethod
     def select_winners(giveaway, count=None, user=None):
         """
@@ -201,22 +653,121 @@ class GiveawayService:
         return winner_entries
     
     @staticmethod
-    def revalidate_entries(giveaway, user=None):
+    def make_worker_id():
+        """Build an identifier for the current worker, used to own entry claims."""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    @staticmethod
+    def claim_entries(queryset, worker_id, ordering, limit=None, lease_seconds=None):
+        """
+        Claim up to ``limit`` entries from ``queryset`` for exclusive processing.
+        
+        Candidate rows are locked with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+        concurrent workers claim disjoint chunks without waiting on each other,
+        and each claim is leased until ``claim_expires_at`` so entries held by a
+        crashed worker become claimable again.
+        """
+        limit = limit or settings.GIVEAWAY_CLAIM_CHUNK_SIZE
+        lease_seconds = lease_seconds or settings.GIVEAWAY_CLAIM_LEASE_SECONDS
+        now = timezone.now()
+        
+        with transaction.atomic():
+            entry_ids = list(
+                queryset.filter(Q(claim_expires_at__isnull=True) | Q(claim_expires_at__lt=now))
+                .order_by(*ordering)
+                .select_for_update(skip_locked=True, of=('self',))
+                .values_list('id', flat=True)[:limit]
+            )
+            if not entry_ids:
+                return []
+            
+            Entry.objects.filter(id__in=entry_ids).update(
+                claimed_by=worker_id,
+                claim_expires_at=now + timedelta(seconds=lease_seconds)
+            )
+        
+        return list(
+            Entry.objects.filter(id__in=entry_ids, claimed_by=worker_id)
+            .select_related('giveaway', 'instagram_account')
+            .order_by(*ordering)
+        )
+    
+    @staticmethod
+    def release_entry_claims(entries, worker_id):
+        """Release claims held by a worker so the entries can be claimed again."""
+        Entry.objects.filter(
+            id__in=[entry.id for entry in entries],
+            claimed_by=worker_id
+        ).update(claimed_by=None, claim_expires_at=None)
+    
+    @staticmethod
+    def iter_claimed_entries(queryset, worker_id, ordering, chunk_size=None):
+        """
+        Yield successive chunks of entries claimed from ``queryset``.
+        
+        Iteration advances with a keyset cursor over ``ordering``, so entries
+        that are still pending after processing (for example because their
+        token expired) are not reclaimed within the same run. Claims on a chunk
+        are released once the caller moves on to the next one.
+        """
+        cursor = None
+        
+        while True:
+            candidates = queryset
+            if cursor is not None:
+                # Keyset condition: (f1, f2, ...) > cursor in lexicographic order
+                after = Q()
+                for i, field in enumerate(ordering):
+                    step = Q(**{f'{field}__gt': cursor[i]})
+                    for previous_field, value in zip(ordering[:i], cursor[:i]):
+                        step &= Q(**{previous_field: value})
+                    after |= step
+                candidates = candidates.filter(after)
+            
+            entries = GiveawayService.claim_entries(candidates, worker_id, ordering, limit=chunk_size)
+            if not entries:
+                return
+            
+            try:
+                yield entries
+            finally:
+                GiveawayService.release_entry_claims(entries, worker_id)
+            
+            cursor = tuple(getattr(entries[-1], field) for field in ordering)
+    
+    @staticmethod
+    def revalidate_entries(giveaway, user=None, worker_id=None):
         """
         Revalidate all pending entries for a giveaway.
+        
+        Entries are claimed in chunks, so several workers (or creators clicking
+        revalidate at the same time) split the backlog instead of verifying the
+        same entries twice.
         """
+        worker_id = worker_id or GiveawayService.make_worker_id()
         pending_entries = giveaway.entries.filter(verification_status='pending')
+        processed_count = 0
         validated_count = 0
+        batch = VerificationBatch()
         
-        for entry in pending_entries:
-            if entry.instagram_account and entry.instagram_account.is_token_valid:
-                try:
-                    if GiveawayService.verify_entry(entry):
-                        validated_count += 1
-                except Exception as e:
-                    logger.error(f"Error revalidating entry {entry.id}: {str(e)}")
+        for entries in GiveawayService.iter_claimed_entries(pending_entries, worker_id, ('created_at', 'id')):
+            batch.prefetch([
+                entry for entry in entries
+                if entry.instagram_account and entry.instagram_account.is_token_valid
+            ])
+            for entry in entries:
+                processed_count += 1
+                if entry.instagram_account and entry.instagram_account.is_token_valid:
+                    try:
+                        if GiveawayService.verify_entry(entry, batch=batch):
+                            validated_count += 1
+                    except Exception as e:
+                        logger.error(f"Error revalidating entry {entry.id}: {str(e)}")
                     
-        logger.info(f"Revalidated {validated_count} of {pending_entries.count()} entries for giveaway {giveaway.id}")
+        logger.info(
+            f"Worker {worker_id} revalidated {validated_count} of {processed_count} claimed entries "
+            f"for giveaway {giveaway.id}"
+        )
         
         # Log revalidation action
         AuditLog.objects.create(
@@ -226,8 +777,243 @@ class GiveawayService:
             object_type='Giveaway',
             action_details={
                 'pending_count': pending_entries.count(),
-                'validated_count': validated_count
+                'processed_count': processed_count,
+                'validated_count': validated_count,
+                'worker_id': worker_id
             }
         )
         
-        return validated_count 
\ No newline at end of file
+        return validated_count
+    
+    @staticmethod
+    def verify_entries_for_interactions(media_id, usernames, worker_id=None):
+        """
+        Verify entries whose giveaway rules depend on a post that just received interactions.
+        
+        Called as webhook events arrive, so entrants are verified as soon as
+        they comment instead of at the next sweep. Pending entries are checked,
+        and so are failed ones, since those usually failed because the comment
+        hadn't been made yet.
+        """
+        worker_id = worker_id or GiveawayService.make_worker_id()
+        now = timezone.now()
+        entries = Entry.objects.annotate(
+            account_username=Lower('instagram_account__username')
+        ).filter(
+            Q(giveaway__verify_comment=True) | Q(giveaway__verify_tags=True),
+            giveaway__instagram_post_to_comment=media_id,
+            giveaway__status='active',
+            giveaway__end_date__gte=now,
+            verification_status__in=['pending', 'failed'],
+            account_username__in=list(usernames)
+        )
+        
+        verified_count = 0
+        batch = VerificationBatch()
+        for chunk in GiveawayService.iter_claimed_entries(entries, worker_id, ('created_at', 'id')):
+            verifiable = [entry for entry in chunk if entry.instagram_account.is_token_valid]
+            batch.prefetch(verifiable)
+            for entry in verifiable:
+                try:
+                    if GiveawayService.verify_entry(entry, batch=batch):
+                        verified_count += 1
+                except (GiveawayVerificationError, InstagramAPIError) as e:
+                    logger.warning(f"Auto-verification of entry {entry.id} failed: {str(e)}")
+        
+        logger.info(f"Auto-verified {verified_count} entries after interactions on media {media_id}")
+        return verified_count
+    
+    @staticmethod
+    def enqueue_revalidation(giveaway, workers=1, user=None):
+        """Queue revalidation of a giveaway on ``workers`` Celery workers that split its backlog."""
+        from .tasks import revalidate_giveaway_entries
+        
+        user_id = user.id if user else None
+        for _ in range(workers):
+            revalidate_giveaway_entries.delay(str(giveaway.id), user_id)
+        logger.info(f"Queued revalidation of giveaway {giveaway.id} on {workers} workers")
+    
+    @staticmethod
+    def get_owner_account(giveaway):
+        """Get the giveaway creator's Instagram account if its token is valid, else None."""
+        instagram_account = InstagramAccount.objects.filter(user_id=giveaway.created_by_id).first()
+        if instagram_account and instagram_account.is_token_valid:
+            return instagram_account
+        return None
+    
+    @staticmethod
+    def refresh_comment_indexes():
+        """
+        Ingest new comments for every post an active giveaway verifies comments or tags on.
+        
+        Posts shared by several giveaways are synced once, using the token of the
+        first creator with a valid Instagram connection.
+        """
+        now = timezone.now()
+        giveaways = Giveaway.objects.filter(
+            Q(verify_comment=True) | Q(verify_tags=True),
+            status='active',
+            end_date__gte=now,
+            instagram_post_to_comment__isnull=False
+        ).exclude(instagram_post_to_comment='').order_by('instagram_post_to_comment')
+        
+        synced = 0
+        for media_id, media_giveaways in groupby(giveaways, key=attrgetter('instagram_post_to_comment')):
+            owner_account = None
+            for giveaway in media_giveaways:
+                owner_account = GiveawayService.get_owner_account(giveaway)
+                if owner_account:
+                    break
+            
+            if owner_account is None:
+                logger.warning(f"No valid Instagram connection to index comments for media {media_id}")
+                continue
+            
+            try:
+                InstagramService.sync_post_comments(owner_account, media_id)
+                synced += 1
+            except InstagramAPIError as e:
+                logger.error(f"Error indexing comments for media {media_id}: {str(e)}")
+        
+        return synced
+    
+    @staticmethod
+    def refresh_follower_snapshots():
+        """
+        Refresh the follower snapshot of every account an active giveaway requires following.
+        
+        The followers edge can only be read with the followed account's own
+        token, so a target is synced through the first giveaway creator whose
+        connected Instagram account is that target.
+        """
+        now = timezone.now()
+        giveaways = Giveaway.objects.filter(
+            verify_follow=True,
+            status='active',
+            end_date__gte=now,
+            instagram_account_to_follow__isnull=False
+        ).exclude(instagram_account_to_follow='')
+        
+        owners = {}
+        for giveaway in giveaways:
+            target = giveaway.instagram_account_to_follow.lstrip('@').lower()
+            if owners.get(target) is not None:
+                continue
+            owner_account = GiveawayService.get_owner_account(giveaway)
+            owners[target] = owner_account if owner_account and (owner_account.username or '').lower() == target else None
+        
+        synced = 0
+        for target, owner_account in owners.items():
+            if owner_account is None:
+                logger.warning(f"No valid Instagram connection for {target} to snapshot its followers")
+                continue
+            
+            try:
+                InstagramService.sync_followers(owner_account)
+                synced += 1
+            except InstagramAPIError as e:
+                logger.error(f"Error snapshotting followers of {target}: {str(e)}")
+        
+        return synced
+    
+    @staticmethod
+    def refresh_liker_snapshots():
+        """
+        Refresh the liker snapshot of every post an active giveaway requires liking.
+        
+        Posts shared by several giveaways are synced once, using the token of the
+        first creator with a valid Instagram connection.
+        """
+        now = timezone.now()
+        giveaways = Giveaway.objects.filter(
+            verify_like=True,
+            status='active',
+            end_date__gte=now,
+            instagram_post_to_like__isnull=False
+        ).exclude(instagram_post_to_like='').order_by('instagram_post_to_like')
+        
+        synced = 0
+        for media_id, media_giveaways in groupby(giveaways, key=attrgetter('instagram_post_to_like')):
+            owner_account = None
+            for giveaway in media_giveaways:
+                owner_account = GiveawayService.get_owner_account(giveaway)
+                if owner_account:
+                    break
+            
+            if owner_account is None:
+                logger.warning(f"No valid Instagram connection to snapshot likers of media {media_id}")
+                continue
+            
+            try:
+                InstagramService.sync_post_likers(owner_account, media_id)
+                synced += 1
+            except InstagramAPIError as e:
+                logger.error(f"Error snapshotting likers of media {media_id}: {str(e)}")
+        
+        return synced
+    
+    @staticmethod
+    def sweep_active_giveaways(worker_id=None):
+        """
+        Revalidate pending entries across every active giveaway, grouped by Instagram account.
+        
+        Each account's token is validated once and its Instagram checks are shared
+        across all the giveaways it entered, instead of being repeated per giveaway.
+        Entries are claimed in chunks so concurrent sweeps don't overlap.
+        """
+        worker_id = worker_id or GiveawayService.make_worker_id()
+        now = timezone.now()
+        pending_entries = Entry.objects.filter(
+            verification_status='pending',
+            instagram_account__isnull=False,
+            giveaway__status='active',
+            giveaway__start_date__lte=now,
+            giveaway__end_date__gte=now
+        )
+        
+        stats = {'accounts': 0, 'skipped_accounts': 0, 'entries': 0, 'validated': 0}
+        plans = {}
+        batch = VerificationBatch(plans=plans)
+        current_account_id = None
+        skip_account = False
+        
+        chunks = GiveawayService.iter_claimed_entries(pending_entries, worker_id, ('instagram_account_id', 'id'))
+        for entries in chunks:
+            # Only the last account of the previous chunk can continue into this one
+            batch = VerificationBatch(plans=plans, results={
+                key: value for key, value in batch.results.items() if key[1] == current_account_id
+            })
+            batch.prefetch([entry for entry in entries if entry.instagram_account.is_token_valid])
+            
+            for account_id, account_entries in groupby(entries, key=attrgetter('instagram_account_id')):
+                account_entries = list(account_entries)
+                instagram_account = account_entries[0].instagram_account
+                
+                if account_id != current_account_id:
+                    current_account_id = account_id
+                    skip_account = not instagram_account.is_token_valid
+                    if skip_account:
+                        stats['skipped_accounts'] += 1
+                        logger.info(f"Skipping entries for account {instagram_account.username} with invalid token")
+                    else:
+                        stats['accounts'] += 1
+                
+                if skip_account:
+                    continue
+                
+                for entry in account_entries:
+                    stats['entries'] += 1
+                    try:
+                        if GiveawayService.verify_entry(entry, batch=batch):
+                            stats['validated'] += 1
+                    except GiveawayVerificationError as e:
+                        logger.warning(f"Error revalidating entry {entry.id} during sweep: {str(e)}")
+                    except Exception as e:
+                        # One bad entry must not stop the sweep for every account after it
+                        logger.error(f"Unexpected error revalidating entry {entry.id} during sweep: {str(e)}")
+        
+        logger.info(
+            f"Sweep validated {stats['validated']} of {stats['entries']} entries "
+            f"across {stats['accounts']} accounts ({stats['skipped_accounts']} skipped)"
+        )
+        return stats
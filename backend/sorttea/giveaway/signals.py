@@ -0,0 +1,23 @@
+"""
+Signal receivers for the Giveaway app.
+"""
+
+import logging
+from django.dispatch import Signal, receiver
+from sorttea.instagram.signals import interactions_ingested
+from .services import GiveawayService
+
+logger = logging.getLogger('sorttea.giveaway')
+
+# Sent with ``entry`` and ``previous_status`` after an entry's verification status changes
+entry_status_changed = Signal()
+
+
+@receiver(interactions_ingested)
+def verify_entries_on_interactions(sender, media_id, usernames, **kwargs):
+    """Verify entries that the newly ingested interactions may satisfy."""
+    try:
+        GiveawayService.verify_entries_for_interactions(media_id, usernames)
+    except Exception as e:
+        # Entries are still picked up by the next sweep, so never fail event processing
+        logger.error(f"Error auto-verifying entries for media {media_id}: {str(e)}")
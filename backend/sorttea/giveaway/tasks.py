@@ -0,0 +1,76 @@
+"""
+Celery tasks for the Giveaway app.
+"""
+
+import logging
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from sorttea.instagram.telemetry import retry_scope
+from .models import Giveaway, Entry
+from .services import GiveawayService, GiveawayVerificationError
+
+logger = logging.getLogger('sorttea.giveaway')
+
+
+@shared_task(ignore_result=True)
+def retry_entry_verification(entry_id):
+    """Retry verification for an entry parked in the ``retrying`` state."""
+    try:
+        entry = Entry.objects.select_related('giveaway', 'instagram_account').get(id=entry_id)
+    except Entry.DoesNotExist:
+        logger.warning(f"Skipping verification retry for missing entry {entry_id}")
+        return
+    
+    if entry.verification_status != 'retrying':
+        logger.info(f"Skipping verification retry for entry {entry_id} in status {entry.verification_status}")
+        return
+    
+    try:
+        with retry_scope():
+            GiveawayService.verify_entry(entry)
+    except GiveawayVerificationError as e:
+        # Transient failures have already been rescheduled by verify_entry
+        logger.warning(f"Verification retry for entry {entry_id} did not complete: {str(e)}")
+
+
+@shared_task(ignore_result=True)
+def requeue_stalled_retries():
+    """Periodically re-queue retrying entries whose countdown task was lost."""
+    GiveawayService.requeue_stalled_retries()
+
+
+@shared_task(ignore_result=True)
+def sweep_active_giveaways():
+    """Periodically revalidate pending entries across all active giveaways."""
+    GiveawayService.sweep_active_giveaways()
+
+
+@shared_task(ignore_result=True)
+def revalidate_giveaway_entries(giveaway_id, user_id=None):
+    """Revalidate a giveaway's pending entries; several of these can split one backlog."""
+    try:
+        giveaway = Giveaway.objects.get(id=giveaway_id)
+    except Giveaway.DoesNotExist:
+        logger.warning(f"Skipping revalidation for missing giveaway {giveaway_id}")
+        return
+    
+    user = get_user_model().objects.filter(id=user_id).first() if user_id else None
+    GiveawayService.revalidate_entries(giveaway, user=user)
+
+
+@shared_task(ignore_result=True)
+def refresh_comment_indexes():
+    """Periodically ingest new comments on posts used by active giveaways."""
+    GiveawayService.refresh_comment_indexes()
+
+
+@shared_task(ignore_result=True)
+def refresh_follower_snapshots():
+    """Periodically snapshot the followers of accounts active giveaways require following."""
+    GiveawayService.refresh_follower_snapshots()
+
+
+@shared_task(ignore_result=True)
+def refresh_liker_snapshots():
+    """Periodically snapshot the likers of posts active giveaways require liking."""
+    GiveawayService.refresh_liker_snapshots()
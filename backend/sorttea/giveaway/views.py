@@ -3,6 +3,7 @@ Views for the Giveaway app.
 """
 
 import logging
+from django.conf import settings
 from django.db.models import Q
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
@@ -13,7 +14,7 @@ from .serializers import (
     GiveawaySerializer, EntrySerializer, WinnerSerializer,
     VerificationRuleSerializer, AuditLogSerializer
 )
-from .services import GiveawayService, GiveawayVerificationError
+from .services import GiveawayService, GiveawayVerificationError, GiveawayVerificationDeferred
 from sorttea.instagram.models import InstagramAccount
 
 logger = logging.getLogger('sorttea.giveaway')
@@ -107,6 +108,35 @@ class GiveawayViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # Optionally split the backlog across several Celery workers
+        workers = request.data.get('workers')
+        if workers is not None:
+            try:
+                workers = int(workers)
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'Worker count must be a number'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not 1 <= workers <= settings.GIVEAWAY_MAX_REVALIDATION_WORKERS:
+                return Response(
+                    {'error': f'Worker count must be between 1 and {settings.GIVEAWAY_MAX_REVALIDATION_WORKERS}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        # Dry run: report the estimated cost without calling Instagram
+        dry_run = str(request.data.get('dry_run', request.query_params.get('dry_run', ''))).lower() == 'true'
+        if dry_run:
+            return Response(GiveawayService.estimate_revalidation(giveaway, workers=workers or 1))
+        
+        if workers is not None:
+            GiveawayService.enqueue_revalidation(giveaway, workers=workers, user=request.user)
+            return Response({
+                'queued_workers': workers,
+                'total_pending': giveaway.entries.filter(verification_status='pending').count(),
+                'message': f'Revalidation queued on {workers} workers'
+            }, status=status.HTTP_202_ACCEPTED)
+        
         try:
             # Revalidate entries
             validated_count = GiveawayService.revalidate_entries(giveaway, user=request.user)
@@ -188,6 +218,8 @@ class EntryViewSet(viewsets.ModelViewSet):
         try:
             # Force verification
             force = request.data.get('force', False)
+            # A manual attempt starts a new retry budget rather than inheriting an exhausted one
+            entry.reset_retries()
             result = GiveawayService.verify_entry(entry, force=force)
             
             return Response({
@@ -196,6 +228,12 @@ class EntryViewSet(viewsets.ModelViewSet):
                 'verification_details': entry.verification_details
             })
             
+        except GiveawayVerificationDeferred as e:
+            return Response({
+                'detail': str(e),
+                'verification_status': entry.verification_status,
+                'next_retry_at': entry.next_retry_at
+            }, status=status.HTTP_202_ACCEPTED)
         except GiveawayVerificationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
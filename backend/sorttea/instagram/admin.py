@@ -3,16 +3,23 @@ Admin interface for the Instagram app.
 """
 
 from django.contrib import admin
-from .models import InstagramAccount, InstagramMediaCache, InstagramInteraction
+from .models import (
+    InstagramAccount, InstagramMediaCache, InstagramInteraction,
+    InstagramSyncState, InstagramComment, InstagramCommentMention, InstagramMentionTally,
+    InstagramFollower, InstagramLiker, InstagramWebhookEvent
+)
 
 
 @admin.register(InstagramAccount)
 class InstagramAccountAdmin(admin.ModelAdmin):
     """Admin interface for InstagramAccount model."""
-    list_display = ('username', 'user', 'instagram_user_id', 'is_token_valid', 'created_at')
-    list_filter = ('created_at',)
+    list_display = ('username', 'user', 'instagram_user_id', 'is_token_valid', 'expires_at', 'token_refreshed_at', 'created_at')
+    list_filter = ('created_at', 'expires_at')
     search_fields = ('username', 'user__username', 'instagram_user_id')
-    readonly_fields = ('created_at', 'updated_at', 'is_token_valid')
+    readonly_fields = (
+        'created_at', 'updated_at', 'is_token_valid',
+        'token_refreshed_at', 'token_refresh_attempted_at', 'token_refresh_error'
+    )
     
     def is_token_valid(self, obj):
         """Display if token is valid."""
@@ -36,4 +43,61 @@ class InstagramInteractionAdmin(admin.ModelAdmin):
     list_display = ('instagram_account', 'target_username', 'interaction_type', 'verified', 'created_at')
     list_filter = ('interaction_type', 'verified', 'created_at')
     search_fields = ('instagram_account__username', 'target_username', 'target_media_id')
-    readonly_fields = ('created_at', 'updated_at', 'verified_at') 
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at', 'verified_at')
+
+
+@admin.register(InstagramSyncState)
+class InstagramSyncStateAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramSyncState model."""
+    list_display = ('index_type', 'key', 'item_count', 'last_synced_at', 'last_full_sync_at')
+    list_filter = ('index_type',)
+    search_fields = ('key',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(InstagramComment)
+class InstagramCommentAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramComment model."""
+    list_display = ('comment_id', 'media_id', 'commenter_username', 'timestamp')
+    search_fields = ('media_id', 'commenter_username', 'text')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(InstagramCommentMention)
+class InstagramCommentMentionAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramCommentMention model."""
+    list_display = ('media_id', 'commenter_username', 'mentioned_username', 'created_at')
+    search_fields = ('media_id', 'commenter_username', 'mentioned_username')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(InstagramMentionTally)
+class InstagramMentionTallyAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramMentionTally model."""
+    list_display = ('media_id', 'commenter_username', 'mention_count', 'updated_at')
+    search_fields = ('media_id', 'commenter_username')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(InstagramFollower)
+class InstagramFollowerAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramFollower model."""
+    list_display = ('target_username', 'follower_username', 'first_seen_at', 'last_seen_at')
+    search_fields = ('target_username', 'follower_username')
+    readonly_fields = ('first_seen_at',)
+
+
+@admin.register(InstagramLiker)
+class InstagramLikerAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramLiker model."""
+    list_display = ('media_id', 'liker_username', 'last_seen_at')
+    search_fields = ('media_id', 'liker_username')
+
+
+@admin.register(InstagramWebhookEvent)
+class InstagramWebhookEventAdmin(admin.ModelAdmin):
+    """Admin interface for InstagramWebhookEvent model."""
+    list_display = ('event_key', 'field', 'media_id', 'received_at', 'processed_at')
+    list_filter = ('field', 'received_at', 'processed_at')
+    search_fields = ('event_key', 'media_id', 'object_id')
+    readonly_fields = ('received_at',)
@@ -0,0 +1,277 @@
+"""
+Stand-in for the Instagram Graph API, for offline load and integration testing.
+
+The server answers the endpoints ``InstagramService`` calls with synthetic,
+deterministic data (paged like the real API), and can inject latency, errors
+and rate limiting. Responses recorded from the real API are stored as
+fixtures and replayed in preference to synthetic data. Point
+``INSTAGRAM_GRAPH_URL`` and ``INSTAGRAM_TOKEN_URL`` at it to use it, e.g. via
+``manage.py fake_graph_api``.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import requests
+
+logger = logging.getLogger('sorttea.instagram')
+
+# Parameters that identify the caller rather than the data, left out of fixture keys
+VOLATILE_PARAMS = {'access_token', 'client_secret', 'code'}
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(offset):
+    """Encode a list offset as an opaque paging cursor."""
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a paging cursor, treating anything malformed as the first page."""
+    try:
+        return max(int(base64.urlsafe_b64decode(cursor.encode()).decode()), 0)
+    except (ValueError, UnicodeDecodeError):
+        return 0
+
+
+def fixture_key(method, path, params):
+    """Build the file name a response is recorded under."""
+    stable = sorted((key, value) for key, value in params.items() if key not in VOLATILE_PARAMS)
+    digest = hashlib.sha1(json.dumps([method, path, stable]).encode()).hexdigest()[:16]
+    return f"{method.lower()}_{path.strip('/').replace('/', '_') or 'root'}_{digest}.json"
+
+
+class FakeGraphAPIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server imitating the Graph API.
+    
+    ``latency_ms`` (plus up to ``jitter_ms``) is added to every response.
+    ``error_rate`` is the share of requests answered with a transient 500 and
+    ``hourly_limit`` caps calls per rolling hour, reported through the
+    ``X-App-Usage`` header and enforced with Graph error code 4. The
+    ``*_count`` arguments size the synthetic data. With ``fixtures_dir`` set,
+    recorded responses are replayed from it, and with ``record_from`` set,
+    requests without a fixture are forwarded there and recorded.
+    """
+    daemon_threads = True
+    
+    def __init__(self, address=('127.0.0.1', 0), latency_ms=0, jitter_ms=0, error_rate=0.0,
+                 hourly_limit=None, media_count=20, comment_count=100, like_count=100,
+                 follower_count=1000, fixtures_dir=None, record_from=None, seed=None):
+        super().__init__(address, FakeGraphAPIHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.hourly_limit = hourly_limit
+        self.media_count = media_count
+        self.comment_count = comment_count
+        self.like_count = like_count
+        self.follower_count = follower_count
+        self.fixtures_dir = fixtures_dir
+        self.record_from = record_from.rstrip('/') if record_from else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = deque()
+        self.request_count = 0
+        
+        if fixtures_dir:
+            os.makedirs(fixtures_dir, exist_ok=True)
+    
+    @property
+    def url(self):
+        """Base URL to use as ``INSTAGRAM_GRAPH_URL``."""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def start(self):
+        """Serve in a background thread and return the thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+    
+    def stop(self):
+        """Stop serving and release the socket."""
+        self.shutdown()
+        self.server_close()
+    
+    def track_call(self):
+        """Count a call against the hourly limit, returning ``(usage_percent, limited)``."""
+        now = time.time()
+        with self.lock:
+            self.request_count += 1
+            self.calls.append(now)
+            while self.calls and self.calls[0] <= now - 3600:
+                self.calls.popleft()
+            used = len(self.calls)
+        if not self.hourly_limit:
+            return 0, False
+        return min(int(used * 100 / self.hourly_limit), 100), used > self.hourly_limit
+    
+    def should_fail(self):
+        """Decide whether to inject an error into this request."""
+        with self.lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+    
+    def delay(self):
+        """Sleep for the configured latency."""
+        with self.lock:
+            jitter = self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        if self.latency_ms or jitter:
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+
+class FakeGraphAPIHandler(BaseHTTPRequestHandler):
+    """Request handler for ``FakeGraphAPIServer``."""
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        logger.debug(f"Fake Graph API: {format % args}")
+    
+    def do_GET(self):
+        self.handle_request('GET', dict(parse_qsl(urlsplit(self.path).query)))
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        self.handle_request('POST', {**dict(parse_qsl(urlsplit(self.path).query)), **dict(parse_qsl(body))})
+    
+    def handle_request(self, method, params):
+        server = self.server
+        path = urlsplit(self.path).path.rstrip('/') or '/'
+        server.delay()
+        
+        usage, limited = server.track_call()
+        headers = {'X-App-Usage': json.dumps({'call_count': usage, 'total_time': usage, 'total_cputime': usage})}
+        
+        if limited:
+            return self.send_json(403, self.error_body(4, 'Application request limit reached', transient=True), headers)
+        if server.should_fail():
+            return self.send_json(500, self.error_body(2, 'An unexpected error has occurred', transient=True), headers)
+        
+        recorded = self.load_fixture(method, path, params)
+        if recorded is None and server.record_from:
+            recorded = self.record(method, path, params)
+        if recorded is not None:
+            return self.send_json(recorded['status'], recorded['body'], headers)
+        
+        status, body = self.synthesize(method, path, params)
+        self.send_json(status, body, headers)
+    
+    def error_body(self, code, message, transient=False):
+        """Build a Graph API error payload."""
+        return {'error': {'message': message, 'type': 'OAuthException', 'code': code, 'is_transient': transient}}
+    
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def load_fixture(self, method, path, params):
+        """Get a recorded response, or None."""
+        if not self.server.fixtures_dir:
+            return None
+        try:
+            with open(os.path.join(self.server.fixtures_dir, fixture_key(method, path, params))) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def record(self, method, path, params):
+        """Forward a request upstream and store its response as a fixture."""
+        url = f'{self.server.record_from}{path}'
+        try:
+            if method == 'POST':
+                response = requests.post(url, data=params, timeout=30)
+            else:
+                response = requests.get(url, params=params, timeout=30)
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Fake Graph API could not record {method} {path}: {str(e)}")
+            return {'status': 502, 'body': self.error_body(2, f'Recording failed: {e}', transient=True)}
+        
+        # Recorded paging links point upstream; rewrite them to come back here
+        if isinstance(body, dict) and (body.get('paging') or {}).get('next'):
+            body['paging']['next'] = body['paging']['next'].replace(self.server.record_from, self.base_url())
+        
+        recorded = {'status': response.status_code, 'body': body}
+        if self.server.fixtures_dir and response.status_code == 200:
+            with open(os.path.join(self.server.fixtures_dir, fixture_key(method, path, params)), 'w') as f:
+                json.dump(recorded, f, indent=2)
+        return recorded
+    
+    def base_url(self):
+        return f"http://{self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]}"
+    
+    def synthesize(self, method, path, params):
+        """Build a synthetic response for the endpoints InstagramService uses."""
+        access_token = params.get('access_token', '')
+        if access_token.startswith('invalid'):
+            return 400, self.error_body(190, 'Invalid OAuth access token')
+        
+        # Tokens of the form "anything:username" log in as that username
+        username = access_token.rsplit(':', 1)[1] if ':' in access_token else 'fake_user'
+        segments = path.strip('/').split('/')
+        
+        if method == 'POST' and path == '/oauth/access_token':
+            return 200, {'access_token': f"short-{params.get('code', '')}:{username}", 'user_id': 17841400000000}
+        if path in ('/access_token', '/refresh_access_token'):
+            return 200, {'access_token': f'long-{int(time.time())}:{username}', 'token_type': 'bearer', 'expires_in': 5184000}
+        if path == '/me':
+            return 200, {'id': str(17841400000000 + sum(map(ord, username))), 'username': username}
+        if path == '/me/media':
+            return 200, self.page(params, self.server.media_count, lambda i: {
+                'id': f'{username}_m{i}',
+                'caption': f'Post {i} by {username} #sorttea',
+                'media_type': 'IMAGE',
+                'permalink': f'https://www.instagram.com/p/{username}_m{i}/',
+                'timestamp': (EPOCH - timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S+0000'),
+                'username': username,
+            })
+        if len(segments) == 2 and segments[1] == 'comments':
+            media_id = segments[0]
+            total = self.server.comment_count
+            # Newest comments first, like the real edge
+            return 200, self.page(params, total, lambda i: {
+                'id': f'{media_id}_c{total - i}',
+                'username': f'user{total - i}',
+                'text': f'Entering! @friend{(total - i) % 7} @friend{(total - i + 1) % 7}',
+                'timestamp': (EPOCH + timedelta(minutes=total - i)).strftime('%Y-%m-%dT%H:%M:%S+0000'),
+            })
+        if len(segments) == 2 and segments[1] == 'likes':
+            return 200, self.page(params, self.server.like_count, lambda i: {'id': str(i), 'username': f'user{i}'})
+        if len(segments) == 2 and segments[1] == 'followers':
+            return 200, self.page(params, self.server.follower_count, lambda i: {'id': str(i), 'username': f'user{i}'})
+        
+        return 400, self.error_body(100, f'Unsupported {method.lower()} request to {path}')
+    
+    def page(self, params, total, make_item):
+        """Build one page of a paged edge with cursor paging."""
+        try:
+            limit = min(max(int(params.get('limit', 25)), 1), 100)
+        except ValueError:
+            limit = 25
+        offset = decode_cursor(params['after']) if params.get('after') else 0
+        end = min(offset + limit, total)
+        
+        body = {'data': [make_item(i) for i in range(offset, end)]}
+        if end > offset:
+            body['paging'] = {'cursors': {'before': encode_cursor(offset), 'after': encode_cursor(end)}}
+            if end < total:
+                next_params = {**params, 'after': encode_cursor(end)}
+                body['paging']['next'] = f'{self.base_url()}{urlsplit(self.path).path}?{urlencode(next_params)}'
+        return body
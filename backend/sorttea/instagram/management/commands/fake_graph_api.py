@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from sorttea.instagram.fakegraph import FakeGraphAPIServer
+
+
+class Command(BaseCommand):
+    help = 'Runs a local stand-in for the Instagram Graph API for offline load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=int, default=0, help='Latency added to every response')
+        parser.add_argument('--jitter-ms', type=int, default=0, help='Random extra latency, up to this much')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a transient 500')
+        parser.add_argument('--hourly-limit', type=int, help='Calls allowed per rolling hour before Graph error 4')
+        parser.add_argument('--media', type=int, default=20, help='Media items per account')
+        parser.add_argument('--comments', type=int, default=100, help='Comments per post')
+        parser.add_argument('--likes', type=int, default=100, help='Likes per post')
+        parser.add_argument('--followers', type=int, default=1000, help='Followers per account')
+        parser.add_argument('--fixtures', help='Directory of recorded responses to replay (and to record into)')
+        parser.add_argument('--record-from', help='Upstream URL to forward unrecorded requests to, e.g. https://graph.instagram.com')
+        parser.add_argument('--seed', type=int, help='Seed for latency jitter and error injection')
+
+    def handle(self, *args, **options):
+        server = FakeGraphAPIServer(
+            (options['host'], options['port']),
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            hourly_limit=options['hourly_limit'],
+            media_count=options['media'],
+            comment_count=options['comments'],
+            like_count=options['likes'],
+            follower_count=options['followers'],
+            fixtures_dir=options['fixtures'],
+            record_from=options['record_from'],
+            seed=options['seed']
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f'Fake Graph API listening on {server.url}'))
+        self.stdout.write(f'Set INSTAGRAM_GRAPH_URL={server.url} and INSTAGRAM_TOKEN_URL={server.url}/oauth/access_token')
+        
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Served {server.request_count} requests')
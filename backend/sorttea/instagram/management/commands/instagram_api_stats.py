@@ -0,0 +1,57 @@
+import json
+from django.core.management.base import BaseCommand
+from sorttea.instagram.services import InstagramService
+from sorttea.instagram.telemetry import is_cache_shared, telemetry
+
+
+class Command(BaseCommand):
+    help = 'Prints per-endpoint Instagram API telemetry: latency, status codes, errors, bytes and quota usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', help='Only show calls made with this Instagram client ID')
+        parser.add_argument('--json', action='store_true', help='Print the raw summary as JSON')
+        parser.add_argument('--reset', action='store_true', help='Clear the stored telemetry after printing it')
+
+    def handle(self, *args, **options):
+        summaries = InstagramService.get_api_telemetry(options['app'])
+        if not is_cache_shared():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process (set CACHE_URL to share it), '
+                'so calls made by web and worker processes are not included'
+            ))
+        
+        if options['json']:
+            self.stdout.write(json.dumps(summaries, indent=2, default=str))
+        elif not summaries:
+            self.stdout.write('No Instagram API calls recorded yet')
+        else:
+            self.stdout.write(
+                f"{'app':<16} {'endpoint':<20} {'calls':>7} {'errors':>7} {'retries':>7} "
+                f"{'avg ms':>8} {'p50':>6} {'p95':>6} {'p99':>6} {'KB in':>9} {'KB out':>8}"
+            )
+            for summary in summaries:
+                latency = summary['latency_ms']
+                self.stdout.write(
+                    f"{summary['app'][:16]:<16} {summary['endpoint']:<20} {summary['requests']:>7} "
+                    f"{summary['errors']:>7} {summary['retries']:>7} {self.format_ms(latency['avg']):>8} "
+                    f"{self.format_ms(latency['p50']):>6} {self.format_ms(latency['p95']):>6} "
+                    f"{self.format_ms(latency['p99']):>6} {summary['bytes_received'] / 1024:>9.1f} "
+                    f"{summary['bytes_sent'] / 1024:>8.1f}"
+                )
+                details = []
+                if summary['status_codes']:
+                    details.append('status ' + ', '.join(f'{code}: {count}' for code, count in summary['status_codes'].items()))
+                if summary['errors_by_kind']:
+                    details.append('errors ' + ', '.join(f'{kind}: {count}' for kind, count in summary['errors_by_kind'].items()))
+                for header, value in (summary['rate_limit'] or {}).items():
+                    if header != 'updated_at':
+                        details.append(f'{header} {json.dumps(value)}')
+                for detail in details:
+                    self.stdout.write(f"{'':<38}{detail}")
+        
+        if options['reset']:
+            telemetry.reset()
+            self.stdout.write(self.style.SUCCESS('Instagram API telemetry cleared'))
+
+    def format_ms(self, value):
+        return '-' if value is None else f'{value:g}'
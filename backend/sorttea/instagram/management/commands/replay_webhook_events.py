@@ -0,0 +1,69 @@
+import hashlib
+import hmac
+import json
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sorttea.instagram.models import InstagramWebhookEvent
+from sorttea.instagram.services import InstagramService
+
+
+class Command(BaseCommand):
+    help = 'Replays recorded Instagram webhook payloads, in process or against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='JSON file with a payload, a list of payloads or one payload per line')
+        parser.add_argument('--url', help='POST signed payloads to this webhook URL instead of ingesting them in process')
+        parser.add_argument('--pending', action='store_true', help='Process stored events that were never processed')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            events = list(InstagramWebhookEvent.objects.filter(processed_at__isnull=True).order_by('received_at'))
+            InstagramService.process_webhook_events(events)
+            self.stdout.write(self.style.SUCCESS(f'Processed {len(events)} pending webhook events'))
+            return
+        
+        if not options['path']:
+            raise CommandError('Provide a payload file or --pending')
+        
+        payloads = self.load_payloads(options['path'])
+        new_count = 0
+        
+        for payload in payloads:
+            if options['url']:
+                body = json.dumps(payload).encode()
+                signature = hmac.new(settings.INSTAGRAM_CLIENT_SECRET.encode(), body, hashlib.sha256).hexdigest()
+                response = requests.post(
+                    options['url'],
+                    data=body,
+                    headers={'Content-Type': 'application/json', 'X-Hub-Signature-256': f'sha256={signature}'}
+                )
+                if response.status_code != 200:
+                    raise CommandError(f'Webhook rejected payload: {response.status_code} {response.text}')
+                new_count += response.json().get('received', 0)
+            else:
+                events = InstagramService.store_webhook_events(payload)
+                InstagramService.process_webhook_events(events)
+                new_count += len(events)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {len(payloads)} payloads ({new_count} new events, the rest were duplicates)'
+        ))
+
+    def load_payloads(self, path):
+        """Read payloads from a JSON document or from JSON lines."""
+        try:
+            with open(path) as f:
+                content = f.read()
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        
+        try:
+            data = json.loads(content)
+        except ValueError:
+            try:
+                data = [json.loads(line) for line in content.splitlines() if line.strip()]
+            except ValueError as e:
+                raise CommandError(f'{path} is neither JSON nor JSON lines: {e}')
+        
+        return data if isinstance(data, list) else [data]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramComment',
+            fields=[
+                ('comment_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('media_id', models.CharField(max_length=255)),
+                ('commenter_username', models.CharField(max_length=255)),
+                ('text', models.TextField(blank=True, default='')),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['media_id', 'commenter_username'], name='instagram_i_media_i_9f858a_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InstagramSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_type', models.CharField(choices=[('comments', 'Comments')], max_length=20)),
+                ('key', models.CharField(max_length=255)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('index_type', 'key')},
+            },
+        ),
+    ]
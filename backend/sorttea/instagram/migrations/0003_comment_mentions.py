@@ -0,0 +1,83 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:21
+
+import re
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+MENTION_PATTERN = re.compile(r'(?<![\w.@])@([A-Za-z0-9._]{1,30})')
+
+
+def backfill_mentions(apps, schema_editor):
+    """Index mentions in comments that were ingested before the mention index existed."""
+    InstagramComment = apps.get_model('instagram', 'InstagramComment')
+    InstagramCommentMention = apps.get_model('instagram', 'InstagramCommentMention')
+    InstagramMentionTally = apps.get_model('instagram', 'InstagramMentionTally')
+    
+    mentions = {}
+    for comment in InstagramComment.objects.filter(text__contains='@').iterator():
+        for match in MENTION_PATTERN.findall(comment.text):
+            username = match.rstrip('.').lower()
+            if username and username != comment.commenter_username:
+                key = (comment.media_id, comment.commenter_username, username)
+                mentions.setdefault(key, InstagramCommentMention(
+                    media_id=comment.media_id,
+                    commenter_username=comment.commenter_username,
+                    mentioned_username=username,
+                    comment=comment
+                ))
+    InstagramCommentMention.objects.bulk_create(mentions.values(), batch_size=1000)
+    
+    tallies = (
+        InstagramCommentMention.objects.values('media_id', 'commenter_username')
+        .annotate(total=Count('mentioned_username'))
+    )
+    InstagramMentionTally.objects.bulk_create(
+        [
+            InstagramMentionTally(
+                media_id=tally['media_id'],
+                commenter_username=tally['commenter_username'],
+                mention_count=tally['total']
+            )
+            for tally in tallies
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram', '0002_comment_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramMentionTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_id', models.CharField(max_length=255)),
+                ('commenter_username', models.CharField(max_length=255)),
+                ('mention_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('media_id', 'commenter_username'), name='unique_mention_tally')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InstagramCommentMention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_id', models.CharField(max_length=255)),
+                ('commenter_username', models.CharField(max_length=255)),
+                ('mentioned_username', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='instagram.instagramcomment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('media_id', 'commenter_username', 'mentioned_username'), name='unique_comment_mention')],
+            },
+        ),
+        migrations.RunPython(backfill_mentions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram', '0003_comment_mentions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='instagramsyncstate',
+            name='index_type',
+            field=models.CharField(choices=[('comments', 'Comments'), ('followers', 'Followers')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='InstagramFollower',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_username', models.CharField(max_length=255)),
+                ('follower_username', models.CharField(max_length=255)),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('target_username', 'follower_username'), name='unique_instagram_follower')],
+            },
+        ),
+    ]
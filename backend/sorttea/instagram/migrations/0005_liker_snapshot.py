@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram', '0004_follower_snapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='instagramsyncstate',
+            name='index_type',
+            field=models.CharField(choices=[('comments', 'Comments'), ('followers', 'Followers'), ('likers', 'Likers')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='InstagramLiker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_id', models.CharField(max_length=255)),
+                ('liker_username', models.CharField(max_length=255)),
+                ('last_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('media_id', 'liker_username'), name='unique_instagram_liker')],
+            },
+        ),
+    ]
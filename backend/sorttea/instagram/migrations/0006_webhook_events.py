@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram', '0005_liker_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_key', models.CharField(max_length=255, unique=True)),
+                ('field', models.CharField(max_length=50)),
+                ('object_id', models.CharField(blank=True, default='', max_length=255)),
+                ('media_id', models.CharField(blank=True, default='', max_length=255)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at', 'received_at'], name='instagram_i_process_fb281d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram', '0006_webhook_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagramaccount',
+            name='token_refresh_attempted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='instagramaccount',
+            name='token_refresh_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='instagramaccount',
+            name='token_refreshed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='instagramaccount',
+            index=models.Index(fields=['expires_at'], name='instagram_i_expires_6b1fb0_idx'),
+        ),
+    ]
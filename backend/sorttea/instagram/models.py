@@ -18,6 +18,9 @@ class InstagramAccount(models.Model):
     access_token = models.TextField(blank=True, null=True)
     token_type = models.CharField(max_length=50, blank=True, null=True)
     expires_at = models.DateTimeField(blank=True, null=True)
+    token_refreshed_at = models.DateTimeField(blank=True, null=True)
+    token_refresh_attempted_at = models.DateTimeField(blank=True, null=True)
+    token_refresh_error = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -38,6 +41,12 @@ class InstagramAccount(models.Model):
         self.save()
         logger.info(f"Token updated for Instagram account {self.username}")
 
+    class Meta:
+        indexes = [
+            # Scanned by the proactive token refresh job
+            models.Index(fields=['expires_at']),
+        ]
+
 
 class InstagramMediaCache(models.Model):
     """Model to cache Instagram media information to reduce API calls."""
@@ -99,4 +108,140 @@ class InstagramInteraction(models.Model):
                 fields=['instagram_account', 'target_username', 'target_media_id', 'interaction_type'],
                 name='unique_instagram_interaction'
             )
-        ] 
\ No newline at end of file
+        ]
+
+
+class InstagramSyncState(models.Model):
+    """Model to track ingestion progress of indexes built from paged Instagram data."""
+    INDEX_TYPES = (
+        ('comments', 'Comments'),
+        ('followers', 'Followers'),
+        ('likers', 'Likers'),
+    )
+    
+    index_type = models.CharField(max_length=20, choices=INDEX_TYPES)
+    key = models.CharField(max_length=255)  # Media ID or username the index was built for
+    item_count = models.PositiveIntegerField(default=0)
+    last_synced_at = models.DateTimeField(blank=True, null=True)
+    last_full_sync_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.index_type} index for {self.key}"
+    
+    class Meta:
+        unique_together = ('index_type', 'key')
+
+
+class InstagramComment(models.Model):
+    """Model to index comments ingested from a post, so comment checks are a single lookup."""
+    comment_id = models.CharField(max_length=255, primary_key=True)
+    media_id = models.CharField(max_length=255)
+    commenter_username = models.CharField(max_length=255)  # Stored lowercase
+    text = models.TextField(blank=True, default='')
+    timestamp = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Comment {self.comment_id} by {self.commenter_username} on {self.media_id}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['media_id', 'commenter_username']),
+        ]
+
+
+class InstagramCommentMention(models.Model):
+    """Model to record each distinct account a commenter @mentioned on a post."""
+    media_id = models.CharField(max_length=255)
+    commenter_username = models.CharField(max_length=255)  # Stored lowercase
+    mentioned_username = models.CharField(max_length=255)  # Stored lowercase
+    comment = models.ForeignKey(InstagramComment, on_delete=models.CASCADE, related_name='mentions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.commenter_username} mentioned @{self.mentioned_username} on {self.media_id}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['media_id', 'commenter_username', 'mentioned_username'],
+                name='unique_comment_mention'
+            )
+        ]
+
+
+class InstagramMentionTally(models.Model):
+    """Model to keep a per-post count of distinct accounts each commenter mentioned."""
+    media_id = models.CharField(max_length=255)
+    commenter_username = models.CharField(max_length=255)  # Stored lowercase
+    mention_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.commenter_username} mentioned {self.mention_count} accounts on {self.media_id}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['media_id', 'commenter_username'],
+                name='unique_mention_tally'
+            )
+        ]
+
+
+class InstagramFollower(models.Model):
+    """Model to snapshot the followers of a giveaway's target account, so follow checks are a single lookup."""
+    target_username = models.CharField(max_length=255)  # Stored lowercase
+    follower_username = models.CharField(max_length=255)  # Stored lowercase
+    first_seen_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.follower_username} follows {self.target_username}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['target_username', 'follower_username'],
+                name='unique_instagram_follower'
+            )
+        ]
+
+
+class InstagramLiker(models.Model):
+    """Model to snapshot the accounts that liked a post, so like checks are a single lookup."""
+    media_id = models.CharField(max_length=255)
+    liker_username = models.CharField(max_length=255)  # Stored lowercase
+    last_seen_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.liker_username} liked {self.media_id}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['media_id', 'liker_username'],
+                name='unique_instagram_liker'
+            )
+        ]
+
+
+class InstagramWebhookEvent(models.Model):
+    """Model to persist webhook events, deduplicated by ``event_key``, until they're processed."""
+    event_key = models.CharField(max_length=255, unique=True)
+    field = models.CharField(max_length=50)  # Webhook field, e.g. comments or mentions
+    object_id = models.CharField(max_length=255, blank=True, default='')  # Instagram account the event was sent for
+    media_id = models.CharField(max_length=255, blank=True, default='')
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.field} webhook event {self.event_key}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'received_at']),
+        ]
@@ -0,0 +1,213 @@
+"""
+Resilience helpers for calls to the Instagram API.
+
+Circuit breaker state lives in the Django cache, so every process sharing a
+cache backend sees the same state for an endpoint.
+"""
+
+import copy
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('sorttea.instagram')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one Instagram API endpoint.
+    
+    Outcomes are counted in per-second buckets over a rolling window of
+    ``INSTAGRAM_CIRCUIT_WINDOW_SECONDS``. Once at least
+    ``INSTAGRAM_CIRCUIT_MIN_REQUESTS`` calls were made in the window and the
+    share of failures reaches ``INSTAGRAM_CIRCUIT_ERROR_THRESHOLD``, the circuit
+    opens and calls are rejected without reaching Instagram. After
+    ``INSTAGRAM_CIRCUIT_COOLDOWN_SECONDS`` the circuit is half-open: a single
+    probe call is let through, closing the circuit if it succeeds and
+    reopening it if it fails.
+    """
+    
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.key_prefix = f'instagram:circuit:{endpoint}'
+    
+    def _bucket_keys(self, now):
+        """Get the cache keys of the counters in the rolling window ending at ``now``."""
+        current = int(now)
+        buckets = range(current - settings.INSTAGRAM_CIRCUIT_WINDOW_SECONDS + 1, current + 1)
+        return (
+            [f'{self.key_prefix}:total:{bucket}' for bucket in buckets],
+            [f'{self.key_prefix}:errors:{bucket}' for bucket in buckets]
+        )
+    
+    def _increment(self, key):
+        """Increment a bucket counter, creating it with an expiry just past the window."""
+        cache.add(key, 0, timeout=settings.INSTAGRAM_CIRCUIT_WINDOW_SECONDS + 1)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The counter expired between add and incr
+            cache.set(key, 1, timeout=settings.INSTAGRAM_CIRCUIT_WINDOW_SECONDS + 1)
+    
+    def get_window_counts(self, now=None):
+        """Get ``(total, errors)`` for the rolling window."""
+        total_keys, error_keys = self._bucket_keys(now or time.time())
+        values = cache.get_many(total_keys + error_keys)
+        return (
+            sum(values.get(key, 0) for key in total_keys),
+            sum(values.get(key, 0) for key in error_keys)
+        )
+    
+    def get_state(self, now=None):
+        """Get the current state: closed, open or half_open."""
+        opened_at = cache.get(f'{self.key_prefix}:opened_at')
+        if opened_at is None:
+            return CLOSED
+        if (now or time.time()) - opened_at < settings.INSTAGRAM_CIRCUIT_COOLDOWN_SECONDS:
+            return OPEN
+        return HALF_OPEN
+    
+    def allow_request(self):
+        """Check whether a call may go through, claiming the probe slot when half-open."""
+        state = self.get_state()
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        # Only one caller gets to probe; the slot expires in case the probe never reports back
+        return cache.add(f'{self.key_prefix}:probe', 1, timeout=settings.INSTAGRAM_CIRCUIT_COOLDOWN_SECONDS)
+    
+    def record_success(self):
+        """Record a call that reached Instagram and got a usable answer."""
+        now = time.time()
+        self._increment(self._bucket_keys(now)[0][-1])
+        if self.get_state(now) != CLOSED:
+            self.close()
+    
+    def record_failure(self):
+        """Record a call that failed because Instagram is unavailable, opening the circuit if needed."""
+        now = time.time()
+        total_keys, error_keys = self._bucket_keys(now)
+        self._increment(total_keys[-1])
+        self._increment(error_keys[-1])
+        
+        if self.get_state(now) != CLOSED:
+            # A failed probe reopens the circuit for another cooldown
+            self.open(now)
+            return
+        
+        total, errors = self.get_window_counts(now)
+        if total >= settings.INSTAGRAM_CIRCUIT_MIN_REQUESTS and errors / total >= settings.INSTAGRAM_CIRCUIT_ERROR_THRESHOLD:
+            self.open(now)
+    
+    def open(self, now=None):
+        """Open the circuit, rejecting calls until the cooldown passes."""
+        cache.set(f'{self.key_prefix}:opened_at', now or time.time(), timeout=None)
+        cache.delete(f'{self.key_prefix}:probe')
+        logger.warning(f"Circuit opened for Instagram endpoint {self.endpoint}")
+    
+    def close(self):
+        """Close the circuit and start a fresh window."""
+        total_keys, error_keys = self._bucket_keys(time.time())
+        cache.delete_many(total_keys + error_keys + [f'{self.key_prefix}:opened_at', f'{self.key_prefix}:probe'])
+        logger.info(f"Circuit closed for Instagram endpoint {self.endpoint}")
+    
+    def get_metrics(self):
+        """Get the state and rolling window counts of the circuit."""
+        now = time.time()
+        total, errors = self.get_window_counts(now)
+        opened_at = cache.get(f'{self.key_prefix}:opened_at')
+        return {
+            'endpoint': self.endpoint,
+            'state': self.get_state(now),
+            'window_requests': total,
+            'window_errors': errors,
+            'error_rate': round(errors / total, 3) if total else 0.0,
+            'open_for_seconds': round(now - opened_at, 1) if opened_at else None,
+        }
+
+
+def get_circuit_breaker(endpoint):
+    """Get the circuit breaker for an endpoint."""
+    return CircuitBreaker(endpoint)
+
+
+def get_circuit_metrics(endpoints):
+    """Get metrics for the circuits of the given endpoints."""
+    return [CircuitBreaker(endpoint).get_metrics() for endpoint in endpoints]
+
+
+class InFlightCall:
+    """A call being made on behalf of every caller that asked for the same key."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls within this process.
+    
+    The first caller for a key makes the call; callers arriving while it is in
+    flight wait for it and share its result or exception instead of making
+    their own. Nothing is cached once the call completes.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.shared = 0
+    
+    def do(self, key, fn):
+        """Run ``fn`` for ``key``, or wait for the in-flight call with the same key."""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = InFlightCall()
+                self.executed += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        
+        # Callers may mutate what they get back, so a shared result is never handed out as is
+        return copy.deepcopy(call.result) if call.waiters else call.result
+    
+    def get_metrics(self):
+        """Get counts of calls made and calls answered by sharing an in-flight result."""
+        with self.lock:
+            return {
+                'in_flight': len(self.calls),
+                'executed': self.executed,
+                'shared': self.shared,
+            }
+
+
+single_flight = SingleFlight()
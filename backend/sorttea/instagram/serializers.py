@@ -15,7 +15,7 @@ class InstagramAccountSerializer(serializers.ModelSerializer):
         model = InstagramAccount
         fields = [
             'id', 'instagram_user_id', 'username', 'is_token_valid', 
-            'token_expires_in', 'created_at', 'updated_at'
+            'token_expires_in', 'token_refreshed_at', 'created_at', 'updated_at'
         ]
         read_only_fields = fields
     
@@ -2,28 +2,126 @@
 Service layer for Instagram API interactions.
 """
 
+import hashlib
+import hmac
+import json
 import logging
+import re
+import time
+from urllib.parse import urlencode
 import requests
 from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
 from django.utils import timezone
-from .models import InstagramAccount, InstagramMediaCache, InstagramInteraction
+from django.utils.dateparse import parse_datetime
+from .models import (
+    InstagramAccount, InstagramMediaCache, InstagramInteraction,
+    InstagramSyncState, InstagramComment, InstagramCommentMention, InstagramMentionTally,
+    InstagramFollower, InstagramLiker, InstagramWebhookEvent
+)
+from .resilience import get_circuit_breaker, get_circuit_metrics, single_flight
+from .signals import interactions_ingested
+from .telemetry import classify_error, parse_rate_limit_headers, telemetry
 
 logger = logging.getLogger('sorttea.instagram')
 
-INSTAGRAM_API_BASE_URL = 'https://graph.instagram.com'
 INSTAGRAM_OAUTH_URL = 'https://api.instagram.com/oauth/authorize'
-INSTAGRAM_TOKEN_URL = 'https://api.instagram.com/oauth/access_token'
-INSTAGRAM_GRAPH_URL = 'https://graph.instagram.com'
+
+# Endpoints calls are grouped by for circuit breaking and metrics
+API_ENDPOINTS = (
+    'oauth/access_token', 'access_token', 'refresh_access_token', 'me', 'me/media',
+    'media/comments', 'media/likes', 'user/followers',
+)
+
+
+# Graph API error codes that signal a temporary condition on Instagram's side
+# (unknown/service errors, throttling and temporarily blocked calls)
+TRANSIENT_GRAPH_ERROR_CODES = {1, 2, 4, 17, 32, 341, 613}
+
+# Instagram usernames are up to 30 letters, digits, periods and underscores;
+# the lookbehind skips email addresses and "@@" runs
+MENTION_PATTERN = re.compile(r'(?<![\w.@])@([A-Za-z0-9._]{1,30})')
+
+
+def extract_mentions(text):
+    """Return the distinct lowercase usernames @mentioned in a piece of text."""
+    mentions = {match.rstrip('.').lower() for match in MENTION_PATTERN.findall(text or '')}
+    mentions.discard('')
+    return mentions
 
 
 class InstagramAPIError(Exception):
-    """Exception raised for Instagram API errors."""
-    pass
+    """
+    Exception raised for Instagram API errors.
+    
+    ``transient`` is True for failures worth retrying later (timeouts, connection
+    errors, 5xx/429 responses and Graph API throttling codes) and False for
+    permanent ones such as invalid tokens or bad requests.
+    """
+    
+    def __init__(self, message, status_code=None, transient=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.transient = transient
+    
+    @classmethod
+    def from_response(cls, message, response):
+        """Build an error for a failed response, classifying it as transient or permanent."""
+        return cls(message, status_code=response.status_code, transient=is_transient_response(response))
+    
+    @classmethod
+    def from_request_exception(cls, message, exc):
+        """Build an error for a network failure, classifying it as transient or permanent."""
+        transient = isinstance(exc, (requests.Timeout, requests.ConnectionError))
+        return cls(message, transient=transient)
+
+
+class InstagramIndexUnavailableError(InstagramAPIError):
+    """
+    Exception raised when the index a check reads can't be built at all.
+    
+    Unlike an index that hasn't been ingested yet, retrying won't help: follower
+    snapshots, for example, can only be taken of an account whose own token we hold.
+    """
+    
+    def __init__(self, message):
+        super().__init__(message, transient=False)
+
+
+def get_graph_error_code(response):
+    """Get the Graph API error code of a failed response, or None."""
+    try:
+        payload = response.json()
+    except ValueError:
+        return None
+    
+    error = payload.get('error') if isinstance(payload, dict) else None
+    return error.get('code') if isinstance(error, dict) else None
+
+
+def is_transient_response(response):
+    """Check whether a failed Instagram API response is worth retrying."""
+    if response.status_code == 429 or response.status_code >= 500:
+        return True
+    
+    try:
+        payload = response.json()
+    except ValueError:
+        return False
+    
+    error = payload.get('error') if isinstance(payload, dict) else None
+    if not isinstance(error, dict):
+        return False
+    return error.get('is_transient') is True or error.get('code') in TRANSIENT_GRAPH_ERROR_CODES
 
 
 class InstagramService:
     """Service for interaction with Instagram API."""
     
+    # Items requested per page when ingesting each index
+    INDEX_PAGE_SIZES = {'comments': 50, 'followers': 100, 'likers': 100}
+    
     @staticmethod
     def get_auth_url():
         """Get the Instagram OAuth authorization URL."""
@@ -38,6 +136,100 @@ class InstagramService:
         auth_url = f"{INSTAGRAM_OAUTH_URL}?client_id={client_id}&redirect_uri={redirect_uri}&scope={scope}&response_type=code"
         return auth_url
     
+    @staticmethod
+    def _send(method, url, endpoint, action, **kwargs):
+        """
+        Send a request to the Instagram API through the endpoint's circuit breaker.
+        
+        Returns the decoded JSON body of a successful response and raises
+        ``InstagramAPIError`` otherwise. While the circuit is open the call fails
+        fast with a transient error, without reaching Instagram. Only transient
+        failures count against the circuit; permanent ones such as invalid
+        tokens say nothing about Instagram's health.
+        
+        Identical concurrent GET requests in this process are coalesced, so
+        only one of them reaches Instagram and the others share its outcome.
+        """
+        if method != 'GET':
+            return InstagramService._send_now(method, url, endpoint, action, **kwargs)
+        
+        key = (url, tuple(sorted((kwargs.get('params') or {}).items())))
+        return single_flight.do(key, lambda: InstagramService._send_now(method, url, endpoint, action, **kwargs))
+    
+    @staticmethod
+    def _send_now(method, url, endpoint, action, **kwargs):
+        """Make a single request through the endpoint's circuit breaker, recording its telemetry."""
+        breaker = get_circuit_breaker(endpoint)
+        if not breaker.allow_request():
+            logger.warning(f"Instagram {action} rejected: circuit open for {endpoint}")
+            telemetry.record(endpoint, error_kind='circuit_open')
+            raise InstagramAPIError(
+                f"Instagram {endpoint} is temporarily unavailable, try again later",
+                status_code=503,
+                transient=True
+            )
+        
+        send = requests.post if method == 'POST' else requests.get
+        bytes_sent = len(url) + len(urlencode(kwargs.get('params') or kwargs.get('data') or {}))
+        started = time.monotonic()
+        try:
+            response = send(url, timeout=settings.INSTAGRAM_API_TIMEOUT_SECONDS, **kwargs)
+        except requests.RequestException as e:
+            telemetry.record(
+                endpoint,
+                latency_ms=(time.monotonic() - started) * 1000,
+                error_kind=classify_error(exc=e),
+                bytes_sent=bytes_sent
+            )
+            logger.error(f"Instagram {action} request failed: {str(e)}")
+            error = InstagramAPIError.from_request_exception(f"Network error during {action}: {str(e)}", e)
+            if error.transient:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise error
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        content = getattr(response, 'content', None)
+        telemetry.record(
+            endpoint,
+            latency_ms=latency_ms,
+            status_code=response.status_code,
+            error_kind=None if response.status_code == 200 else classify_error(
+                response.status_code, get_graph_error_code(response)
+            ),
+            bytes_sent=bytes_sent,
+            bytes_received=len(content) if isinstance(content, (bytes, str)) else 0,
+            rate_limits=parse_rate_limit_headers(getattr(response, 'headers', None))
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Instagram {action} failed: {response.text}")
+            error = InstagramAPIError.from_response(f"Failed to {action}: {response.text}", response)
+            if error.transient:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise error
+        
+        breaker.record_success()
+        return response.json()
+    
+    @staticmethod
+    def get_api_metrics():
+        """Get circuit breaker state for every Instagram API endpoint."""
+        return get_circuit_metrics(API_ENDPOINTS)
+    
+    @staticmethod
+    def get_coalescing_metrics():
+        """Get single-flight counts for this process."""
+        return single_flight.get_metrics()
+    
+    @staticmethod
+    def get_api_telemetry(app=None):
+        """Get latency, status, error, byte and quota telemetry per Instagram API endpoint."""
+        return telemetry.get_summary(API_ENDPOINTS, app=app)
+    
     @staticmethod
     def exchange_code_for_token(code):
         """Exchange authorization code for access token."""
@@ -49,107 +241,160 @@ class InstagramService:
             logger.error("Instagram client ID or secret not configured.")
             raise InstagramAPIError("Instagram client ID or secret not configured.")
             
-        try:
-            response = requests.post(INSTAGRAM_TOKEN_URL, data={
+        token_data = InstagramService._send(
+            'POST',
+            settings.INSTAGRAM_TOKEN_URL,
+            'oauth/access_token',
+            'exchange code for token',
+            data={
                 'client_id': client_id,
                 'client_secret': client_secret,
                 'grant_type': 'authorization_code',
                 'redirect_uri': redirect_uri,
                 'code': code
-            })
-            
-            if response.status_code != 200:
-                logger.error(f"Instagram token exchange failed: {response.text}")
-                raise InstagramAPIError(f"Failed to exchange code for token: {response.text}")
-                
-            token_data = response.json()
-            
-            # Get long-lived token
-            long_lived_token = InstagramService.exchange_token(token_data['access_token'])
-            
-            # Get user profile info
-            user_info = InstagramService.get_user_info(long_lived_token['access_token'])
-            
-            return {
-                'access_token': long_lived_token['access_token'],
-                'token_type': 'Bearer',
-                'expires_in': long_lived_token['expires_in'],
-                'user_id': user_info['id'],
-                'username': user_info['username']
             }
-            
-        except requests.RequestException as e:
-            logger.error(f"Instagram token exchange request failed: {str(e)}")
-            raise InstagramAPIError(f"Network error during token exchange: {str(e)}")
+        )
+        
+        # Get long-lived token
+        long_lived_token = InstagramService.exchange_token(token_data['access_token'])
+        
+        # Get user profile info
+        user_info = InstagramService.get_user_info(long_lived_token['access_token'])
+        
+        return {
+            'access_token': long_lived_token['access_token'],
+            'token_type': 'Bearer',
+            'expires_in': long_lived_token['expires_in'],
+            'user_id': user_info['id'],
+            'username': user_info['username']
+        }
     
     @staticmethod
     def exchange_token(short_lived_token):
         """Exchange a short-lived token for a long-lived token."""
-        client_secret = settings.INSTAGRAM_CLIENT_SECRET
-        
-        try:
-            response = requests.get(
-                f"{INSTAGRAM_GRAPH_URL}/access_token",
-                params={
-                    'grant_type': 'ig_exchange_token',
-                    'client_secret': client_secret,
-                    'access_token': short_lived_token
-                }
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Instagram token exchange failed: {response.text}")
-                raise InstagramAPIError(f"Failed to exchange for long-lived token: {response.text}")
-                
-            return response.json()
-            
-        except requests.RequestException as e:
-            logger.error(f"Instagram token exchange request failed: {str(e)}")
-            raise InstagramAPIError(f"Network error during token exchange: {str(e)}")
+        return InstagramService._send(
+            'GET',
+            f"{settings.INSTAGRAM_GRAPH_URL}/access_token",
+            'access_token',
+            'exchange for long-lived token',
+            params={
+                'grant_type': 'ig_exchange_token',
+                'client_secret': settings.INSTAGRAM_CLIENT_SECRET,
+                'access_token': short_lived_token
+            }
+        )
     
     @staticmethod
     def refresh_token(access_token):
         """Refresh a long-lived Instagram token before it expires."""
-        try:
-            response = requests.get(
-                f"{INSTAGRAM_GRAPH_URL}/refresh_access_token",
-                params={
-                    'grant_type': 'ig_refresh_token',
-                    'access_token': access_token
-                }
-            )
+        return InstagramService._send(
+            'GET',
+            f"{settings.INSTAGRAM_GRAPH_URL}/refresh_access_token",
+            'refresh_access_token',
+            'refresh token',
+            params={
+                'grant_type': 'ig_refresh_token',
+                'access_token': access_token
+            }
+        )
+    
+    @staticmethod
+    def get_expiring_accounts(now=None):
+        """Get accounts with a token that is still valid but expires within the refresh window."""
+        now = now or timezone.now()
+        return InstagramAccount.objects.filter(
+            expires_at__gt=now,
+            expires_at__lte=now + timezone.timedelta(days=settings.INSTAGRAM_TOKEN_REFRESH_WINDOW_DAYS)
+        ).exclude(access_token__isnull=True).exclude(access_token='')
+    
+    @staticmethod
+    def refresh_expiring_tokens(limit=None):
+        """
+        Refresh tokens that expire within ``INSTAGRAM_TOKEN_REFRESH_WINDOW_DAYS``, soonest first.
+        
+        At most ``limit`` tokens are refreshed per run, spaced
+        ``INSTAGRAM_TOKEN_REFRESH_DELAY_MS`` apart to stay within Instagram's
+        rate limits. Accounts whose refresh failed are retried after
+        ``INSTAGRAM_TOKEN_REFRESH_RETRY_MINUTES``, and the run stops at the
+        first transient error rather than hammering an unavailable API.
+        Outcomes are recorded on each account. Returns counts per outcome.
+        """
+        limit = limit or settings.INSTAGRAM_TOKEN_REFRESH_BATCH_SIZE
+        now = timezone.now()
+        retry_before = now - timezone.timedelta(minutes=settings.INSTAGRAM_TOKEN_REFRESH_RETRY_MINUTES)
+        candidates = list(
+            InstagramService.get_expiring_accounts(now)
+            .filter(Q(token_refresh_attempted_at__isnull=True) | Q(token_refresh_attempted_at__lt=retry_before))
+            .order_by('expires_at')[:limit]
+        )
+        
+        outcomes = {'refreshed': 0, 'failed': 0, 'skipped': 0}
+        for index, account in enumerate(candidates):
+            # Claim the account so an overlapping run doesn't refresh it twice
+            claimed = InstagramAccount.objects.filter(
+                id=account.id,
+                token_refresh_attempted_at=account.token_refresh_attempted_at
+            ).update(token_refresh_attempted_at=timezone.now())
+            if not claimed:
+                outcomes['skipped'] += 1
+                continue
             
-            if response.status_code != 200:
-                logger.error(f"Instagram token refresh failed: {response.text}")
-                raise InstagramAPIError(f"Failed to refresh token: {response.text}")
-                
-            return response.json()
+            if index and settings.INSTAGRAM_TOKEN_REFRESH_DELAY_MS:
+                time.sleep(settings.INSTAGRAM_TOKEN_REFRESH_DELAY_MS / 1000)
             
-        except requests.RequestException as e:
-            logger.error(f"Instagram token refresh request failed: {str(e)}")
-            raise InstagramAPIError(f"Network error during token refresh: {str(e)}")
+            try:
+                token_data = InstagramService.refresh_token(account.access_token)
+            except InstagramAPIError as e:
+                InstagramAccount.objects.filter(id=account.id).update(token_refresh_error=str(e)[:1000])
+                outcomes['failed'] += 1
+                if e.transient:
+                    logger.warning(f"Stopping token refresh run after a transient error: {str(e)}")
+                    outcomes['skipped'] += len(candidates) - index - 1
+                    break
+                continue
+            
+            account.refresh_from_db(fields=['token_refresh_attempted_at'])
+            account.token_refreshed_at = timezone.now()
+            account.token_refresh_error = ''
+            account.update_token(token_data['access_token'], account.token_type, token_data['expires_in'])
+            outcomes['refreshed'] += 1
+        
+        logger.info(
+            f"Token refresh run: {outcomes['refreshed']} refreshed, {outcomes['failed']} failed, "
+            f"{outcomes['skipped']} skipped"
+        )
+        return outcomes
+    
+    @staticmethod
+    def get_token_health():
+        """Count connected accounts whose tokens have lapsed or are at risk of lapsing."""
+        now = timezone.now()
+        connected = InstagramAccount.objects.exclude(access_token__isnull=True).exclude(access_token='')
+        expiring = InstagramService.get_expiring_accounts(now)
+        
+        return {
+            'connected': connected.count(),
+            'expired': connected.filter(Q(expires_at__isnull=True) | Q(expires_at__lte=now)).count(),
+            'expiring_within_day': expiring.filter(expires_at__lte=now + timezone.timedelta(days=1)).count(),
+            'expiring_within_window': expiring.count(),
+            'refresh_failing': expiring.exclude(token_refresh_error='').count(),
+            'refreshed_last_day': connected.filter(token_refreshed_at__gte=now - timezone.timedelta(days=1)).count(),
+            'refresh_window_days': settings.INSTAGRAM_TOKEN_REFRESH_WINDOW_DAYS,
+        }
     
     @staticmethod
     def get_user_info(access_token):
         """Get user profile information using an access token."""
-        try:
-            response = requests.get(
-                f"{INSTAGRAM_GRAPH_URL}/me",
-                params={
-                    'fields': 'id,username',
-                    'access_token': access_token
-                }
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Instagram get user info failed: {response.text}")
-                raise InstagramAPIError(f"Failed to get user info: {response.text}")
-                
-            return response.json()
-            
-        except requests.RequestException as e:
-            logger.error(f"Instagram get user info request failed: {str(e)}")
-            raise InstagramAPIError(f"Network error during get user info: {str(e)}")
+        return InstagramService._send(
+            'GET',
+            f"{settings.INSTAGRAM_GRAPH_URL}/me",
+            'me',
+            'get user info',
+            params={
+                'fields': 'id,username',
+                'access_token': access_token
+            }
+        )
     
     @staticmethod
     def get_user_media(instagram_account, limit=10, after=None):
@@ -158,35 +403,21 @@ class InstagramService:
             logger.error(f"Instagram token invalid for account {instagram_account.username}")
             raise InstagramAPIError("Instagram token is invalid or expired")
             
-        try:
-            params = {
-                'fields': 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,username,children{media_url,thumbnail_url}',
-                'access_token': instagram_account.access_token,
-                'limit': limit
-            }
-            
-            if after:
-                params['after'] = after
-                
-            response = requests.get(
-                f"{INSTAGRAM_GRAPH_URL}/me/media",
-                params=params
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Instagram get media failed: {response.text}")
-                raise InstagramAPIError(f"Failed to get user media: {response.text}")
-                
-            data = response.json()
-            
-            # Cache media data
-            InstagramService.cache_media_data(instagram_account, data['data'])
-            
-            return data
+        params = {
+            'fields': 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,username,children{media_url,thumbnail_url}',
+            'access_token': instagram_account.access_token,
+            'limit': limit
+        }
+        
+        if after:
+            params['after'] = after
             
-        except requests.RequestException as e:
-            logger.error(f"Instagram get media request failed: {str(e)}")
-            raise InstagramAPIError(f"Network error during get media: {str(e)}")
+        data = InstagramService._send('GET', f"{settings.INSTAGRAM_GRAPH_URL}/me/media", 'me/media', 'get user media', params=params)
+        
+        # Cache media data
+        InstagramService.cache_media_data(instagram_account, data['data'])
+        
+        return data
     
     @staticmethod
     def cache_media_data(instagram_account, media_items):
@@ -221,13 +452,18 @@ class InstagramService:
         """
         Verify if a user follows a target account.
         
-        Note: Basic Display API doesn't directly support this verification.
-        This is a placeholder that would need to be implemented with Instagram Graph API
-        for business accounts or via scraping (which has ToS implications).
+        Checks membership in the follower snapshot built by ``sync_followers``.
         """
-        # In a real implementation, this would verify the follow relationship
-        # Currently, we'll log the limitation and create a "verified" interaction
-        logger.warning(f"Follow verification not fully implemented for {instagram_account.username} -> {target_username}")
+        target = target_username.lstrip('@').lower()
+        InstagramService.get_sync_state('followers', target)
+        
+        follows = InstagramFollower.objects.filter(
+            target_username=target,
+            follower_username=(instagram_account.username or '').lower()
+        ).exists()
+        
+        if not follows:
+            return False
         
         # Create interaction record
         interaction, created = InstagramInteraction.objects.get_or_create(
@@ -242,16 +478,46 @@ class InstagramService:
             
         return True
     
+    @staticmethod
+    def verify_follows_bulk(instagram_accounts, target_username):
+        """
+        Verify follows for many accounts with a single snapshot lookup.
+        
+        Returns ``{account_id: bool}``.
+        """
+        target = target_username.lstrip('@').lower()
+        InstagramService.get_sync_state('followers', target)
+        
+        usernames = [(account.username or '').lower() for account in instagram_accounts]
+        followers = set(
+            InstagramFollower.objects.filter(target_username=target, follower_username__in=usernames)
+            .values_list('follower_username', flat=True)
+        )
+        
+        results = {account.id: (account.username or '').lower() in followers for account in instagram_accounts}
+        InstagramService.record_verified_interactions(
+            [account for account in instagram_accounts if results[account.id]],
+            'follow',
+            target_username=target_username
+        )
+        return results
+    
     @staticmethod
     def verify_like(instagram_account, media_id):
         """
         Verify if a user liked a specific media post.
         
-        Note: Basic Display API doesn't directly support this verification.
-        This is a placeholder that would need to be implemented with Instagram Graph API.
+        Checks membership in the liker snapshot built by ``sync_post_likers``.
         """
-        # In a real implementation, this would verify the like action
-        logger.warning(f"Like verification not fully implemented for {instagram_account.username} on {media_id}")
+        InstagramService.get_sync_state('likers', media_id)
+        
+        liked = InstagramLiker.objects.filter(
+            media_id=media_id,
+            liker_username=(instagram_account.username or '').lower()
+        ).exists()
+        
+        if not liked:
+            return False
         
         # Create interaction record
         interaction, created = InstagramInteraction.objects.get_or_create(
@@ -266,16 +532,488 @@ class InstagramService:
             
         return True
     
+    @staticmethod
+    def verify_likes_bulk(instagram_accounts, media_id):
+        """
+        Verify likes for many accounts by intersecting them with the liker snapshot in one query.
+        
+        Returns ``{account_id: bool}``.
+        """
+        InstagramService.get_sync_state('likers', media_id)
+        
+        usernames = [(account.username or '').lower() for account in instagram_accounts]
+        likers = set(
+            InstagramLiker.objects.filter(media_id=media_id, liker_username__in=usernames)
+            .values_list('liker_username', flat=True)
+        )
+        
+        results = {account.id: (account.username or '').lower() in likers for account in instagram_accounts}
+        InstagramService.record_verified_interactions(
+            [account for account in instagram_accounts if results[account.id]],
+            'like',
+            media_id=media_id
+        )
+        return results
+    
+    @staticmethod
+    def iter_pages(url, params, endpoint, action):
+        """
+        Yield the items of each page of a paged Graph API edge.
+        
+        Follows ``paging.cursors.after`` until the edge has no next page; the
+        caller can stop early by breaking out of the loop.
+        """
+        params = dict(params)
+        
+        while True:
+            data = InstagramService._send('GET', url, endpoint, action, params=params)
+            yield data.get('data', [])
+            
+            paging = data.get('paging') or {}
+            after = (paging.get('cursors') or {}).get('after')
+            if not after or not paging.get('next'):
+                return
+            params['after'] = after
+    
+    @staticmethod
+    def ingest_comments(media_id, comment_items):
+        """
+        Store comments in the comment index, skipping ones that are already indexed.
+        
+        Returns the newly indexed ``InstagramComment`` objects.
+        """
+        comments = {}
+        for item in comment_items:
+            comment_id = item.get('id')
+            username = item.get('username') or (item.get('from') or {}).get('username')
+            if not comment_id or not username:
+                continue
+            comments[comment_id] = InstagramComment(
+                comment_id=comment_id,
+                media_id=media_id,
+                commenter_username=username.lower(),
+                text=item.get('text') or '',
+                timestamp=parse_datetime(item.get('timestamp') or '')
+            )
+        
+        existing = set(
+            InstagramComment.objects.filter(comment_id__in=list(comments)).values_list('comment_id', flat=True)
+        )
+        new_comments = [comment for comment_id, comment in comments.items() if comment_id not in existing]
+        InstagramComment.objects.bulk_create(new_comments, ignore_conflicts=True)
+        InstagramService.index_mentions(media_id, new_comments)
+        return new_comments
+    
+    @staticmethod
+    def index_mentions(media_id, comments):
+        """
+        Record the distinct accounts each commenter @mentioned and update their tallies.
+        
+        Only commenters with newly seen mentions have their tally touched, so
+        ingesting a page of comments costs a fixed number of queries regardless
+        of how many mentions were already indexed for the post. Self-mentions
+        are ignored. Returns the number of new mentions recorded.
+        """
+        mentions = {}
+        for comment in comments:
+            for username in extract_mentions(comment.text):
+                if username != comment.commenter_username:
+                    mentions.setdefault((comment.commenter_username, username), comment)
+        
+        if not mentions:
+            return 0
+        
+        commenters = {commenter for commenter, _ in mentions}
+        existing = set(
+            InstagramCommentMention.objects.filter(media_id=media_id, commenter_username__in=commenters)
+            .values_list('commenter_username', 'mentioned_username')
+        )
+        new_mentions = [
+            InstagramCommentMention(
+                media_id=media_id,
+                commenter_username=commenter,
+                mentioned_username=mentioned,
+                comment=comment
+            )
+            for (commenter, mentioned), comment in mentions.items()
+            if (commenter, mentioned) not in existing
+        ]
+        if not new_mentions:
+            return 0
+        
+        InstagramCommentMention.objects.bulk_create(new_mentions, ignore_conflicts=True)
+        
+        # Recount from the mention rows rather than incrementing, so concurrent
+        # syncs of the same post can't double count
+        changed = {mention.commenter_username for mention in new_mentions}
+        counts = (
+            InstagramCommentMention.objects.filter(media_id=media_id, commenter_username__in=changed)
+            .values('commenter_username')
+            .annotate(total=Count('mentioned_username'))
+            .values_list('commenter_username', 'total')
+        )
+        InstagramMentionTally.objects.bulk_create(
+            [
+                InstagramMentionTally(media_id=media_id, commenter_username=commenter, mention_count=total)
+                for commenter, total in counts
+            ],
+            update_conflicts=True,
+            unique_fields=['media_id', 'commenter_username'],
+            update_fields=['mention_count', 'updated_at']
+        )
+        return len(new_mentions)
+    
+    @staticmethod
+    def sync_post_comments(instagram_account, media_id, full=False):
+        """
+        Page through a post's comments into the comment index.
+        
+        ``instagram_account`` must be the post owner's account. Incremental syncs
+        stop at the first page with no new comments, since the comments edge
+        returns newest comments first. A full sync pages through everything and
+        runs when ``full`` is set or the last one is older than
+        ``INSTAGRAM_INDEX_FULL_SYNC_HOURS``. Returns the number of newly indexed comments.
+        """
+        if not instagram_account.is_token_valid:
+            logger.error(f"Instagram token invalid for account {instagram_account.username}")
+            raise InstagramAPIError("Instagram token is invalid or expired")
+        
+        state, _ = InstagramSyncState.objects.get_or_create(index_type='comments', key=media_id)
+        started_at = timezone.now()
+        incremental = (
+            not full and state.last_full_sync_at is not None and
+            started_at - state.last_full_sync_at < timezone.timedelta(hours=settings.INSTAGRAM_INDEX_FULL_SYNC_HOURS)
+        )
+        new_count = 0
+        
+        pages = InstagramService.iter_pages(
+            f"{settings.INSTAGRAM_GRAPH_URL}/{media_id}/comments",
+            {
+                'fields': 'id,text,timestamp,username',
+                'access_token': instagram_account.access_token,
+                'limit': InstagramService.INDEX_PAGE_SIZES['comments']
+            },
+            'media/comments',
+            'get comments'
+        )
+        for items in pages:
+            new_comments = InstagramService.ingest_comments(media_id, items)
+            new_count += len(new_comments)
+            if incremental and not new_comments:
+                break
+        
+        state.item_count = InstagramComment.objects.filter(media_id=media_id).count()
+        state.last_synced_at = started_at
+        if not incremental:
+            state.last_full_sync_at = started_at
+        state.save()
+        
+        logger.info(f"Indexed {new_count} new comments for media {media_id} ({state.item_count} total)")
+        return new_count
+    
+    @staticmethod
+    def sync_followers(instagram_account, full=False):
+        """
+        Page through an account's followers into the follower snapshot.
+        
+        ``instagram_account`` must be the account being followed, since the
+        followers edge is only readable with the account's own token.
+        Incremental syncs stop at the first page with no new followers. A full
+        sync pages through everything, refreshes ``last_seen_at`` and drops
+        followers that weren't seen, which is the only way unfollows are
+        noticed. Returns the number of new followers.
+        """
+        if not instagram_account.is_token_valid:
+            logger.error(f"Instagram token invalid for account {instagram_account.username}")
+            raise InstagramAPIError("Instagram token is invalid or expired")
+        
+        target = (instagram_account.username or '').lower()
+        state, _ = InstagramSyncState.objects.get_or_create(index_type='followers', key=target)
+        started_at = timezone.now()
+        incremental = (
+            not full and state.last_full_sync_at is not None and
+            started_at - state.last_full_sync_at < timezone.timedelta(hours=settings.INSTAGRAM_INDEX_FULL_SYNC_HOURS)
+        )
+        new_count = 0
+        
+        pages = InstagramService.iter_pages(
+            f"{settings.INSTAGRAM_GRAPH_URL}/{instagram_account.instagram_user_id or 'me'}/followers",
+            {
+                'fields': 'id,username',
+                'access_token': instagram_account.access_token,
+                'limit': InstagramService.INDEX_PAGE_SIZES['followers']
+            },
+            'user/followers',
+            'get followers'
+        )
+        for items in pages:
+            usernames = {item['username'].lower() for item in items if item.get('username')}
+            followers = InstagramFollower.objects.filter(target_username=target, follower_username__in=usernames)
+            existing = set(followers.values_list('follower_username', flat=True))
+            
+            InstagramFollower.objects.bulk_create([
+                InstagramFollower(target_username=target, follower_username=username, last_seen_at=started_at)
+                for username in usernames - existing
+            ], ignore_conflicts=True)
+            new_count += len(usernames - existing)
+            
+            if not incremental:
+                followers.filter(follower_username__in=existing).update(last_seen_at=started_at)
+            elif not usernames - existing:
+                break
+        
+        if not incremental:
+            removed, _ = InstagramFollower.objects.filter(target_username=target, last_seen_at__lt=started_at).delete()
+            if removed:
+                logger.info(f"Dropped {removed} followers of {target} that unfollowed")
+        
+        state.item_count = InstagramFollower.objects.filter(target_username=target).count()
+        state.last_synced_at = started_at
+        if not incremental:
+            state.last_full_sync_at = started_at
+        state.save()
+        
+        logger.info(f"Snapshotted {new_count} new followers of {target} ({state.item_count} total)")
+        return new_count
+    
+    @staticmethod
+    def sync_post_likers(instagram_account, media_id):
+        """
+        Replace a post's liker snapshot with the current likes.
+        
+        ``instagram_account`` must be the post owner's account. The likes edge
+        has no useful ordering, so every sync pages through all likers and
+        drops accounts that are no longer among them. Returns the number of
+        likers in the snapshot.
+        """
+        if not instagram_account.is_token_valid:
+            logger.error(f"Instagram token invalid for account {instagram_account.username}")
+            raise InstagramAPIError("Instagram token is invalid or expired")
+        
+        state, _ = InstagramSyncState.objects.get_or_create(index_type='likers', key=media_id)
+        started_at = timezone.now()
+        
+        pages = InstagramService.iter_pages(
+            f"{settings.INSTAGRAM_GRAPH_URL}/{media_id}/likes",
+            {
+                'fields': 'id,username',
+                'access_token': instagram_account.access_token,
+                'limit': InstagramService.INDEX_PAGE_SIZES['likers']
+            },
+            'media/likes',
+            'get likes'
+        )
+        for items in pages:
+            usernames = {item['username'].lower() for item in items if item.get('username')}
+            InstagramLiker.objects.bulk_create(
+                [
+                    InstagramLiker(media_id=media_id, liker_username=username, last_seen_at=started_at)
+                    for username in usernames
+                ],
+                update_conflicts=True,
+                unique_fields=['media_id', 'liker_username'],
+                update_fields=['last_seen_at']
+            )
+        
+        InstagramLiker.objects.filter(media_id=media_id, last_seen_at__lt=started_at).delete()
+        
+        state.item_count = InstagramLiker.objects.filter(media_id=media_id).count()
+        state.last_synced_at = started_at
+        state.last_full_sync_at = started_at
+        state.save()
+        
+        logger.info(f"Snapshotted {state.item_count} likers of media {media_id}")
+        return state.item_count
+    
+    @staticmethod
+    def verify_webhook_signature(body, signature_header):
+        """Check a webhook's ``X-Hub-Signature-256`` header against an HMAC of the raw body."""
+        secret = settings.INSTAGRAM_CLIENT_SECRET
+        if not secret or not signature_header or not signature_header.startswith('sha256='):
+            return False
+        
+        expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature_header[len('sha256='):])
+    
+    @staticmethod
+    def store_webhook_events(payload):
+        """
+        Persist the changes in a webhook payload, skipping events that were already received.
+        
+        Instagram retries deliveries and may batch several changes into one
+        request, so each change gets a key derived from its comment ID (or its
+        content) and all new events are inserted in a single query. Returns the
+        newly stored ``InstagramWebhookEvent`` objects.
+        """
+        events = {}
+        for entry in payload.get('entry') or []:
+            if not isinstance(entry, dict):
+                continue
+            object_id = str(entry.get('id') or '')
+            for change in entry.get('changes') or []:
+                if not isinstance(change, dict) or not isinstance(change.get('value') or {}, dict):
+                    continue
+                field = change.get('field') or ''
+                value = change.get('value') or {}
+                comment_id = value.get('id') if field == 'comments' else value.get('comment_id')
+                if comment_id:
+                    event_key = f"{field}:{object_id}:{comment_id}"
+                else:
+                    digest = hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+                    event_key = f"{field}:{object_id}:{digest}"
+                
+                events[event_key] = InstagramWebhookEvent(
+                    event_key=event_key,
+                    field=field,
+                    object_id=object_id,
+                    media_id=str(value.get('media_id') or (value.get('media') or {}).get('id') or ''),
+                    payload=value
+                )
+        
+        existing = set(
+            InstagramWebhookEvent.objects.filter(event_key__in=list(events)).values_list('event_key', flat=True)
+        )
+        new_events = [event for event_key, event in events.items() if event_key not in existing]
+        InstagramWebhookEvent.objects.bulk_create(new_events, ignore_conflicts=True)
+        return new_events
+    
+    @staticmethod
+    def process_webhook_events(events):
+        """
+        Apply stored webhook events to the verification indexes and interaction records.
+        
+        Comment events, and mention events that carry the comment, are ingested
+        into the comment and mention indexes per post. Commenters with a
+        connected account get verified ``comment`` interactions, and mentions of
+        a connected account get verified ``tag`` interactions. Listeners of
+        ``interactions_ingested`` are then notified once per post.
+        """
+        comments_by_media = {}
+        mentions_by_media = {}
+        for event in events:
+            if not event.media_id:
+                continue
+            value = event.payload
+            commenter = (value.get('username') or (value.get('from') or {}).get('username') or '').lower()
+            if event.field == 'comments' or commenter:
+                comments_by_media.setdefault(event.media_id, []).append({
+                    **value,
+                    'id': value.get('id') or value.get('comment_id')
+                })
+            # Mention events don't always name the commenter; those are picked up by the next sync
+            if event.field == 'mentions' and commenter:
+                mentions_by_media.setdefault(event.media_id, set()).add((commenter, event.object_id))
+        
+        object_usernames = dict(
+            InstagramAccount.objects.filter(
+                instagram_user_id__in={object_id for pairs in mentions_by_media.values() for _, object_id in pairs}
+            ).values_list('instagram_user_id', 'username')
+        )
+        
+        for media_id, items in comments_by_media.items():
+            InstagramService.ingest_comments(media_id, items)
+            
+            usernames = {
+                (item.get('username') or (item.get('from') or {}).get('username') or '').lower()
+                for item in items
+            }
+            usernames.discard('')
+            accounts = {
+                account.username_lower: account
+                for account in InstagramAccount.objects.annotate(username_lower=Lower('username'))
+                .filter(username_lower__in=usernames)
+            }
+            InstagramService.record_verified_interactions(list(accounts.values()), 'comment', media_id=media_id)
+            
+            for commenter, object_id in mentions_by_media.get(media_id, ()):
+                if commenter in accounts and object_usernames.get(object_id):
+                    InstagramService.record_verified_interactions(
+                        [accounts[commenter]], 'tag', target_username=object_usernames[object_id], media_id=media_id
+                    )
+            
+            if usernames:
+                interactions_ingested.send(sender=InstagramService, media_id=media_id, usernames=usernames)
+        
+        InstagramWebhookEvent.objects.filter(
+            event_key__in=[event.event_key for event in events]
+        ).update(processed_at=timezone.now())
+        
+        logger.info(f"Processed {len(events)} webhook events for {len(comments_by_media)} posts")
+    
+    @staticmethod
+    def process_stale_webhook_events(limit=None):
+        """
+        Process stored webhook events whose queued processing never ran or failed.
+        
+        Events still unprocessed ``INSTAGRAM_WEBHOOK_STALE_SECONDS`` after they
+        were received are picked up oldest first, at most ``limit`` per run.
+        Returns the number of events processed.
+        """
+        limit = limit or settings.INSTAGRAM_WEBHOOK_STALE_BATCH_SIZE
+        cutoff = timezone.now() - timezone.timedelta(seconds=settings.INSTAGRAM_WEBHOOK_STALE_SECONDS)
+        events = list(
+            InstagramWebhookEvent.objects.filter(processed_at__isnull=True, received_at__lte=cutoff)
+            .order_by('received_at')[:limit]
+        )
+        if not events:
+            return 0
+        
+        logger.warning(f"Processing {len(events)} webhook events left unprocessed since {events[0].received_at}")
+        InstagramService.process_webhook_events(events)
+        return len(events)
+    
+    @staticmethod
+    def get_sync_state(index_type, key):
+        """
+        Get the sync state of an index, raising a transient error if it was never built.
+        
+        Verifying against an index that hasn't been ingested yet would fail every
+        entrant, so callers get a retryable error instead.
+        """
+        state = InstagramSyncState.objects.filter(index_type=index_type, key=key).first()
+        if state is None or state.last_synced_at is None:
+            raise InstagramAPIError(f"The {index_type} index for {key} has not been built yet", transient=True)
+        return state
+    
+    @staticmethod
+    def estimate_sync_calls(index_type, key):
+        """
+        Estimate the Graph API calls the next refresh of an index will make.
+        
+        Liker snapshots and due full syncs page through every item recorded in
+        ``item_count``; incremental syncs usually stop after the first page. An
+        index that was never built costs at least one page.
+        """
+        state = InstagramSyncState.objects.filter(index_type=index_type, key=key).first()
+        full_sync_due = (
+            index_type == 'likers' or state is None or state.last_full_sync_at is None or
+            timezone.now() - state.last_full_sync_at >= timezone.timedelta(hours=settings.INSTAGRAM_INDEX_FULL_SYNC_HOURS)
+        )
+        if not full_sync_due:
+            return 1
+        
+        page_size = InstagramService.INDEX_PAGE_SIZES[index_type]
+        item_count = state.item_count if state else 0
+        return max(1, -(-item_count // page_size))
+    
     @staticmethod
     def verify_comment(instagram_account, media_id, comment_text=None):
         """
         Verify if a user commented on a specific media post.
         
-        Note: Basic Display API doesn't directly support this verification.
-        This is a placeholder that would need to be implemented with Instagram Graph API.
+        Looks the commenter up in the comment index built by ``sync_post_comments``.
         """
-        # In a real implementation, this would verify the comment
-        logger.warning(f"Comment verification not fully implemented for {instagram_account.username} on {media_id}")
+        InstagramService.get_sync_state('comments', media_id)
+        
+        comments = InstagramComment.objects.filter(
+            media_id=media_id,
+            commenter_username=(instagram_account.username or '').lower()
+        )
+        if comment_text:
+            comments = comments.filter(text__icontains=comment_text)
+        
+        if not comments.exists():
+            return False
         
         # Create interaction record
         interaction, created = InstagramInteraction.objects.get_or_create(
@@ -290,16 +1028,76 @@ class InstagramService:
             
         return True
     
+    @staticmethod
+    def verify_comments_bulk(instagram_accounts, media_id):
+        """
+        Verify comments for many accounts with a single index lookup.
+        
+        Returns ``{account_id: bool}``.
+        """
+        InstagramService.get_sync_state('comments', media_id)
+        
+        usernames = {(account.username or '').lower(): account.id for account in instagram_accounts}
+        commenters = set(
+            InstagramComment.objects.filter(media_id=media_id, commenter_username__in=list(usernames))
+            .values_list('commenter_username', flat=True)
+            .distinct()
+        )
+        
+        results = {account.id: (account.username or '').lower() in commenters for account in instagram_accounts}
+        InstagramService.record_verified_interactions(
+            [account for account in instagram_accounts if results[account.id]],
+            'comment',
+            media_id=media_id
+        )
+        return results
+    
+    @staticmethod
+    def record_verified_interactions(instagram_accounts, interaction_type, target_username='', media_id=None):
+        """Record verified interactions for many accounts in bulk."""
+        if not instagram_accounts:
+            return
+        
+        now = timezone.now()
+        interactions = InstagramInteraction.objects.filter(
+            instagram_account__in=instagram_accounts,
+            target_username=target_username,
+            target_media_id=media_id,
+            interaction_type=interaction_type
+        )
+        interactions.filter(verified=False).update(verified=True, verified_at=now)
+        
+        existing = set(interactions.values_list('instagram_account_id', flat=True))
+        InstagramInteraction.objects.bulk_create([
+            InstagramInteraction(
+                instagram_account=account,
+                target_username=target_username,
+                target_media_id=media_id,
+                interaction_type=interaction_type,
+                verified=True,
+                verified_at=now
+            )
+            for account in instagram_accounts if account.id not in existing
+        ], ignore_conflicts=True)
+    
     @staticmethod
     def verify_tag(instagram_account, media_id, tagged_username):
         """
         Verify if a user tagged someone in a specific media post.
         
-        Note: Basic Display API doesn't directly support this verification.
-        This is a placeholder that would need to be implemented with Instagram Graph API.
+        Looks the mention up in the mention index built while ingesting the
+        post's comments.
         """
-        # In a real implementation, this would verify the tag action
-        logger.warning(f"Tag verification not fully implemented for {instagram_account.username} -> {tagged_username} on {media_id}")
+        InstagramService.get_sync_state('comments', media_id)
+        
+        tagged = InstagramCommentMention.objects.filter(
+            media_id=media_id,
+            commenter_username=(instagram_account.username or '').lower(),
+            mentioned_username=tagged_username.lstrip('@').lower()
+        ).exists()
+        
+        if not tagged:
+            return False
         
         # Create interaction record
         interaction, created = InstagramInteraction.objects.get_or_create(
@@ -313,4 +1111,28 @@ class InstagramService:
         if not created and not interaction.verified:
             interaction.mark_verified()
             
-        return True 
\ No newline at end of file
+        return True
+    
+    @staticmethod
+    def verify_tag_count(instagram_account, media_id, required_count):
+        """Verify if a user mentioned at least ``required_count`` distinct accounts on a post."""
+        return InstagramService.verify_tag_counts_bulk([instagram_account], media_id, required_count)[instagram_account.id]
+    
+    @staticmethod
+    def verify_tag_counts_bulk(instagram_accounts, media_id, required_count):
+        """
+        Verify mention counts for many accounts with a single tally lookup.
+        
+        Returns ``{account_id: bool}``.
+        """
+        InstagramService.get_sync_state('comments', media_id)
+        
+        usernames = [(account.username or '').lower() for account in instagram_accounts]
+        tallies = dict(
+            InstagramMentionTally.objects.filter(media_id=media_id, commenter_username__in=usernames)
+            .values_list('commenter_username', 'mention_count')
+        )
+        return {
+            account.id: tallies.get((account.username or '').lower(), 0) >= required_count
+            for account in instagram_accounts
+        }
@@ -0,0 +1,9 @@
+"""
+Signals sent by the Instagram app.
+"""
+
+from django.dispatch import Signal
+
+# Sent after webhook events added interactions to the verification indexes.
+# Arguments: media_id, usernames (lowercase usernames of the interacting accounts)
+interactions_ingested = Signal()
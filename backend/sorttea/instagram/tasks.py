@@ -0,0 +1,33 @@
+"""
+Celery tasks for the Instagram app.
+"""
+
+import logging
+from celery import shared_task
+from .models import InstagramWebhookEvent
+from .services import InstagramService
+
+logger = logging.getLogger('sorttea.instagram')
+
+
+@shared_task(ignore_result=True)
+def process_webhook_events(event_keys):
+    """Apply a batch of stored webhook events to the verification indexes."""
+    events = list(InstagramWebhookEvent.objects.filter(event_key__in=event_keys, processed_at__isnull=True))
+    if not events:
+        logger.info(f"Skipping {len(event_keys)} webhook events that were already processed")
+        return
+    
+    InstagramService.process_webhook_events(events)
+
+
+@shared_task(ignore_result=True)
+def process_stale_webhook_events():
+    """Periodically process webhook events whose queued processing was lost."""
+    InstagramService.process_stale_webhook_events()
+
+
+@shared_task(ignore_result=True)
+def refresh_expiring_tokens():
+    """Periodically refresh Instagram tokens before they lapse."""
+    InstagramService.refresh_expiring_tokens()
@@ -0,0 +1,261 @@
+"""
+Request telemetry for calls to the Instagram API.
+
+Each process accumulates counters per app and endpoint in memory and merges
+them into the Django cache at most every ``INSTAGRAM_TELEMETRY_FLUSH_SECONDS``,
+so the metrics endpoint and the ``instagram_api_stats`` command see totals
+across every web and worker process sharing a cache backend.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import requests
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger('sorttea.instagram')
+
+
+def is_cache_shared():
+    """Check whether the default cache is shared between processes, so totals cover all of them."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+# Upper bounds (in milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Response headers Instagram reports quota usage in
+RATE_LIMIT_HEADERS = ('X-App-Usage', 'X-Business-Use-Case-Usage')
+
+# Graph API error codes by kind of failure
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}
+AUTH_ERROR_CODES = {102, 190}
+PERMISSION_ERROR_CODES = {3, 10} | set(range(200, 300))
+SERVER_ERROR_CODES = {1, 2}
+
+KEY_PREFIX = 'instagram:telemetry'
+
+_retrying = ContextVar('instagram_telemetry_retrying', default=False)
+
+
+@contextmanager
+def retry_scope():
+    """Count Instagram calls made inside the block as retries."""
+    token = _retrying.set(True)
+    try:
+        yield
+    finally:
+        _retrying.reset(token)
+
+
+def get_app_label():
+    """Get the label calls from this deployment are recorded under."""
+    return settings.INSTAGRAM_CLIENT_ID or 'default'
+
+
+def classify_error(status_code=None, error_code=None, exc=None):
+    """
+    Sort a failed call into a kind of error.
+    
+    Kinds are timeout, network, rate_limited, auth, permission, server and
+    client. ``exc`` is the exception raised for calls that got no response.
+    """
+    if exc is not None:
+        return 'timeout' if isinstance(exc, requests.Timeout) else 'network'
+    if status_code == 429 or error_code in RATE_LIMIT_ERROR_CODES:
+        return 'rate_limited'
+    if status_code == 401 or error_code in AUTH_ERROR_CODES:
+        return 'auth'
+    if status_code == 403 or error_code in PERMISSION_ERROR_CODES:
+        return 'permission'
+    if (status_code or 0) >= 500 or error_code in SERVER_ERROR_CODES:
+        return 'server'
+    return 'client'
+
+
+def parse_rate_limit_headers(headers):
+    """Get the decoded rate limit headers of a response, keyed by lowercase header name."""
+    usage = {}
+    for name in RATE_LIMIT_HEADERS:
+        value = headers.get(name) if headers is not None else None
+        if not isinstance(value, str):
+            continue
+        try:
+            usage[name.lower()] = json.loads(value)
+        except ValueError:
+            usage[name.lower()] = value
+    return usage
+
+
+def estimate_percentile(buckets, total, percentile):
+    """Estimate a latency percentile as the upper bound of the bucket it falls in."""
+    if not total:
+        return None
+    rank = total * percentile
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += buckets.get(bound, 0)
+        if seen >= rank:
+            return bound
+    # Slower than the largest bucket; report that bound as a floor
+    return LATENCY_BUCKETS_MS[-1]
+
+
+class Telemetry:
+    """In-process buffer of Instagram API call counters, flushed to the cache."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(Counter)
+        self.usage = {}
+        self.known = defaultdict(set)
+        self.last_flush = time.monotonic()
+    
+    def record(self, endpoint, latency_ms=None, status_code=None, error_kind=None,
+               bytes_sent=0, bytes_received=0, rate_limits=None):
+        """
+        Record one call.
+        
+        ``latency_ms`` is None for calls rejected before reaching Instagram,
+        which only count towards their ``error_kind``.
+        """
+        counters = Counter()
+        if latency_ms is not None:
+            counters['requests'] += 1
+            counters['latency_ms_sum'] += int(latency_ms)
+            bound = next((bound for bound in LATENCY_BUCKETS_MS if latency_ms <= bound), 'inf')
+            counters[f'latency_le_{bound}'] += 1
+            counters['bytes_sent'] += bytes_sent
+            counters['bytes_received'] += bytes_received
+            if _retrying.get():
+                counters['retries'] += 1
+        if status_code is not None:
+            counters[f'status_{status_code}'] += 1
+        if error_kind:
+            counters['errors'] += 1
+            counters[f'error_{error_kind}'] += 1
+        
+        label = (get_app_label(), endpoint)
+        with self.lock:
+            self.pending[label].update(counters)
+            if rate_limits:
+                self.usage[label] = {**rate_limits, 'updated_at': time.time()}
+            due = time.monotonic() - self.last_flush >= settings.INSTAGRAM_TELEMETRY_FLUSH_SECONDS
+        
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Merge buffered counters into the cache."""
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(Counter)
+            usage, self.usage = self.usage, {}
+            self.last_flush = time.monotonic()
+        
+        try:
+            for (app, endpoint), counters in pending.items():
+                prefix = f'{KEY_PREFIX}:{app}:{endpoint}'
+                for name, value in counters.items():
+                    key = f'{prefix}:{name}'
+                    if not cache.add(key, value, timeout=None):
+                        try:
+                            cache.incr(key, value)
+                        except ValueError:
+                            # Evicted between add and incr
+                            cache.set(key, value, timeout=None)
+                self.known[(app, endpoint)].update(counters)
+            
+            for (app, endpoint), values in usage.items():
+                cache.set(f'{KEY_PREFIX}:{app}:{endpoint}:usage', values, timeout=None)
+            
+            if pending or usage:
+                self._update_index()
+        except Exception as e:
+            # Telemetry must never break a call to Instagram
+            logger.warning(f"Could not flush Instagram API telemetry: {str(e)}")
+    
+    def _update_index(self):
+        """Merge the labels and counter names this process has seen into the shared index."""
+        index = cache.get(f'{KEY_PREFIX}:index') or {}
+        for (app, endpoint), names in self.known.items():
+            label = f'{app}:{endpoint}'
+            index[label] = sorted(set(index.get(label, [])) | names)
+        cache.set(f'{KEY_PREFIX}:index', index, timeout=None)
+    
+    def get_summary(self, endpoints=None, app=None):
+        """
+        Get per-endpoint totals for every process, flushing this one first.
+        
+        Returns one dict per app and endpoint with call, error, retry and byte
+        counts, a latency histogram with estimated percentiles, status code and
+        error kind counts and the last rate limit headers seen.
+        """
+        self.flush()
+        index = cache.get(f'{KEY_PREFIX}:index') or {}
+        summaries = []
+        
+        for label, names in sorted(index.items()):
+            label_app, endpoint = label.split(':', 1)
+            if (app and label_app != app) or (endpoints and endpoint not in endpoints):
+                continue
+            
+            prefix = f'{KEY_PREFIX}:{label}'
+            values = cache.get_many([f'{prefix}:{name}' for name in names])
+            counters = {name: values.get(f'{prefix}:{name}', 0) for name in names}
+            summaries.append(self._summarize(label_app, endpoint, counters, cache.get(f'{prefix}:usage')))
+        return summaries
+    
+    def _summarize(self, app, endpoint, counters, usage):
+        requests = counters.get('requests', 0)
+        errors = counters.get('errors', 0)
+        buckets = {bound: counters.get(f'latency_le_{bound}', 0) for bound in LATENCY_BUCKETS_MS}
+        return {
+            'app': app,
+            'endpoint': endpoint,
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 3) if requests else 0.0,
+            'retries': counters.get('retries', 0),
+            'bytes_sent': counters.get('bytes_sent', 0),
+            'bytes_received': counters.get('bytes_received', 0),
+            'latency_ms': {
+                'avg': round(counters.get('latency_ms_sum', 0) / requests, 1) if requests else None,
+                'p50': estimate_percentile(buckets, requests, 0.5),
+                'p95': estimate_percentile(buckets, requests, 0.95),
+                'p99': estimate_percentile(buckets, requests, 0.99),
+                'buckets': {
+                    **{str(bound): count for bound, count in buckets.items()},
+                    '+Inf': counters.get('latency_le_inf', 0),
+                },
+            },
+            'status_codes': {
+                name[len('status_'):]: count for name, count in sorted(counters.items()) if name.startswith('status_')
+            },
+            'errors_by_kind': {
+                name[len('error_'):]: count for name, count in sorted(counters.items()) if name.startswith('error_')
+            },
+            'rate_limit': usage,
+        }
+    
+    def reset(self):
+        """Drop buffered and stored telemetry."""
+        with self.lock:
+            self.pending = defaultdict(Counter)
+            self.usage = {}
+            self.known = defaultdict(set)
+        
+        index = cache.get(f'{KEY_PREFIX}:index') or {}
+        keys = [f'{KEY_PREFIX}:index']
+        for label, names in index.items():
+            keys.extend(f'{KEY_PREFIX}:{label}:{name}' for name in names)
+            keys.append(f'{KEY_PREFIX}:{label}:usage')
+        cache.delete_many(keys)
+
+
+telemetry = Telemetry()
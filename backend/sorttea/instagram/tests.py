@@ -2,13 +2,33 @@
 Tests for the Instagram app.
 """
 
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 from unittest.mock import patch, MagicMock
-from .models import InstagramAccount, InstagramMediaCache, InstagramInteraction
-from .services import InstagramService, InstagramAPIError
+import requests
+from .models import (
+    InstagramAccount, InstagramMediaCache, InstagramInteraction,
+    InstagramSyncState, InstagramComment, InstagramMentionTally, InstagramFollower,
+    InstagramLiker, InstagramWebhookEvent
+)
+from .fakegraph import FakeGraphAPIServer
+from .resilience import single_flight
+from .services import InstagramService, InstagramAPIError, API_ENDPOINTS, extract_mentions
+from .telemetry import retry_scope, telemetry
 
 User = get_user_model()
 
@@ -111,14 +131,42 @@ class InstagramServiceTests(TestCase):
         mock_get.return_value = mock_response
         
         # Call the service and check for exception
-        with self.assertRaises(InstagramAPIError):
+        with self.assertRaises(InstagramAPIError) as ctx:
             InstagramService.get_user_info('invalid-token')
+        self.assertFalse(ctx.exception.transient)
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_server_errors_are_transient(self, mock_get):
+        """Test that 5xx responses and throttling codes are classified as transient."""
+        mock_response = MagicMock()
+        mock_response.status_code = 503
+        mock_response.text = 'Service unavailable'
+        mock_get.return_value = mock_response
+        
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.get_user_info('valid-token')
+        self.assertTrue(ctx.exception.transient)
+        self.assertEqual(ctx.exception.status_code, 503)
+        
+        mock_response.status_code = 400
+        mock_response.json.return_value = {'error': {'code': 4, 'message': 'Application request limit reached'}}
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.get_user_info('valid-token')
+        self.assertTrue(ctx.exception.transient)
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_timeouts_are_transient(self, mock_get):
+        """Test that network timeouts are classified as transient."""
+        mock_get.side_effect = requests.Timeout('timed out')
+        
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.get_user_info('valid-token')
+        self.assertTrue(ctx.exception.transient)
     
-    @patch('sorttea.instagram.services.InstagramService.verify_follow')
-    def test_verify_follow(self, mock_verify_follow):
-        """Test verifying a follow interaction."""
-        # Mock successful verification
-        mock_verify_follow.return_value = True
+    def test_verify_follow(self):
+        """Test verifying a follow interaction against the follower snapshot."""
+        InstagramSyncState.objects.create(index_type='followers', key='targetuser', last_synced_at=timezone.now())
+        InstagramFollower.objects.create(target_username='targetuser', follower_username='testuser')
         
         # Call the service
         result = InstagramService.verify_follow(self.instagram_account, 'targetuser')
@@ -132,4 +180,777 @@ class InstagramServiceTests(TestCase):
             target_username='targetuser',
             interaction_type='follow'
         )
-        self.assertTrue(interaction.verified) 
\ No newline at end of file
+        self.assertTrue(interaction.verified)
+        
+        # Accounts missing from the snapshot don't follow
+        InstagramFollower.objects.filter(follower_username='testuser').delete()
+        self.assertFalse(InstagramService.verify_follow(self.instagram_account, 'targetuser'))
+
+
+def make_page(items, after=None):
+    """Build a mocked paged Graph API response."""
+    response = MagicMock()
+    response.status_code = 200
+    payload = {'data': items}
+    if after:
+        payload['paging'] = {'cursors': {'after': after}, 'next': f'https://graph.instagram.com/next?after={after}'}
+    response.json.return_value = payload
+    return response
+
+
+class CommentIndexTests(TestCase):
+    """Tests for the post comment index."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.owner = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='owner', password='testpass123'),
+            username='owner',
+            access_token='owner-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+        self.entrant = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='entrant', password='testpass123'),
+            username='Entrant',
+            access_token='entrant-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_sync_pages_through_comments(self, mock_get):
+        """Test that a full sync follows paging cursors and indexes every comment."""
+        mock_get.side_effect = [
+            make_page([{'id': 'c1', 'username': 'entrant', 'text': 'Count me in'}], after='cursor1'),
+            make_page([{'id': 'c2', 'username': 'someone', 'text': 'Me too'}]),
+        ]
+        
+        new_count = InstagramService.sync_post_comments(self.owner, 'media1')
+        
+        self.assertEqual(new_count, 2)
+        self.assertEqual(mock_get.call_args_list[1].kwargs['params']['after'], 'cursor1')
+        self.assertEqual(InstagramSyncState.objects.get(index_type='comments', key='media1').item_count, 2)
+        self.assertTrue(InstagramService.verify_comment(self.entrant, 'media1'))
+        self.assertTrue(InstagramInteraction.objects.filter(
+            instagram_account=self.entrant, target_media_id='media1', interaction_type='comment'
+        ).exists())
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_incremental_sync_stops_at_indexed_comments(self, mock_get):
+        """Test that an incremental sync stops at the first page without new comments."""
+        mock_get.side_effect = [make_page([{'id': 'c1', 'username': 'entrant'}])]
+        InstagramService.sync_post_comments(self.owner, 'media1')
+        
+        mock_get.reset_mock()
+        mock_get.side_effect = [
+            make_page([{'id': 'c3', 'username': 'newcomer'}], after='cursor1'),
+            make_page([{'id': 'c1', 'username': 'entrant'}], after='cursor2'),
+            make_page([{'id': 'c0', 'username': 'never-fetched'}]),
+        ]
+        
+        new_count = InstagramService.sync_post_comments(self.owner, 'media1')
+        
+        self.assertEqual(new_count, 1)
+        self.assertEqual(mock_get.call_count, 2)
+    
+    def test_verify_comment_before_indexing_is_transient(self):
+        """Test that checking an unindexed post raises a retryable error."""
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.verify_comment(self.entrant, 'media1')
+        self.assertTrue(ctx.exception.transient)
+    
+    def test_bulk_verification_uses_the_index(self):
+        """Test that many accounts are checked against the index at once."""
+        InstagramSyncState.objects.create(index_type='comments', key='media1', last_synced_at=timezone.now())
+        InstagramComment.objects.create(comment_id='c1', media_id='media1', commenter_username='entrant')
+        
+        results = InstagramService.verify_comments_bulk([self.owner, self.entrant], 'media1')
+        
+        self.assertEqual(results, {self.owner.id: False, self.entrant.id: True})
+
+
+class MentionIndexTests(TestCase):
+    """Tests for the per-post mention tallies."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.entrant = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='entrant', password='testpass123'),
+            username='Entrant',
+            access_token='entrant-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+        InstagramSyncState.objects.create(index_type='comments', key='media1', last_synced_at=timezone.now())
+    
+    def test_extract_mentions(self):
+        """Test that mentions are parsed case-insensitively, ignoring email addresses."""
+        self.assertEqual(
+            extract_mentions('Hey @Alice and @bob.smith. Mail me at me@example.com @alice'),
+            {'alice', 'bob.smith'}
+        )
+    
+    def test_tally_counts_distinct_mentions_across_comments(self):
+        """Test that tallies count distinct accounts and grow as new comments arrive."""
+        InstagramService.ingest_comments('media1', [
+            {'id': 'c1', 'username': 'entrant', 'text': '@alice @bob'},
+            {'id': 'c2', 'username': 'entrant', 'text': '@alice again, and @entrant myself'},
+        ])
+        tally = InstagramMentionTally.objects.get(media_id='media1', commenter_username='entrant')
+        self.assertEqual(tally.mention_count, 2)
+        
+        InstagramService.ingest_comments('media1', [
+            {'id': 'c2', 'username': 'entrant', 'text': '@alice again, and @entrant myself'},
+            {'id': 'c3', 'username': 'entrant', 'text': '@carol'},
+        ])
+        tally.refresh_from_db()
+        self.assertEqual(tally.mention_count, 3)
+    
+    def test_bulk_tag_count_verification(self):
+        """Test that many entrants are checked against the required tag count at once."""
+        other = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='other', password='testpass123'),
+            username='other',
+            access_token='other-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+        InstagramService.ingest_comments('media1', [
+            {'id': 'c1', 'username': 'entrant', 'text': '@alice @bob'},
+            {'id': 'c2', 'username': 'other', 'text': '@alice'},
+        ])
+        
+        results = InstagramService.verify_tag_counts_bulk([self.entrant, other], 'media1', 2)
+        
+        self.assertEqual(results, {self.entrant.id: True, other.id: False})
+        self.assertTrue(InstagramService.verify_tag(self.entrant, 'media1', '@Bob'))
+        self.assertFalse(InstagramService.verify_tag(other, 'media1', 'bob'))
+
+
+class FollowerSnapshotTests(TestCase):
+    """Tests for the follower snapshot."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.target = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='target', password='testpass123'),
+            instagram_user_id='17841400000',
+            username='Target',
+            access_token='target-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+    
+    def snapshot(self):
+        """Return the usernames in the target's follower snapshot."""
+        return set(InstagramFollower.objects.filter(target_username='target').values_list('follower_username', flat=True))
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_full_sync_drops_unfollowers(self, mock_get):
+        """Test that a full sync pages through followers and removes accounts that unfollowed."""
+        mock_get.side_effect = [
+            make_page([{'id': '1', 'username': 'Alice'}], after='cursor1'),
+            make_page([{'id': '2', 'username': 'bob'}]),
+        ]
+        self.assertEqual(InstagramService.sync_followers(self.target), 2)
+        self.assertIn('17841400000/followers', mock_get.call_args_list[0].args[0])
+        
+        mock_get.side_effect = [make_page([{'id': '1', 'username': 'alice'}, {'id': '3', 'username': 'carol'}])]
+        InstagramService.sync_followers(self.target, full=True)
+        
+        self.assertEqual(self.snapshot(), {'alice', 'carol'})
+        self.assertEqual(InstagramSyncState.objects.get(index_type='followers', key='target').item_count, 2)
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_incremental_sync_stops_at_known_followers(self, mock_get):
+        """Test that an incremental sync stops at the first page without new followers."""
+        mock_get.side_effect = [make_page([{'id': '1', 'username': 'alice'}])]
+        InstagramService.sync_followers(self.target)
+        
+        mock_get.reset_mock()
+        mock_get.side_effect = [
+            make_page([{'id': '2', 'username': 'bob'}], after='cursor1'),
+            make_page([{'id': '1', 'username': 'alice'}], after='cursor2'),
+            make_page([{'id': '9', 'username': 'never-fetched'}]),
+        ]
+        
+        self.assertEqual(InstagramService.sync_followers(self.target), 1)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(self.snapshot(), {'alice', 'bob'})
+    
+    def test_bulk_follow_verification(self):
+        """Test that many accounts are checked against the snapshot at once."""
+        InstagramSyncState.objects.create(index_type='followers', key='target', last_synced_at=timezone.now())
+        InstagramFollower.objects.create(target_username='target', follower_username='target')
+        
+        other = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='other', password='testpass123'),
+            username='other',
+            access_token='other-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+        
+        results = InstagramService.verify_follows_bulk([self.target, other], '@Target')
+        
+        self.assertEqual(results, {self.target.id: True, other.id: False})
+    
+    def test_verify_follow_before_snapshot_is_transient(self):
+        """Test that checking a target without a snapshot raises a retryable error."""
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.verify_follow(self.target, 'nobody')
+        self.assertTrue(ctx.exception.transient)
+
+
+class LikerSnapshotTests(TestCase):
+    """Tests for the liker snapshot."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.owner = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='owner', password='testpass123'),
+            username='owner',
+            access_token='owner-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_sync_replaces_snapshot(self, mock_get):
+        """Test that each sync pages through all likers and drops accounts that unliked."""
+        mock_get.side_effect = [
+            make_page([{'id': '1', 'username': 'Alice'}], after='cursor1'),
+            make_page([{'id': '2', 'username': 'bob'}]),
+        ]
+        self.assertEqual(InstagramService.sync_post_likers(self.owner, 'media1'), 2)
+        
+        mock_get.side_effect = [make_page([{'id': '2', 'username': 'bob'}, {'id': '3', 'username': 'carol'}])]
+        self.assertEqual(InstagramService.sync_post_likers(self.owner, 'media1'), 2)
+        
+        likers = set(InstagramLiker.objects.filter(media_id='media1').values_list('liker_username', flat=True))
+        self.assertEqual(likers, {'bob', 'carol'})
+        self.assertFalse(InstagramService.verify_like(self.owner, 'media1'))
+    
+    def test_verify_like_before_snapshot_is_transient(self):
+        """Test that checking a post without a snapshot raises a retryable error."""
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.verify_like(self.owner, 'media1')
+        self.assertTrue(ctx.exception.transient)
+
+
+def make_webhook_payload(*changes, object_id='17841400000'):
+    """Build a webhook delivery with the given ``(field, value)`` changes."""
+    return {
+        'object': 'instagram',
+        'entry': [{'id': object_id, 'time': 1700000000, 'changes': [
+            {'field': field, 'value': value} for field, value in changes
+        ]}]
+    }
+
+
+@override_settings(INSTAGRAM_CLIENT_SECRET='app-secret', INSTAGRAM_WEBHOOK_VERIFY_TOKEN='verify-me')
+class WebhookTests(TestCase):
+    """Tests for webhook ingestion."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.url = reverse('instagram-webhook')
+        self.owner = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='owner', password='testpass123'),
+            instagram_user_id='17841400000',
+            username='Owner',
+            access_token='owner-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+        self.entrant = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='entrant', password='testpass123'),
+            username='Entrant',
+            access_token='entrant-token',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+        self.payload = make_webhook_payload(
+            ('comments', {'id': 'c1', 'text': 'In! @friend', 'from': {'id': '1', 'username': 'entrant'},
+                          'media': {'id': 'media1'}}),
+            ('mentions', {'comment_id': 'c1', 'media_id': 'media1', 'text': 'In! @owner',
+                          'from': {'id': '1', 'username': 'entrant'}}),
+        )
+    
+    def post(self, payload, secret='app-secret'):
+        """Post a webhook delivery signed with ``secret``."""
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            self.url, body, content_type='application/json',
+            headers={'X-Hub-Signature-256': f'sha256={signature}'}
+        )
+    
+    def test_subscription_handshake(self):
+        """Test that the verify token handshake echoes the challenge."""
+        response = self.client.get(self.url, {'hub.mode': 'subscribe', 'hub.verify_token': 'verify-me', 'hub.challenge': '42'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'42')
+        
+        response = self.client.get(self.url, {'hub.mode': 'subscribe', 'hub.verify_token': 'wrong', 'hub.challenge': '42'})
+        self.assertEqual(response.status_code, 403)
+    
+    def test_rejects_invalid_signature(self):
+        """Test that unsigned or wrongly signed deliveries are rejected."""
+        response = self.post(self.payload, secret='wrong-secret')
+        
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(InstagramWebhookEvent.objects.exists())
+    
+    @patch('sorttea.instagram.views.process_webhook_events.delay')
+    def test_duplicate_deliveries_are_stored_once(self, mock_delay):
+        """Test that redelivered events are deduplicated and new ones queued in one batch."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(self.payload)
+        self.assertEqual(response.json(), {'received': 2})
+        mock_delay.assert_called_once()
+        self.assertEqual(len(mock_delay.call_args.args[0]), 2)
+        
+        mock_delay.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(self.payload)
+        self.assertEqual(response.json(), {'received': 0})
+        mock_delay.assert_not_called()
+        self.assertEqual(InstagramWebhookEvent.objects.count(), 2)
+    
+    def test_rejects_payloads_that_are_not_objects(self):
+        """Test that signed deliveries whose JSON isn't an object are rejected, not a server error."""
+        for payload in ([], 'x'):
+            self.assertEqual(self.post(payload).status_code, 400)
+        
+        # Malformed entries and changes inside an object are skipped
+        response = self.post({'entry': ['x', {'changes': ['y', {'field': 'comments', 'value': 'z'}]}]})
+        self.assertEqual(response.json(), {'received': 0})
+        self.assertFalse(InstagramWebhookEvent.objects.exists())
+    
+    def test_stale_events_are_processed_oldest_first(self):
+        """Test that events whose queued processing was lost are picked up by the periodic job."""
+        events = InstagramService.store_webhook_events(self.payload)
+        self.assertEqual(InstagramService.process_stale_webhook_events(), 0)
+        
+        InstagramWebhookEvent.objects.filter(event_key=events[0].event_key).update(
+            received_at=timezone.now() - timedelta(seconds=settings.INSTAGRAM_WEBHOOK_STALE_SECONDS + 60)
+        )
+        self.assertEqual(InstagramService.process_stale_webhook_events(), 1)
+        self.assertEqual(InstagramWebhookEvent.objects.filter(processed_at__isnull=True).count(), 1)
+        self.assertTrue(InstagramComment.objects.filter(media_id='media1', commenter_username='entrant').exists())
+    
+    def test_processing_updates_indexes_and_interactions(self):
+        """Test that comment and mention events feed the indexes and interaction records."""
+        events = InstagramService.store_webhook_events(self.payload)
+        InstagramService.process_webhook_events(events)
+        
+        self.assertTrue(InstagramComment.objects.filter(media_id='media1', commenter_username='entrant').exists())
+        self.assertEqual(InstagramMentionTally.objects.get(media_id='media1', commenter_username='entrant').mention_count, 1)
+        self.assertTrue(InstagramInteraction.objects.filter(
+            instagram_account=self.entrant, target_media_id='media1', interaction_type='comment', verified=True
+        ).exists())
+        self.assertTrue(InstagramInteraction.objects.filter(
+            instagram_account=self.entrant, target_username='Owner', interaction_type='tag', verified=True
+        ).exists())
+        self.assertFalse(InstagramWebhookEvent.objects.filter(processed_at__isnull=True).exists())
+
+
+@override_settings(INSTAGRAM_TOKEN_REFRESH_DELAY_MS=0, INSTAGRAM_TOKEN_REFRESH_WINDOW_DAYS=7)
+class TokenRefreshJobTests(TestCase):
+    """Tests for the proactive token refresh job."""
+    
+    def setUp(self):
+        """Set up accounts with tokens at different distances from expiry."""
+        self.accounts = {}
+        for name, days in [('expired', -1), ('soon', 1), ('later', 5), ('safe', 30)]:
+            self.accounts[name] = InstagramAccount.objects.create(
+                user=User.objects.create_user(username=name, password='testpass123'),
+                username=name,
+                access_token=f'{name}-token',
+                expires_at=timezone.now() + timedelta(days=days)
+            )
+    
+    @patch('sorttea.instagram.services.InstagramService.refresh_token')
+    def test_refreshes_tokens_inside_window_soonest_first(self, mock_refresh):
+        """Test that only valid tokens inside the window are refreshed, in expiry order."""
+        mock_refresh.return_value = {'access_token': 'new-token', 'expires_in': 60 * 24 * 3600}
+        
+        outcomes = InstagramService.refresh_expiring_tokens()
+        
+        self.assertEqual(outcomes, {'refreshed': 2, 'failed': 0, 'skipped': 0})
+        self.assertEqual([c.args[0] for c in mock_refresh.call_args_list], ['soon-token', 'later-token'])
+        soon = InstagramAccount.objects.get(username='soon')
+        self.assertEqual(soon.access_token, 'new-token')
+        self.assertIsNotNone(soon.token_refreshed_at)
+        self.assertGreater(soon.expires_at, timezone.now() + timedelta(days=50))
+    
+    @patch('sorttea.instagram.services.InstagramService.refresh_token')
+    def test_records_failures_and_stops_on_transient_errors(self, mock_refresh):
+        """Test that failures are recorded, backed off, and that a transient error ends the run."""
+        mock_refresh.side_effect = InstagramAPIError('Service unavailable', status_code=503, transient=True)
+        
+        outcomes = InstagramService.refresh_expiring_tokens()
+        
+        self.assertEqual(outcomes, {'refreshed': 0, 'failed': 1, 'skipped': 1})
+        self.assertEqual(InstagramAccount.objects.get(username='soon').token_refresh_error, 'Service unavailable')
+        
+        # The failed account is backed off, so the next run only tries the other one
+        mock_refresh.reset_mock()
+        InstagramService.refresh_expiring_tokens()
+        self.assertEqual([c.args[0] for c in mock_refresh.call_args_list], ['later-token'])
+    
+    def test_token_health_counts(self):
+        """Test the at-risk token counts exposed to staff."""
+        InstagramAccount.objects.filter(username='later').update(token_refresh_error='Invalid token')
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        
+        response = self.client.get(reverse('instagram-account-token-health'))
+        
+        self.assertEqual(response.status_code, 200)
+        health = response.json()
+        self.assertEqual(health['connected'], 4)
+        self.assertEqual(health['expired'], 1)
+        self.assertEqual(health['expiring_within_day'], 1)
+        self.assertEqual(health['expiring_within_window'], 2)
+        self.assertEqual(health['refresh_failing'], 1)
+
+
+def make_response(status_code, payload=None):
+    """Build a mocked Graph API response."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload or {}
+    response.text = json.dumps(payload or {})
+    return response
+
+
+@override_settings(
+    INSTAGRAM_CIRCUIT_WINDOW_SECONDS=60,
+    INSTAGRAM_CIRCUIT_MIN_REQUESTS=4,
+    INSTAGRAM_CIRCUIT_ERROR_THRESHOLD=0.5,
+    INSTAGRAM_CIRCUIT_COOLDOWN_SECONDS=30
+)
+class CircuitBreakerTests(TestCase):
+    """Tests for the per-endpoint circuit breaker."""
+    
+    def setUp(self):
+        """Start every test with closed circuits."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+    
+    def fail_calls(self, mock_get, count):
+        """Make ``count`` calls to /me that fail with a 503."""
+        mock_get.return_value = make_response(503, {'error': {'message': 'Service unavailable'}})
+        for _ in range(count):
+            with self.assertRaises(InstagramAPIError):
+                InstagramService.get_user_info('token')
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_opens_on_error_rate_and_fails_fast(self, mock_get):
+        """Test that the circuit opens once the error rate is reached and then skips Instagram."""
+        self.fail_calls(mock_get, 4)
+        mock_get.reset_mock()
+        
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.get_user_info('token')
+        
+        mock_get.assert_not_called()
+        self.assertTrue(ctx.exception.transient)
+        # Other endpoints keep their own circuit
+        mock_get.return_value = make_response(200, {'data': []})
+        self.assertEqual(InstagramService.refresh_token('token'), {'data': []})
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_permanent_errors_do_not_open_the_circuit(self, mock_get):
+        """Test that invalid-token style errors don't count against Instagram's health."""
+        mock_get.return_value = make_response(400, {'error': {'code': 190, 'message': 'Invalid token'}})
+        for _ in range(6):
+            with self.assertRaises(InstagramAPIError) as ctx:
+                InstagramService.get_user_info('token')
+            self.assertFalse(ctx.exception.transient)
+        
+        self.assertEqual(mock_get.call_count, 6)
+    
+    @override_settings(INSTAGRAM_API_TIMEOUT_SECONDS=3)
+    @patch('sorttea.instagram.services.requests.get')
+    def test_timeouts_count_as_failures(self, mock_get):
+        """Test that calls are bounded by the API timeout and hung calls open the circuit."""
+        mock_get.side_effect = requests.Timeout('timed out')
+        for _ in range(4):
+            with self.assertRaises(InstagramAPIError) as ctx:
+                InstagramService.get_user_info('token')
+            self.assertTrue(ctx.exception.transient)
+        
+        self.assertEqual(mock_get.call_args.kwargs['timeout'], 3)
+        self.assertEqual(InstagramService.get_api_metrics()[API_ENDPOINTS.index('me')]['state'], 'open')
+    
+    @patch('sorttea.instagram.resilience.time.time')
+    @patch('sorttea.instagram.services.requests.get')
+    def test_half_open_probe_closes_the_circuit(self, mock_get, mock_time):
+        """Test that after the cooldown a single probe is let through and success closes the circuit."""
+        mock_time.return_value = 1000.0
+        self.fail_calls(mock_get, 4)
+        
+        mock_time.return_value = 1031.0
+        breaker = InstagramService.get_api_metrics()[API_ENDPOINTS.index('me')]
+        self.assertEqual(breaker['state'], 'half_open')
+        
+        mock_get.return_value = make_response(200, {'id': '1', 'username': 'user'})
+        self.assertEqual(InstagramService.get_user_info('token')['username'], 'user')
+        
+        breaker = InstagramService.get_api_metrics()[API_ENDPOINTS.index('me')]
+        self.assertEqual(breaker['state'], 'closed')
+        self.assertEqual(breaker['window_requests'], 0)
+    
+    @patch('sorttea.instagram.resilience.time.time')
+    @patch('sorttea.instagram.services.requests.get')
+    def test_failed_probe_reopens_the_circuit(self, mock_get, mock_time):
+        """Test that a failing probe reopens the circuit and only one probe is allowed."""
+        mock_time.return_value = 1000.0
+        self.fail_calls(mock_get, 4)
+        
+        mock_time.return_value = 1031.0
+        self.fail_calls(mock_get, 1)
+        mock_get.reset_mock()
+        
+        with self.assertRaises(InstagramAPIError):
+            InstagramService.get_user_info('token')
+        mock_get.assert_not_called()
+        self.assertEqual(InstagramService.get_api_metrics()[API_ENDPOINTS.index('me')]['state'], 'open')
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_metrics_endpoint(self, mock_get):
+        """Test that staff can read circuit state through the metrics endpoint."""
+        self.fail_calls(mock_get, 4)
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        
+        response = self.client.get(reverse('instagram-metrics'))
+        
+        self.assertEqual(response.status_code, 200)
+        circuits = {circuit['endpoint']: circuit for circuit in response.json()['circuits']}
+        self.assertEqual(circuits['me']['state'], 'open')
+        self.assertEqual(circuits['me']['window_errors'], 4)
+        self.assertEqual(circuits['me/media']['state'], 'closed')
+        self.assertIn('tokens', response.json())
+
+
+class SingleFlightTests(TestCase):
+    """Tests for coalescing identical concurrent Instagram calls."""
+    
+    def setUp(self):
+        """Start with closed circuits."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+    
+    def run_concurrently(self, mock_get, calls):
+        """Run ``calls`` in threads while the first request is held in flight, returning results by index."""
+        release = threading.Event()
+        response = mock_get.return_value
+        
+        def slow_get(*args, **kwargs):
+            release.wait(5)
+            return response
+        mock_get.side_effect = slow_get
+        
+        results = {}
+        
+        def run(index, call):
+            try:
+                results[index] = call()
+            except InstagramAPIError as e:
+                results[index] = e
+        
+        threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        
+        # Wait until every identical caller has joined the in-flight call
+        deadline = time.time() + 5
+        while time.time() < deadline and mock_get.call_count + single_flight.get_metrics()['shared'] - self.shared_before < len(calls):
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_identical_calls_share_one_request(self, mock_get):
+        """Test that concurrent identical calls make one request and all get the result."""
+        mock_get.return_value = make_response(200, {'id': '1', 'username': 'user'})
+        self.shared_before = single_flight.get_metrics()['shared']
+        
+        results = self.run_concurrently(mock_get, [lambda: InstagramService.get_user_info('token')] * 5)
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual([results[i]['username'] for i in range(5)], ['user'] * 5)
+        self.assertEqual(single_flight.get_metrics()['shared'] - self.shared_before, 4)
+        # Each caller gets its own copy of the shared result
+        self.assertEqual(len({id(result) for result in results.values()}), 5)
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_different_parameters_are_not_coalesced(self, mock_get):
+        """Test that calls with different tokens each reach Instagram."""
+        mock_get.return_value = make_response(200, {'id': '1', 'username': 'user'})
+        self.shared_before = single_flight.get_metrics()['shared']
+        
+        self.run_concurrently(mock_get, [
+            lambda: InstagramService.get_user_info('token-a'),
+            lambda: InstagramService.get_user_info('token-b'),
+        ])
+        
+        self.assertEqual(mock_get.call_count, 2)
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_waiters_share_the_error(self, mock_get):
+        """Test that a failed in-flight call raises the same error for every waiter."""
+        mock_get.return_value = make_response(503, {'error': {'message': 'Service unavailable'}})
+        self.shared_before = single_flight.get_metrics()['shared']
+        
+        results = self.run_concurrently(mock_get, [lambda: InstagramService.get_user_info('token')] * 3)
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertTrue(all(isinstance(result, InstagramAPIError) and result.transient for result in results.values()))
+
+
+class FakeGraphAPITests(TestCase):
+    """Tests running the Instagram service against the fake Graph API server."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.owner = InstagramAccount.objects.create(
+            user=User.objects.create_user(username='owner', password='testpass123'),
+            username='owner',
+            access_token='token:owner',
+            expires_at=timezone.now() + timedelta(days=30)
+        )
+    
+    def start_server(self, **kwargs):
+        """Start a fake Graph API server for the test and point the service at it."""
+        server = FakeGraphAPIServer(**kwargs)
+        server.start()
+        self.addCleanup(server.stop)
+        overrides = override_settings(INSTAGRAM_GRAPH_URL=server.url, INSTAGRAM_TOKEN_URL=f'{server.url}/oauth/access_token')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        return server
+    
+    def test_sync_pages_through_synthetic_comments(self):
+        """Test that a comment sync follows the fake server's paging to the end."""
+        server = self.start_server(comment_count=120)
+        
+        new_count = InstagramService.sync_post_comments(self.owner, 'media1')
+        
+        self.assertEqual(new_count, 120)
+        self.assertEqual(server.request_count, 3)
+        self.assertEqual(InstagramComment.objects.filter(media_id='media1').count(), 120)
+        self.assertEqual(InstagramService.get_user_info('token:owner')['username'], 'owner')
+    
+    def test_injected_errors_are_transient(self):
+        """Test that injected server errors surface as retryable API errors."""
+        self.start_server(error_rate=1.0)
+        
+        with self.assertRaises(InstagramAPIError) as ctx:
+            InstagramService.get_user_info('token:owner')
+        self.assertTrue(ctx.exception.transient)
+    
+    def test_recorded_responses_are_replayed(self):
+        """Test that responses recorded from an upstream server are replayed without it."""
+        fixtures = tempfile.TemporaryDirectory()
+        self.addCleanup(fixtures.cleanup)
+        upstream = FakeGraphAPIServer()
+        upstream.start()
+        recorder = self.start_server(fixtures_dir=fixtures.name, record_from=upstream.url)
+        
+        recorded = InstagramService.get_user_info('token:owner')
+        upstream.stop()
+        
+        self.assertEqual(upstream.request_count, 1)
+        self.assertTrue(os.listdir(fixtures.name))
+        
+        replay = FakeGraphAPIServer(fixtures_dir=fixtures.name)
+        replay.start()
+        self.addCleanup(replay.stop)
+        with override_settings(INSTAGRAM_GRAPH_URL=replay.url):
+            # Recordings are keyed without the access token, so another token gets the same answer
+            self.assertEqual(InstagramService.get_user_info('token:someone-else'), recorded)
+        self.assertEqual(recorder.request_count, 1)
+        self.assertEqual(replay.request_count, 1)
+
+
+@override_settings(INSTAGRAM_TELEMETRY_FLUSH_SECONDS=0, INSTAGRAM_CLIENT_ID='app1')
+class TelemetryTests(TestCase):
+    """Tests for per-endpoint Instagram API telemetry."""
+    
+    def setUp(self):
+        """Start every test without recorded calls."""
+        cache.clear()
+        telemetry.reset()
+        self.addCleanup(cache.clear)
+        self.addCleanup(telemetry.reset)
+    
+    def get_summary(self, endpoint):
+        """Get the telemetry summary of one endpoint."""
+        summaries = {summary['endpoint']: summary for summary in InstagramService.get_api_telemetry()}
+        return summaries[endpoint]
+    
+    @patch('sorttea.instagram.services.requests.get')
+    def test_calls_are_recorded_by_endpoint(self, mock_get):
+        """Test that latency, status codes, bytes, quota headers and error kinds are recorded."""
+        ok = make_response(200, {'id': '1', 'username': 'user'})
+        ok.content = b'{"id": "1", "username": "user"}'
+        ok.headers = {'X-App-Usage': '{"call_count": 12, "total_time": 3, "total_cputime": 2}'}
+        invalid = make_response(400, {'error': {'code': 190, 'message': 'Invalid token'}})
+        throttled = make_response(400, {'error': {'code': 4, 'message': 'Application request limit reached'}})
+        mock_get.side_effect = [ok, invalid, throttled, requests.Timeout('timed out')]
+        
+        InstagramService.get_user_info('token-a')
+        for token in ('token-b', 'token-c', 'token-d'):
+            with self.assertRaises(InstagramAPIError):
+                InstagramService.get_user_info(token)
+        
+        summary = self.get_summary('me')
+        self.assertEqual(summary['app'], 'app1')
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['errors'], 3)
+        self.assertEqual(summary['status_codes'], {'200': 1, '400': 2})
+        self.assertEqual(summary['errors_by_kind'], {'auth': 1, 'rate_limited': 1, 'timeout': 1})
+        self.assertEqual(summary['bytes_received'], len(ok.content))
+        self.assertGreater(summary['bytes_sent'], 0)
+        self.assertEqual(sum(summary['latency_ms']['buckets'].values()), 4)
+        self.assertEqual(summary['latency_ms']['p50'], 50)
+        self.assertEqual(summary['rate_limit']['x-app-usage']['call_count'], 12)
+    
+    @override_settings(INSTAGRAM_CIRCUIT_MIN_REQUESTS=2)
+    @patch('sorttea.instagram.services.requests.get')
+    def test_retries_and_rejections_are_counted(self, mock_get):
+        """Test that calls from verification retries and calls rejected by an open circuit are told apart."""
+        mock_get.return_value = make_response(503, {'error': {'message': 'Service unavailable'}})
+        with retry_scope():
+            for _ in range(3):
+                with self.assertRaises(InstagramAPIError):
+                    InstagramService.get_user_info('token')
+        
+        summary = self.get_summary('me')
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(summary['requests'], 2)
+        self.assertEqual(summary['retries'], 2)
+        self.assertEqual(summary['errors_by_kind'], {'circuit_open': 1, 'server': 2})
+    
+    @override_settings(INSTAGRAM_TELEMETRY_FLUSH_SECONDS=3600)
+    @patch('sorttea.instagram.services.requests.get')
+    def test_buffered_calls_are_reported_by_the_command_and_endpoint(self, mock_get):
+        """Test that buffered counters are flushed for the stats command and the metrics endpoint."""
+        mock_get.return_value = make_response(200, {'data': []})
+        InstagramService.refresh_token('token')
+        
+        out, err = StringIO(), StringIO()
+        call_command('instagram_api_stats', stdout=out, stderr=err)
+        self.assertIn('refresh_access_token', out.getvalue())
+        # Tests run on the process-local cache, which the command warns about
+        self.assertIn('CACHE_URL', err.getvalue())
+        
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('instagram-metrics'))
+        self.assertEqual([summary['endpoint'] for summary in response.json()['telemetry']], ['refresh_access_token'])
+        self.assertFalse(response.json()['shared_cache'])
+        
+        call_command('instagram_api_stats', reset=True, stdout=StringIO())
+        self.assertEqual(InstagramService.get_api_telemetry(), [])
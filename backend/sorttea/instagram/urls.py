@@ -4,7 +4,10 @@ URL configuration for Instagram app.
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import InstagramAuthView, InstagramCallbackView, InstagramAccountViewSet, InstagramMediaViewSet
+from .views import (
+    InstagramAuthView, InstagramCallbackView, InstagramAccountViewSet, InstagramMediaViewSet,
+    InstagramWebhookView, InstagramMetricsView
+)
 
 router = DefaultRouter()
 router.register(r'accounts', InstagramAccountViewSet, basename='instagram-account')
@@ -13,5 +16,7 @@ router.register(r'media', InstagramMediaViewSet, basename='instagram-media')
 urlpatterns = [
     path('auth/', InstagramAuthView.as_view(), name='instagram-auth'),
     path('auth/callback/', InstagramCallbackView.as_view(), name='instagram-callback'),
+    path('webhooks/', InstagramWebhookView.as_view(), name='instagram-webhook'),
+    path('metrics/', InstagramMetricsView.as_view(), name='instagram-metrics'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -2,8 +2,11 @@
 Views for the Instagram app.
 """
 
+import json
 import logging
 from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
@@ -13,6 +16,8 @@ from rest_framework.views import APIView
 from .models import InstagramAccount, InstagramMediaCache
 from .services import InstagramService, InstagramAPIError
 from .serializers import InstagramAccountSerializer, InstagramMediaSerializer
+from .tasks import process_webhook_events
+from .telemetry import is_cache_shared
 
 logger = logging.getLogger('sorttea.instagram')
 
@@ -96,6 +101,11 @@ class InstagramAccountViewSet(viewsets.ReadOnlyModelViewSet):
         except InstagramAccount.DoesNotExist:
             return Response({'detail': 'Instagram account not connected'}, status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def token_health(self, request):
+        """Get counts of connected accounts whose tokens have lapsed or are about to."""
+        return Response(InstagramService.get_token_health())
+    
     @action(detail=True, methods=['post'])
     def refresh_token(self, request, pk=None):
         """Refresh the Instagram access token."""
@@ -106,6 +116,8 @@ class InstagramAccountViewSet(viewsets.ReadOnlyModelViewSet):
             token_data = InstagramService.refresh_token(instagram_account.access_token)
             
             # Update account
+            instagram_account.token_refreshed_at = timezone.now()
+            instagram_account.token_refresh_error = ''
             instagram_account.update_token(
                 token_data['access_token'],
                 instagram_account.token_type,
@@ -173,4 +185,61 @@ class InstagramMediaViewSet(viewsets.ReadOnlyModelViewSet):
             )
         except InstagramAPIError as e:
             logger.error(f"Instagram media refresh error: {str(e)}")
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class InstagramWebhookView(APIView):
+    """Receive Instagram webhook deliveries for comments and mentions."""
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def get(self, request, format=None):
+        """Answer the subscription verification handshake."""
+        if (
+            request.query_params.get('hub.mode') == 'subscribe' and
+            settings.INSTAGRAM_WEBHOOK_VERIFY_TOKEN and
+            request.query_params.get('hub.verify_token') == settings.INSTAGRAM_WEBHOOK_VERIFY_TOKEN
+        ):
+            return HttpResponse(request.query_params.get('hub.challenge', ''), content_type='text/plain')
+        
+        logger.warning("Rejected Instagram webhook subscription with an invalid verify token")
+        return Response({'error': 'Invalid verify token'}, status=status.HTTP_403_FORBIDDEN)
+    
+    def post(self, request, format=None):
+        """Store a signed webhook delivery and queue its new events for processing."""
+        # The signature covers the raw body, so it's read before DRF parses it
+        body = request.body
+        if not InstagramService.verify_webhook_signature(body, request.headers.get('X-Hub-Signature-256')):
+            logger.warning("Rejected Instagram webhook with an invalid signature")
+            return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return Response({'error': 'Invalid JSON payload'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(payload, dict):
+            return Response({'error': 'Webhook payload must be a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            events = InstagramService.store_webhook_events(payload)
+            if events:
+                event_keys = [event.event_key for event in events]
+                transaction.on_commit(lambda: process_webhook_events.delay(event_keys))
+        
+        return Response({'received': len(events)})
+
+
+class InstagramMetricsView(APIView):
+    """Operational metrics for the Instagram integration."""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, format=None):
+        """Get circuit breaker state and call telemetry per Graph API endpoint, request coalescing and token health."""
+        return Response({
+            'circuits': InstagramService.get_api_metrics(),
+            'telemetry': InstagramService.get_api_telemetry(request.query_params.get('app')),
+            'coalescing': InstagramService.get_coalescing_metrics(),
+            'tokens': InstagramService.get_token_health(),
+            # Circuits and telemetry only cover every process when the cache is shared
+            'shared_cache': is_cache_shared(),
+        })
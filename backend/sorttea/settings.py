@@ -6,6 +6,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Load environment variables from .env file
 load_dotenv()
@@ -96,6 +97,25 @@ else:
         }
     }
 
+# Cache
+# Circuit breakers, API telemetry, leaderboards and refresh locks are kept in the cache and
+# must be shared by web and Celery worker processes, so it is Redis outside local development
+CACHE_URL = os.getenv('CACHE_URL', '' if DEBUG else 'redis://localhost:6379/1')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'sorttea',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,6 +153,113 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 INSTAGRAM_CLIENT_ID = os.getenv('INSTAGRAM_CLIENT_ID', '')
 INSTAGRAM_CLIENT_SECRET = os.getenv('INSTAGRAM_CLIENT_SECRET', '')
 INSTAGRAM_REDIRECT_URI = os.getenv('INSTAGRAM_REDIRECT_URI', 'http://localhost:8000/instagram/auth/callback')
+# API hosts; point these at a fake_graph_api server for offline load testing
+INSTAGRAM_GRAPH_URL = os.getenv('INSTAGRAM_GRAPH_URL', 'https://graph.instagram.com')
+INSTAGRAM_TOKEN_URL = os.getenv('INSTAGRAM_TOKEN_URL', 'https://api.instagram.com/oauth/access_token')
+# Webhook deliveries are signed with INSTAGRAM_CLIENT_SECRET; the verify token answers the subscription handshake
+INSTAGRAM_WEBHOOK_VERIFY_TOKEN = os.getenv('INSTAGRAM_WEBHOOK_VERIFY_TOKEN', '')
+# Webhook events still unprocessed this long after delivery are picked up by a periodic job
+INSTAGRAM_WEBHOOK_STALE_SECONDS = int(os.getenv('INSTAGRAM_WEBHOOK_STALE_SECONDS', '300'))
+INSTAGRAM_WEBHOOK_STALE_BATCH_SIZE = int(os.getenv('INSTAGRAM_WEBHOOK_STALE_BATCH_SIZE', '500'))
+# Tokens expiring within the window are refreshed proactively in rate-limited batches
+INSTAGRAM_TOKEN_REFRESH_WINDOW_DAYS = int(os.getenv('INSTAGRAM_TOKEN_REFRESH_WINDOW_DAYS', '7'))
+INSTAGRAM_TOKEN_REFRESH_BATCH_SIZE = int(os.getenv('INSTAGRAM_TOKEN_REFRESH_BATCH_SIZE', '100'))
+INSTAGRAM_TOKEN_REFRESH_DELAY_MS = int(os.getenv('INSTAGRAM_TOKEN_REFRESH_DELAY_MS', '200'))
+INSTAGRAM_TOKEN_REFRESH_RETRY_MINUTES = int(os.getenv('INSTAGRAM_TOKEN_REFRESH_RETRY_MINUTES', '60'))
+# Graph API budget and typical latency, used to estimate the cost of large verification jobs
+INSTAGRAM_API_HOURLY_BUDGET = int(os.getenv('INSTAGRAM_API_HOURLY_BUDGET', '5000'))
+INSTAGRAM_API_AVG_LATENCY_MS = int(os.getenv('INSTAGRAM_API_AVG_LATENCY_MS', '400'))
+# Seconds to wait for Instagram to connect or send data, so a hung call fails as a transient error
+INSTAGRAM_API_TIMEOUT_SECONDS = int(os.getenv('INSTAGRAM_API_TIMEOUT_SECONDS', '10'))
+# Circuit breaker per Graph API endpoint: opens when the error rate over the rolling window
+# reaches the threshold (with enough traffic), then lets a probe through after the cooldown
+INSTAGRAM_CIRCUIT_WINDOW_SECONDS = int(os.getenv('INSTAGRAM_CIRCUIT_WINDOW_SECONDS', '60'))
+INSTAGRAM_CIRCUIT_MIN_REQUESTS = int(os.getenv('INSTAGRAM_CIRCUIT_MIN_REQUESTS', '20'))
+INSTAGRAM_CIRCUIT_ERROR_THRESHOLD = float(os.getenv('INSTAGRAM_CIRCUIT_ERROR_THRESHOLD', '0.5'))
+INSTAGRAM_CIRCUIT_COOLDOWN_SECONDS = int(os.getenv('INSTAGRAM_CIRCUIT_COOLDOWN_SECONDS', '30'))
+# API call telemetry is buffered per process and merged into the cache this often
+INSTAGRAM_TELEMETRY_FLUSH_SECONDS = int(os.getenv('INSTAGRAM_TELEMETRY_FLUSH_SECONDS', '10'))
+# Verification indexes (comments, followers) are refreshed incrementally, with a periodic full resync
+INSTAGRAM_INDEX_REFRESH_MINUTES = int(os.getenv('INSTAGRAM_INDEX_REFRESH_MINUTES', '5'))
+INSTAGRAM_FOLLOWER_REFRESH_MINUTES = int(os.getenv('INSTAGRAM_FOLLOWER_REFRESH_MINUTES', '15'))
+# Liker snapshots are re-ingested in full once per window
+INSTAGRAM_LIKER_REFRESH_MINUTES = int(os.getenv('INSTAGRAM_LIKER_REFRESH_MINUTES', '15'))
+INSTAGRAM_INDEX_FULL_SYNC_HOURS = int(os.getenv('INSTAGRAM_INDEX_FULL_SYNC_HOURS', '24'))
+
+# Giveaway verification settings
+# Passed rule outcomes younger than this (in seconds) are reused on re-verification
+GIVEAWAY_RULE_RESULT_TTL = int(os.getenv('GIVEAWAY_RULE_RESULT_TTL', str(60 * 60 * 24)))
+# Transient Instagram errors are retried with exponential backoff before an entry is failed
+GIVEAWAY_VERIFICATION_MAX_RETRIES = int(os.getenv('GIVEAWAY_VERIFICATION_MAX_RETRIES', '5'))
+GIVEAWAY_VERIFICATION_RETRY_BASE_DELAY = int(os.getenv('GIVEAWAY_VERIFICATION_RETRY_BASE_DELAY', '30'))
+GIVEAWAY_VERIFICATION_RETRY_MAX_DELAY = int(os.getenv('GIVEAWAY_VERIFICATION_RETRY_MAX_DELAY', '3600'))
+# Retrying entries still parked this long after their retry was due are re-queued
+GIVEAWAY_RETRY_RECOVERY_GRACE_SECONDS = int(os.getenv('GIVEAWAY_RETRY_RECOVERY_GRACE_SECONDS', '300'))
+# Revalidation workers claim entries in chunks, leased for this many seconds
+GIVEAWAY_CLAIM_CHUNK_SIZE = int(os.getenv('GIVEAWAY_CLAIM_CHUNK_SIZE', '50'))
+GIVEAWAY_CLAIM_LEASE_SECONDS = int(os.getenv('GIVEAWAY_CLAIM_LEASE_SECONDS', '300'))
+GIVEAWAY_MAX_REVALIDATION_WORKERS = int(os.getenv('GIVEAWAY_MAX_REVALIDATION_WORKERS', '8'))
+
+# Analytics settings
+# Overview stats older than this are served as-is while a background refresh recomputes them
+ANALYTICS_OVERVIEW_MAX_AGE_SECONDS = int(os.getenv('ANALYTICS_OVERVIEW_MAX_AGE_SECONDS', '3600'))
+# At most one refresh per user is queued within this many seconds
+ANALYTICS_OVERVIEW_REFRESH_LOCK_SECONDS = int(os.getenv('ANALYTICS_OVERVIEW_REFRESH_LOCK_SECONDS', '300'))
+# Rollup increments from giveaway events are buffered per process and flushed this often,
+# or sooner once this many rows are pending
+ANALYTICS_ROLLUP_FLUSH_SECONDS = int(os.getenv('ANALYTICS_ROLLUP_FLUSH_SECONDS', '5'))
+ANALYTICS_ROLLUP_BUFFER_SIZE = int(os.getenv('ANALYTICS_ROLLUP_BUFFER_SIZE', '500'))
+# The nightly rollup recomputes the days touched by this many changed entries per batch,
+# re-reading a short overlap before its watermark to catch late commits
+ANALYTICS_ROLLUP_BATCH_SIZE = int(os.getenv('ANALYTICS_ROLLUP_BATCH_SIZE', '5000'))
+ANALYTICS_ROLLUP_OVERLAP_MINUTES = int(os.getenv('ANALYTICS_ROLLUP_OVERLAP_MINUTES', '10'))
+# Leaderboards are invalidated by entry and giveaway changes, and expire after this long regardless
+ANALYTICS_LEADERBOARD_CACHE_SECONDS = int(os.getenv('ANALYTICS_LEADERBOARD_CACHE_SECONDS', '300'))
+# New entries and verification changes invalidate a creator's leaderboards at most once per this many seconds
+ANALYTICS_LEADERBOARD_DEBOUNCE_SECONDS = int(os.getenv('ANALYTICS_LEADERBOARD_DEBOUNCE_SECONDS', '30'))
+# Period comparisons read the rollup tables, which change continuously, so they only expire
+ANALYTICS_COMPARISON_CACHE_SECONDS = int(os.getenv('ANALYTICS_COMPARISON_CACHE_SECONDS', '300'))
+# Report exports read the rollup tables this many rows at a time
+ANALYTICS_EXPORT_CHUNK_SIZE = int(os.getenv('ANALYTICS_EXPORT_CHUNK_SIZE', '2000'))
+
+# Celery settings
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'sweep-active-giveaways': {
+        'task': 'sorttea.giveaway.tasks.sweep_active_giveaways',
+        'schedule': timedelta(minutes=int(os.getenv('GIVEAWAY_SWEEP_INTERVAL_MINUTES', '15'))),
+    },
+    'requeue-stalled-retries': {
+        'task': 'sorttea.giveaway.tasks.requeue_stalled_retries',
+        'schedule': timedelta(minutes=int(os.getenv('GIVEAWAY_RETRY_RECOVERY_INTERVAL_MINUTES', '5'))),
+    },
+    'refresh-comment-indexes': {
+        'task': 'sorttea.giveaway.tasks.refresh_comment_indexes',
+        'schedule': timedelta(minutes=INSTAGRAM_INDEX_REFRESH_MINUTES),
+    },
+    'refresh-follower-snapshots': {
+        'task': 'sorttea.giveaway.tasks.refresh_follower_snapshots',
+        'schedule': timedelta(minutes=INSTAGRAM_FOLLOWER_REFRESH_MINUTES),
+    },
+    'refresh-liker-snapshots': {
+        'task': 'sorttea.giveaway.tasks.refresh_liker_snapshots',
+        'schedule': timedelta(minutes=INSTAGRAM_LIKER_REFRESH_MINUTES),
+    },
+    'process-stale-webhook-events': {
+        'task': 'sorttea.instagram.tasks.process_stale_webhook_events',
+        'schedule': timedelta(minutes=int(os.getenv('INSTAGRAM_WEBHOOK_STALE_INTERVAL_MINUTES', '5'))),
+    },
+    'refresh-expiring-tokens': {
+        'task': 'sorttea.instagram.tasks.refresh_expiring_tokens',
+        'schedule': timedelta(minutes=int(os.getenv('INSTAGRAM_TOKEN_REFRESH_INTERVAL_MINUTES', '60'))),
+    },
+    'rollup-daily-analytics': {
+        'task': 'sorttea.analytics.tasks.rollup_daily_analytics',
+        'schedule': crontab(hour=int(os.getenv('ANALYTICS_ROLLUP_HOUR', '3')), minute=0),
+    },
+}
 
 # REST Framework settings
 REST_FRAMEWORK = {